@@ -0,0 +1,61 @@
+"""Helpers shared by the benchmark scripts
+
+Builds correctly signed SQRL request bodies so the benchmarks exercise
+the real code paths.
+"""
+
+import os
+import sys
+import urllib.parse
+from base64 import urlsafe_b64encode
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import nacl.signing
+import sqrlserver
+from sqrlserver.corpus import answer
+from sqrlserver.utils import depad
+
+KEY = bytes(range(32))
+#what resolver answers suk and vuk with
+VUK = depad(urlsafe_b64encode(bytes(32)).decode('ascii'))
+
+def b64u(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return depad(urlsafe_b64encode(data).decode('ascii'))
+
+def identity(seed):
+    """A signing key derived deterministically from an integer seed"""
+    return nacl.signing.SigningKey(seed.to_bytes(32, 'big'))
+
+def signed_body(sk, server, cmd='query', opts=('cps', 'suk'), unlock=None):
+    """Returns the url-encoded POST body for a command signed by ``sk``
+
+    If ``unlock`` (the identity's unlock signing key) is given, the body
+    also carries its ``urs`` signature, as ``enable`` and ``remove`` need.
+    """
+
+    idk = b64u(bytes(sk.verify_key))
+    lines = ['ver=1', 'cmd=' + cmd, 'idk=' + idk]
+    if opts:
+        lines.append('opt=' + '~'.join(opts))
+    client = b64u('\r\n'.join(lines) + '\r\n')
+    msg = (client + server).encode('utf-8')
+    params = [('client', client), ('server', server), ('ids', b64u(sk.sign(msg).signature))]
+    if unlock is not None:
+        params.append(('urs', b64u(unlock.sign(msg).signature)))
+    return urllib.parse.urlencode(params).encode('ascii')
+
+def first_request(sk, counter, path='/sqrl', ipaddr='127.0.0.1'):
+    """Returns ``(query_string, body)`` for the initial query after scanning a QR code"""
+
+    nut = sqrlserver.Nut(KEY).generate(ipaddr, counter)
+    url = sqrlserver.Url('example.com').generate(path, nut=nut)
+    qs = 'nut=' + nut.toString('qr')
+    return qs, signed_body(sk, b64u(url))
+
+def resolver(req):
+    """An in-memory resolver that knows every identity (see :py:func:`sqrlserver.corpus.answer`)"""
+
+    return answer(req, VUK)
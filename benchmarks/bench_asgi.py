@@ -0,0 +1,70 @@
+"""Throughput of AsgiApp driven by an in-process ASGI client
+
+Run from the repository root::
+
+    python benchmarks/bench_asgi.py [-n REQUESTS] [-c CONCURRENCY] [-w WORKERS] [-p MAXPENDING]
+
+No network or server is involved: each request builds an ASGI scope and
+awaits the application directly, the way an ASGI server would. Requests
+turned away because the executor was full are counted separately.
+"""
+
+import argparse
+import asyncio
+import time
+
+import _sqrl
+from sqrlserver import Request
+from sqrlserver.utils import pad
+from sqrlserver.asgi import AsgiApp
+from sqrlserver.wsgi import Counter
+
+async def call(app, qs, body):
+    scope = {
+        'type': 'http',
+        'method': 'POST',
+        'scheme': 'https',
+        'query_string': qs.encode('ascii'),
+        'headers': [(b'content-length', str(len(body)).encode('ascii'))],
+        'client': ('127.0.0.1', 5000),
+    }
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+    out = []
+    async def send(message):
+        out.append(message)
+    await app(scope, receive, send)
+    assert out[0]['status'] == 200
+    return out[1]['body']
+
+async def run(app, payloads, concurrency):
+    queue = iter(payloads)
+    async def worker():
+        for qs, body in queue:
+            await call(app, qs, body)
+    await asyncio.gather(*[worker() for i in range(concurrency)])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--requests', type=int, default=2000)
+    parser.add_argument('-c', '--concurrency', type=int, default=16)
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('-p', '--maxpending', type=int, default=64)
+    args = parser.parse_args()
+
+    app = AsgiApp(_sqrl.KEY, _sqrl.resolver, Counter(), workers=args.workers, maxpending=args.maxpending)
+    keys = [_sqrl.identity(i + 1) for i in range(16)]
+    payloads = [_sqrl.first_request(keys[i % len(keys)], i) for i in range(args.requests)]
+
+    #make sure the payloads really succeed before timing them
+    out = asyncio.run(call(app, *payloads[0]))
+    assert Request._extract_server(pad(out.decode('ascii')))['tif'] == '5', out
+    app.rejected = 0
+
+    start = time.perf_counter()
+    asyncio.run(run(app, payloads, args.concurrency))
+    elapsed = time.perf_counter() - start
+    print("{} requests, {} concurrent: {:.0f} req/s ({:.1f} us/req), {} rejected as busy".format(args.requests, args.concurrency, args.requests / elapsed, (elapsed / args.requests) * 1e6, app.rejected))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Fan-out latency of the pending-auth bus across processes
+
+Run from the repository root::
+
+    python benchmarks/bench_bus.py [-p PROCESSES] [-k COUNTERS] [-n PUBLISHES]
+
+Starts a BusServer, then P subscriber processes that each register the
+same K counters and await all of them with asyncio, the way a worker
+holding K long-polls would. Another client publishes N of the counters
+one at a time; every publish fans out to all P processes. Latency is
+measured from publish to the moment the waiter's coroutine resumes
+(CLOCK_MONOTONIC is shared by all processes).
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+import _sqrl #puts the repository on sys.path
+from sqrlserver.bus import BusServer, BusClient
+
+def subscriber(path, counters, ready, results):
+    client = BusClient(path)
+    for c in counters:
+        client.register(c)
+    async def waitone(c):
+        value = await client.wait_async(c, timeout=60)
+        return c, time.monotonic_ns(), value
+    async def main():
+        ready.put(os.getpid())
+        return await asyncio.gather(*[waitone(c) for c in counters])
+    results.put(asyncio.run(main()))
+    client.close()
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-p', '--processes', type=int, default=4)
+    parser.add_argument('-k', '--counters', type=int, default=1000)
+    parser.add_argument('-n', '--publishes', type=int, default=500)
+    args = parser.parse_args()
+    assert args.publishes <= args.counters
+
+    path = os.path.join(tempfile.mkdtemp(), 'bus.sock')
+    server = BusServer(path).start()
+    ready = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    counters = list(range(args.counters))
+    procs = [multiprocessing.Process(target=subscriber, args=(path, counters, ready, results)) for i in range(args.processes)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        ready.get()
+    #let the broker drain the SUBSCRIBE frames
+    time.sleep(0.5)
+
+    publisher = BusClient(path)
+    published = {}
+    for c in counters[:args.publishes]:
+        published[c] = time.monotonic_ns()
+        publisher.signal(c, 'idk')
+        time.sleep(0.001)
+    #release the waiters we didn't publish to
+    for c in counters[args.publishes:]:
+        publisher.signal(c, 'done')
+
+    latest = {}
+    each = []
+    for p in procs:
+        for c, when, value in results.get():
+            if c in published:
+                each.append((when - published[c]) / 1e3)
+                latest[c] = max(latest.get(c, 0), when)
+    for p in procs:
+        p.join()
+    publisher.close()
+    server.close()
+
+    fanout = [(latest[c] - published[c]) / 1e3 for c in published]
+    print("{} processes x {} waiters, {} publishes, {} notifications".format(args.processes, args.counters, args.publishes, server.notified))
+    print("  per waiter:        p50 {:.0f} us  p99 {:.0f} us".format(pct(each, 0.5), pct(each, 0.99)))
+    print("  full fan-out:      p50 {:.0f} us  p99 {:.0f} us  mean {:.0f} us".format(pct(fanout, 0.5), pct(fanout, 0.99), statistics.mean(fanout)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""WsgiApp throughput with retried requests, with and without IdempotencyCache
+
+Run from the repository root::
+
+    python benchmarks/bench_idempotency.py [-n REQUESTS] [-r RETRIES]
+
+Sends N requests, a share R of which (0.3 by default) repeat the
+previous request byte for byte, the way a client on a flaky network
+resends a POST whose response it never saw. Prints requests per second
+with and without the cache, and the cache's hit rate.
+"""
+
+import argparse
+import io
+import random
+import time
+
+import _sqrl
+from sqrlserver.idempotency import IdempotencyCache
+from sqrlserver.wsgi import WsgiApp, Counter
+
+def call(app, qs, body):
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'QUERY_STRING': qs,
+        'CONTENT_LENGTH': str(len(body)),
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.input': io.BytesIO(body),
+    }
+    return b''.join(app(environ, lambda s, h: None))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--requests', type=int, default=3000)
+    parser.add_argument('-r', '--retries', type=float, default=0.3)
+    args = parser.parse_args()
+
+    rand = random.Random(1)
+    keys = [_sqrl.identity(i + 1) for i in range(16)]
+    payloads = []
+    for i in range(args.requests):
+        if ( (payloads) and (rand.random() < args.retries) ):
+            payloads.append(payloads[-1])
+        else:
+            payloads.append(_sqrl.first_request(keys[i % len(keys)], i))
+
+    for name, cache in [('no cache', None), ('cache', IdempotencyCache())]:
+        app = WsgiApp(_sqrl.KEY, _sqrl.resolver, Counter(), idempotency=cache)
+        start = time.perf_counter()
+        for qs, body in payloads:
+            call(app, qs, body)
+        elapsed = time.perf_counter() - start
+        line = "{:>8}: {:.0f} req/s ({:.1f} us/req)".format(name, args.requests / elapsed, (elapsed / args.requests) * 1e6)
+        if cache is not None:
+            line += "  hit rate {:.2f}".format(cache.stats()['hitrate'])
+        print(line)
+
+if __name__ == '__main__':
+    main()
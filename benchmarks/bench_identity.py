@@ -0,0 +1,75 @@
+"""Lookup rate of SqliteIdentityStore at scale
+
+Run from the repository root::
+
+    python benchmarks/bench_identity.py [-n IDENTITIES] [-l LOOKUPS] [-t THREADS] [--db PATH]
+
+Loads N random identities (10 million by default; about 1.2 GB on disk)
+and then times ``find`` with an ``idk`` and a ``pidk``, the query every
+SQRL ``query`` command makes, for keys that exist and keys that don't.
+The database is kept at PATH and reused by later runs with the same N.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+import _sqrl
+from sqrlserver.identity import SqliteIdentityStore
+
+def load(store, n, seed=1):
+    """Inserts n identities with keys derived from their index"""
+
+    db = store._db()
+    rand = random.Random(seed)
+    batch = 100000
+    start = time.perf_counter()
+    for first in range(0, n, batch):
+        rows = [(i.to_bytes(4, 'big') + rand.randbytes(28), rand.randbytes(32), rand.randbytes(32)) for i in range(first, min(n, first + batch))]
+        db.execute('BEGIN')
+        db.executemany('INSERT INTO sqrl_identities (idk, suk, vuk) VALUES (?, ?, ?)', rows)
+        db.execute('COMMIT')
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--identities', type=int, default=10000000)
+    parser.add_argument('-l', '--lookups', type=int, default=100000)
+    parser.add_argument('-t', '--threads', type=int, default=1)
+    parser.add_argument('--db', default=None)
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.gettempdir(), 'sqrl-bench-{}.db'.format(args.identities))
+    store = SqliteIdentityStore(path)
+    count = store._db().execute('SELECT COUNT(*) FROM sqrl_identities').fetchone()[0]
+    if count != args.identities:
+        store._db().execute('DELETE FROM sqrl_identities')
+        elapsed = load(store, args.identities)
+        print("loaded {} identities in {:.0f} s ({:.0f}/s)".format(args.identities, elapsed, args.identities / elapsed))
+
+    #pick existing keys back out of the table by their index prefix
+    db = store._db()
+    sample = [db.execute('SELECT idk FROM sqrl_identities WHERE idk >= ? LIMIT 1', (random.randrange(args.identities).to_bytes(4, 'big'),)).fetchone()[0] for i in range(1000)]
+    hits = [_sqrl.b64u(k) for k in sample]
+    misses = [_sqrl.b64u(os.urandom(32)) for i in range(1000)]
+
+    for name, keys in [('hit', hits), ('miss', misses)]:
+        per = args.lookups // args.threads
+        def worker():
+            for i in range(per):
+                store.find(keys[i % len(keys)], misses[i % len(misses)])
+        threads = [threading.Thread(target=worker) for i in range(args.threads)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        print("{} identities, idk {}: {:.0f} finds/s ({:.1f} us each, {} thread(s))".format(args.identities, name, (per * args.threads) / elapsed, (elapsed / (per * args.threads)) * 1e6, args.threads))
+    print("database: {} ({:.0f} MB)".format(path, os.path.getsize(path) / 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Per-round-trip cost of the MAC stores
+
+Run from the repository root::
+
+    python benchmarks/bench_macstore.py [-n ROUNDTRIPS]
+
+Each round trip is what Request does with a macstore: look up the MAC
+for the nut it received, then store one for the nut it issues. SQLite is
+measured with the default batching and with a commit per write.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import _sqrl #puts the repository on sys.path
+from sqrlserver.macstore import MemoryMacStore, SqliteMacStore
+
+def roundtrips(store, n):
+    start = time.perf_counter()
+    for i in range(n):
+        store.get('{:075d}'.format(i))
+        store.put('{:075d}'.format(i + 1), 'mac{}'.format(i))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--roundtrips', type=int, default=20000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    stores = [
+        ('memory', MemoryMacStore()),
+        ('sqlite, batched', SqliteMacStore(os.path.join(tmp, 'batched.db'))),
+        ('sqlite, batch=1', SqliteMacStore(os.path.join(tmp, 'single.db'), batch=1)),
+    ]
+    for name, store in stores:
+        elapsed = roundtrips(store, args.roundtrips)
+        extra = ''
+        if hasattr(store, 'commits'):
+            store.flush()
+            extra = ', {} commits'.format(store.commits)
+            store.close()
+        print("{:16} {:7.1f} us/round trip{}".format(name, (elapsed / args.roundtrips) * 1e6, extra))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Cost of loading nuts with and without a NutCache
+
+Run from the repository root::
+
+    python benchmarks/bench_nut.py [-n LOADS] [-d DISTINCT]
+
+Loads and validates N nuts drawn from a pool of D distinct strings
+(so each comes back N/D times, like retries and repeated queries do),
+first decrypting every time and then through a NutCache.
+"""
+
+import argparse
+import random
+import time
+
+import _sqrl
+from sqrlserver import Nut, NutCache
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--loads', type=int, default=100000)
+    parser.add_argument('-d', '--distinct', type=int, default=1000)
+    args = parser.parse_args()
+
+    rand = random.Random(1)
+    pool = [Nut(_sqrl.KEY).generate('127.0.0.1', i).toString('qr') for i in range(args.distinct)]
+    nuts = [rand.choice(pool) for i in range(args.loads)]
+
+    for name, cache in [('decrypt', None), ('cached', NutCache(maxsize=args.distinct))]:
+        start = time.perf_counter()
+        for s in nuts:
+            Nut(_sqrl.KEY).load(s, cache=cache).validate('127.0.0.1', 600)
+        elapsed = time.perf_counter() - start
+        line = "{:>8}: {:.0f} loads/s ({:.1f} us each)".format(name, args.loads / elapsed, (elapsed / args.loads) * 1e6)
+        if cache is not None:
+            line += "  {} hits, {} misses".format(cache.hits, cache.misses)
+        print(line)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Cost of many browsers waiting on PendingAuth
+
+Run from the repository root::
+
+    python benchmarks/bench_pending.py [-n WAITERS]
+
+Registers N nuts, parks one asyncio waiter on each, then signals them
+all from a separate thread (as a request handler would) and reports how
+long registration took and how quickly the waiters were woken.
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+
+import _sqrl #puts the repository on sys.path
+from sqrlserver.pending import PendingAuth
+
+async def run(pending, n):
+    waiters = [asyncio.ensure_future(pending.wait_async(i, timeout=60)) for i in range(n)]
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    t = threading.Thread(target=lambda: [pending.signal(i, 'idk') for i in range(n)])
+    t.start()
+    results = await asyncio.gather(*waiters)
+    elapsed = time.perf_counter() - start
+    t.join()
+    assert results == ['idk'] * n
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--waiters', type=int, default=10000)
+    args = parser.parse_args()
+
+    pending = PendingAuth()
+    start = time.perf_counter()
+    for i in range(args.waiters):
+        pending.register(i)
+    registered = time.perf_counter() - start
+    elapsed = asyncio.run(run(pending, args.waiters))
+    print("{} waiters: register {:.1f} us each, signal-to-wake {:.1f} us each ({:.0f} ms total)".format(args.waiters, (registered / args.waiters) * 1e6, (elapsed / args.waiters) * 1e6, elapsed * 1e3))
+
+if __name__ == '__main__':
+    main()
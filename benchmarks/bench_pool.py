@@ -0,0 +1,67 @@
+"""Request throughput in a RequestPool as worker processes are added
+
+Run from the repository root::
+
+    python benchmarks/bench_pool.py [-n REQUESTS] [-w MAXWORKERS] [-c CHUNKSIZE]
+
+Signs REQUESTS ``query`` requests up front, then runs them all inline
+(WsgiApp.process in this process) and through a RequestPool with 1, 2,
+4, ... up to MAXWORKERS processes, CHUNKSIZE requests per round trip.
+Pool start-up is not timed. Also prints the pickled size of a task and
+of a result record, which is all that crosses between processes.
+"""
+
+import argparse
+import os
+import pickle
+import time
+import urllib.parse
+
+import _sqrl
+from sqrlserver import Nut, Url
+from sqrlserver.client import Client
+from sqrlserver.pool import RequestPool
+from sqrlserver.request import Request
+from sqrlserver.wsgi import WsgiApp, Counter
+
+def resolver():
+    return _sqrl.resolver
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--requests', type=int, default=4000)
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('-c', '--chunksize', type=int, default=16)
+    args = parser.parse_args()
+
+    url = Url('example.com')
+    requests = []
+    for i in range(args.requests):
+        qs, body = Client(url.generate('/sqrl', nut=Nut(_sqrl.KEY).generate('127.0.0.1', i)), seed=i).request('query')
+        requests.append((dict(urllib.parse.parse_qsl(qs) + urllib.parse.parse_qsl(body.decode('ascii'))), '127.0.0.1'))
+
+    app = WsgiApp(_sqrl.KEY, _sqrl.resolver, Counter())
+    start = time.perf_counter()
+    for params, ipaddr in requests:
+        app.process(Request(_sqrl.KEY, params, ipaddr=ipaddr))
+    inline = args.requests / (time.perf_counter() - start)
+    print("  inline: {:8.0f} req/s".format(inline))
+
+    counts = []
+    w = 1
+    while w < args.workers:
+        counts.append(w)
+        w *= 2
+    counts.append(args.workers)
+    for workers in counts:
+        with RequestPool(_sqrl.KEY, resolver, Counter(), workers=workers) as pool:
+            #start every worker before the clock does
+            list(pool.map(requests[:workers], chunksize=1))
+            start = time.perf_counter()
+            results = list(pool.map(requests, chunksize=args.chunksize))
+            rate = args.requests / (time.perf_counter() - start)
+        print("{:3} workers: {:8.0f} req/s  x{:.2f} of inline".format(workers, rate, rate / inline))
+    print("bytes per task {}, per result {}".format(len(pickle.dumps(requests[0] + (0,))), len(pickle.dumps(results[0]))))
+
+if __name__ == '__main__':
+    main()
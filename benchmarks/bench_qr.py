@@ -0,0 +1,63 @@
+"""Compares the built-in QR encoder against generic pure-Python encoders
+
+Run from the repository root::
+
+    python benchmarks/bench_qr.py [-n ITERATIONS]
+
+The generic encoders (``qrcode`` and ``segno``) are only timed if they are
+installed. They are not dependencies of this library.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import sqrlserver
+from sqrlserver import qr
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    key = bytes(range(32))
+    url = sqrlserver.Url('www.example.com')
+    urls = [url.generate('/auth/sqrl', key=key, counter=i, ext=5) for i in range(args.iterations)]
+    primed = qr.QrEncoder.forUrl(url, '/auth/sqrl', ext=5)
+    primedfixed = qr.QrEncoder.forUrl(url, '/auth/sqrl', ext=5, mask=0)
+
+    cases = [
+        ('Url.generate (reference)', lambda s: url.generate('/auth/sqrl', key=key, counter=1, ext=5)),
+        ('qr.encode, no template', lambda s: qr.encode(s)),
+        ('QrEncoder.forUrl, best mask', lambda s: primed.encode(s)),
+        ('QrEncoder.forUrl, fixed mask', lambda s: primedfixed.encode(s)),
+        ('QrEncoder.forUrl, fixed mask + toText', lambda s: primedfixed.encode(s).toText()),
+    ]
+
+    try:
+        import qrcode
+        def generic_qrcode(s):
+            q = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M)
+            q.add_data(s)
+            q.make()
+            return q.modules
+        cases.append(('qrcode (generic)', generic_qrcode))
+    except ImportError:
+        pass
+
+    try:
+        import segno
+        cases.append(('segno (generic)', lambda s: segno.make_qr(s, error='m', boost_error=False)))
+    except ImportError:
+        pass
+
+    print("{} URLs of {} characters".format(len(urls), len(urls[0])))
+    for name, fn in cases:
+        t = timeit.timeit(lambda: [fn(s) for s in urls], number=1)
+        print("{:<42} {:>10.1f} us/op".format(name, (t / len(urls)) * 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Insert and lookup rate of the shared seen-nut table
+
+Run from the repository root::
+
+    python benchmarks/bench_seen.py [-n NUTS] [-c CAPACITY] [-p PROCESSES]
+
+Fills a fresh table with N distinct nut strings split across P
+processes, then times lookups of the same nuts. Load factor is N over
+CAPACITY.
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import _sqrl #puts the repository on sys.path
+from sqrlserver.seen import SeenNuts
+
+def nuts(start, stop):
+    return ['{:075d}'.format(i) for i in range(start, stop)]
+
+def insert(path, start, stop, results):
+    seen = SeenNuts(path)
+    batch = nuts(start, stop)
+    expires = int(time.time()) + 600
+    t = time.perf_counter()
+    added = sum([1 for n in batch if seen.add(n, expires)])
+    results.put((added, time.perf_counter() - t))
+    seen.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--nuts', type=int, default=1000000)
+    parser.add_argument('-c', '--capacity', type=int, default=2**21)
+    parser.add_argument('-p', '--processes', type=int, default=4)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'seen')
+    SeenNuts(path, capacity=args.capacity).close()
+    step = args.nuts // args.processes
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=insert, args=(path, i * step, (i + 1) * step, results)) for i in range(args.processes)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    done = [results.get() for p in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+    added = sum([d[0] for d in done])
+    inproc = max([d[1] for d in done])
+
+    seen = SeenNuts(path)
+    batch = nuts(0, step)
+    t = time.perf_counter()
+    found = sum([1 for n in batch if n in seen])
+    lookup = time.perf_counter() - t
+    size = os.path.getsize(path)
+    seen.close()
+    os.unlink(path)
+
+    print("{} nuts into {} slots ({:.0f}% full, {:.0f} MiB file)".format(added, args.capacity, 100 * added / args.capacity, size / 2**20))
+    print("  insert: {} processes, {:.0f} nuts/s overall ({:.2f} us/nut per process)".format(args.processes, added / elapsed, (inproc / step) * 1e6))
+    print("  lookup: {:.2f} us/nut, {} of {} found".format((lookup / step) * 1e6, found, step))
+
+if __name__ == '__main__':
+    main()
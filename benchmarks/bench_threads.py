@@ -0,0 +1,47 @@
+"""Request throughput as threads are added
+
+Run from the repository root::
+
+    python benchmarks/bench_threads.py [-n REQUESTS] [-t MAXTHREADS] [-b BENCHMARK]
+
+Runs the built-in BENCHMARK (``request.query`` by default; see
+``python -m sqrlserver --list``) with 1, 2, 4, ... up to MAXTHREADS
+threads in one process, REQUESTS in total each time, and prints
+requests/s and the speedup over one thread. Signing happens before the
+clocks start. On a regular CPython build the GIL is released only inside
+libsodium, so expect the speedup to flatten early; a free-threaded build
+(3.13t and later) should keep climbing up to the number of cores.
+"""
+
+import argparse
+import os
+import sys
+
+import _sqrl
+from sqrlserver.bench import run
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--requests', type=int, default=4000)
+    parser.add_argument('-t', '--threads', type=int, default=max(4, os.cpu_count() or 1))
+    parser.add_argument('-b', '--bench', default='request.query')
+    args = parser.parse_args()
+
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print("{} on {} cpus, GIL {}".format(args.bench, os.cpu_count(), 'enabled' if gil else 'disabled'))
+    counts = []
+    t = 1
+    while t < args.threads:
+        counts.append(t)
+        t *= 2
+    counts.append(args.threads)
+
+    base = None
+    for threads in counts:
+        result = run(args.bench, args.requests, threads=threads)
+        if base is None:
+            base = result['rate']
+        print("{:4} threads: {:8.0f} req/s  x{:.2f}".format(threads, result['rate'], result['rate'] / base))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Cost of the timing wheel against a periodic full sweep
+
+Run from the repository root::
+
+    python benchmarks/bench_wheel.py [-n ENTRIES] [-t TTL]
+
+Schedules N entries with expiries spread over TTL seconds (simulated
+time), cancels a tenth of them, then ticks through the TTL. For
+comparison it times one sweep over a dict of the same size, which is
+what a store without the wheel pays on every cleanup pass.
+"""
+
+import argparse
+import random
+import time
+
+import _sqrl #puts the repository on sys.path
+from sqrlserver.wheel import TimingWheel
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--entries', type=int, default=1000000)
+    parser.add_argument('-t', '--ttl', type=int, default=600)
+    args = parser.parse_args()
+
+    clock = Clock()
+    wheel = TimingWheel(clock=clock)
+    store = {}
+    delays = [random.uniform(1, args.ttl) for i in range(args.entries)]
+
+    start = time.perf_counter()
+    timers = [wheel.schedule(d, store.pop, i, None) for i, d in enumerate(delays)]
+    scheduled = time.perf_counter() - start
+    store.update(dict.fromkeys(range(args.entries)))
+
+    start = time.perf_counter()
+    for timer in timers[::10]:
+        timer.cancel()
+    cancelled = time.perf_counter() - start
+
+    worst = 0
+    start = time.perf_counter()
+    for second in range(1, args.ttl + 2):
+        clock.now = second
+        t = time.perf_counter()
+        wheel.advance()
+        worst = max(worst, time.perf_counter() - t)
+    ticked = time.perf_counter() - start
+
+    sweep = dict((i, i + random.uniform(1, args.ttl)) for i in range(args.entries))
+    start = time.perf_counter()
+    dead = [k for k, v in sweep.items() if v <= args.ttl / 2]
+    swept = time.perf_counter() - start
+
+    print("{} entries over {} s".format(args.entries, args.ttl))
+    print("  schedule: {:.2f} us each, cancel: {:.2f} us each".format((scheduled / args.entries) * 1e6, (cancelled / len(timers[::10])) * 1e6))
+    print("  expire:   {:.2f} us each, {:.1f} ms per tick on average, {:.1f} ms worst (incl. cascades), {} fired".format((ticked / wheel.expired) * 1e6, (ticked / (args.ttl + 1)) * 1e3, worst * 1e3, wheel.expired))
+    print("  one full sweep of the same dict: {:.1f} ms".format(swept * 1e3))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Identity mutation rate with and without WriteBehindStore
+
+Run from the repository root::
+
+    python benchmarks/bench_writebehind.py [-n IDENTITIES] [-m MUTATIONS] [-t THREADS]
+
+Enrolls N identities, then has T threads make M mutations between them
+(disable, enable and option changes on random identities, the writes a
+burst of ``disable``/``enable``/``ident`` commands makes), first straight
+against a SqliteIdentityStore and then through a WriteBehindStore in each
+durability mode. Prints mutations per second and the write-behind flush
+statistics.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+import _sqrl
+from sqrlserver.identity import SqliteIdentityStore
+from sqrlserver.writebehind import WriteBehindStore
+
+def burst(store, keys, mutations, threads):
+    """Times ``threads`` threads making ``mutations`` changes in total"""
+
+    per = mutations // threads
+    def worker(seed):
+        rand = random.Random(seed)
+        for i in range(per):
+            idk = rand.choice(keys)
+            op = rand.randrange(3)
+            if op == 0:
+                store.setDisabled(idk, True)
+            elif op == 1:
+                store.setDisabled(idk, False)
+            else:
+                store.setOptions(idk, rand.random() < 0.5, False)
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return per * threads, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--identities', type=int, default=10000)
+    parser.add_argument('-m', '--mutations', type=int, default=20000)
+    parser.add_argument('-t', '--threads', type=int, default=8)
+    parser.add_argument('--batch', type=int, default=256)
+    parser.add_argument('--delay', type=float, default=0.05)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'ids.db')
+    base = SqliteIdentityStore(path)
+    keys = [_sqrl.b64u(os.urandom(32)) for i in range(args.identities)]
+    base.update(dict([(k, {'suk': k, 'vuk': k, 'disabled': False, 'sqrlonly': False, 'hardlock': False}) for k in keys]))
+
+    count, elapsed = burst(base, keys, args.mutations, args.threads)
+    print("{:>8}: {:8.0f} mutations/s".format('direct', count / elapsed))
+    for durability in ['async', 'group', 'sync']:
+        store = WriteBehindStore(base, batch=args.batch, delay=args.delay, durability=durability)
+        count, elapsed = burst(store, keys, args.mutations, args.threads)
+        #count the final commit too, or async gets it for free
+        start = time.perf_counter()
+        store.close()
+        elapsed += time.perf_counter() - start
+        stats = store.stats()
+        print("{:>8}: {:8.0f} mutations/s  {} flushes of {:.0f} rows ({} coalesced)  commit p50 {:.2f} ms p99 {:.2f} ms  lag p50 {:.2f} ms p99 {:.2f} ms max {:.2f} ms".format(
+            durability, count / elapsed, stats['flushes'], stats['rows'] / max(stats['flushes'], 1), stats['coalesced'],
+            stats['commit_p50'] * 1e3, stats['commit_p99'] * 1e3, stats['lag_p50'] * 1e3, stats['lag_p99'] * 1e3, stats['lag_max'] * 1e3))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Throughput of WsgiApp driven by an in-process WSGI client
+
+Run from the repository root::
+
+    python benchmarks/bench_wsgi.py [-n REQUESTS] [-t THREADS] [--binary]
+
+No network or server is involved: each request builds a WSGI environ and
+calls the application directly, the way a WSGI server would. With
+``--binary`` the requests run with ``binary=True``, so keys and
+signatures are decoded to bytes once.
+"""
+
+import argparse
+import io
+import threading
+import time
+
+import _sqrl
+from sqrlserver import Request
+from sqrlserver.utils import pad
+from sqrlserver.wsgi import WsgiApp, Counter
+
+def call(app, qs, body):
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'QUERY_STRING': qs,
+        'CONTENT_LENGTH': str(len(body)),
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.url_scheme': 'https',
+        'wsgi.input': io.BytesIO(body),
+    }
+    status = []
+    out = b''.join(app(environ, lambda s, h: status.append(s)))
+    assert status[0] == '200 OK'
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--requests', type=int, default=2000)
+    parser.add_argument('-t', '--threads', type=int, default=1)
+    parser.add_argument('--binary', action='store_true')
+    args = parser.parse_args()
+
+    app = WsgiApp(_sqrl.KEY, _sqrl.resolver, Counter(), binary=args.binary)
+    keys = [_sqrl.identity(i + 1) for i in range(16)]
+    payloads = [_sqrl.first_request(keys[i % len(keys)], i) for i in range(args.requests)]
+
+    #make sure the payloads really succeed before timing them
+    out = call(app, *payloads[0])
+    assert Request._extract_server(pad(out.decode('ascii')))['tif'] == '5', out
+
+    chunks = [payloads[i::args.threads] for i in range(args.threads)]
+    def worker(chunk):
+        for qs, body in chunk:
+            call(app, qs, body)
+    threads = [threading.Thread(target=worker, args=(c,)) for c in chunks]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    print("{} requests on {} thread(s): {:.0f} req/s ({:.1f} us/req)".format(args.requests, args.threads, args.requests / elapsed, (elapsed / args.requests) * 1e6))
+
+if __name__ == '__main__':
+    main()
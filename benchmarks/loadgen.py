@@ -0,0 +1,146 @@
+"""End-to-end load generator built on sqrlserver.client
+
+Run from the repository root::
+
+    python benchmarks/loadgen.py [--target request|wsgi|asgi] [-c CONCURRENCY]
+                                 [-n REQUESTS] [--scenario login|lifecycle] [--db PATH]
+
+CONCURRENCY simulated clients (threads, or tasks for ``asgi``) keep
+starting sessions until N round trips have been made. Each session is a
+new identity scanning a new QR code and then walking through the
+scenario: ``login`` enrolls (``query``, ``ident``) and ``lifecycle``
+goes on to ``disable``, ``enable`` and ``remove``. The server side is a
+WsgiApp/AsgiApp (or bare Requests for ``request``) backed by a
+SqliteIdentityStore.
+
+Latency is timed around the server call only; the clients' signing
+happens outside it but still shares the CPU, so the throughput figure
+is a lower bound. ``replay.py`` measures the server alone, from requests
+signed ahead of time.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import _sqrl
+from sqrlserver import Nut, Url
+from sqrlserver.asgi import AsgiApp
+from sqrlserver.client import Client, RequestTransport, WsgiTransport, AsgiTransport
+from sqrlserver.identity import SqliteIdentityStore
+from sqrlserver.wsgi import WsgiApp, Counter
+
+SCENARIOS = {
+    'login': [('query', {}), ('ident', {'keys': True})],
+    'lifecycle': [('query', {}), ('ident', {'keys': True}), ('disable', {}), ('enable', {'unlock': True}), ('remove', {'unlock': True})],
+}
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list"""
+
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+class Load(object):
+    """Hands out round trips and collects their latencies"""
+
+    def __init__(self, total, steps):
+        self.remaining = total
+        self.steps = steps
+        self.latencies = []
+        self.errors = 0
+        self.counter = Counter()
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            n = min(self.remaining, len(self.steps))
+            self.remaining -= n
+            return n
+
+    def record(self, latencies, errors):
+        with self._lock:
+            self.latencies.extend(latencies)
+            self.errors += errors
+
+    def url(self):
+        nut = Nut(_sqrl.KEY).generate('127.0.0.1', self.counter())
+        return Url('example.com').generate('/sqrl', nut=nut)
+
+def worker(load, transport):
+    while True:
+        n = load.take()
+        if n == 0:
+            return
+        client = Client(load.url())
+        latencies = []
+        errors = 0
+        for cmd, kwargs in load.steps[:n]:
+            qs, body = client.request(cmd, **kwargs)
+            start = time.perf_counter()
+            text = transport(qs, body)
+            latencies.append(time.perf_counter() - start)
+            client.receive(text)
+            if client.tif & 0xE0:
+                errors += 1
+        load.record(latencies, errors)
+
+async def task(load, transport):
+    while True:
+        n = load.take()
+        if n == 0:
+            return
+        client = Client(load.url())
+        latencies = []
+        errors = 0
+        for cmd, kwargs in load.steps[:n]:
+            qs, body = client.request(cmd, **kwargs)
+            start = time.perf_counter()
+            text = await transport(qs, body)
+            latencies.append(time.perf_counter() - start)
+            client.receive(text)
+            if client.tif & 0xE0:
+                errors += 1
+        load.record(latencies, errors)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', choices=['request', 'wsgi', 'asgi'], default='wsgi')
+    parser.add_argument('-c', '--concurrency', type=int, default=8)
+    parser.add_argument('-n', '--requests', type=int, default=5000)
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='lifecycle')
+    parser.add_argument('--db', default=None)
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'ids.db')
+    store = SqliteIdentityStore(path)
+    load = Load(args.requests, SCENARIOS[args.scenario])
+
+    start = time.perf_counter()
+    if args.target == 'asgi':
+        transport = AsgiTransport(AsgiApp(_sqrl.KEY, store, Counter()))
+        async def run():
+            await asyncio.gather(*[task(load, transport) for i in range(args.concurrency)])
+        asyncio.run(run())
+    else:
+        if args.target == 'request':
+            transport = RequestTransport(_sqrl.KEY, store, Counter())
+        else:
+            transport = WsgiTransport(WsgiApp(_sqrl.KEY, store, Counter()))
+        threads = [threading.Thread(target=worker, args=(load, transport)) for i in range(args.concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(load.latencies)
+    print("{} {} round trips ({}) at concurrency {}: {:.0f} req/s, {} errors".format(len(latencies), args.target, args.scenario, args.concurrency, len(latencies) / elapsed, load.errors))
+    print("latency ms: p50 {:.2f}  p99 {:.2f}  p999 {:.2f}  max {:.2f}".format(*[percentile(latencies, p) * 1e3 for p in [0.5, 0.99, 0.999, 1.0]]))
+
+if __name__ == '__main__':
+    main()
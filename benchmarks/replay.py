@@ -0,0 +1,134 @@
+"""Replays a pre-recorded request corpus across worker processes
+
+Run from the repository root::
+
+    python benchmarks/replay.py record PATH [-n COUNT] [--invalid SHARE] [--seed SEED]
+    python benchmarks/replay.py replay PATH [-w WORKERS] [--binary] [--nutcache] [--stages]
+
+``record`` signs COUNT requests once, ahead of time, and writes them with
+their expected TIFs (see :py:mod:`sqrlserver.corpus`). ``replay`` maps
+the file in WORKERS processes, each taking every WORKERS-th record, and
+runs every record through Request the way WsgiApp.process does, with the
+corpus's own resolver. No signing happens during replay, so the timings
+are server-only: parsing the recorded parameters, handle, the resolver,
+and finalize.
+
+With ``--stages``, each Request also gets a HistogramSink and the mean
+time per stage (parse, signature, nut, resolver, finalize) is printed.
+
+Every response's TIF is checked against its tag. Any mismatch is listed
+(up to ten) and makes the exit status 1.
+"""
+
+import argparse
+import collections
+import multiprocessing
+import sys
+import time
+from array import array
+
+import _sqrl
+from sqrlserver.corpus import record, Corpus, answer, IPADDR
+from sqrlserver.nut import NutCache
+from sqrlserver.request import Request
+from sqrlserver.timing import HistogramSink
+from sqrlserver.wsgi import WsgiApp, Counter
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list"""
+
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def work(path, start, step, options):
+    """Replays records ``start``, ``start + step``, ... of the corpus
+
+    Returns:
+        tuple : ``(seconds, kinds, mismatches, stages)``: an array of
+        per-request times, a count of records by kind, ``(index, kind,
+        expected, got)`` for each mismatch, and the stage timings (empty
+        unless asked for).
+    """
+
+    corpus = Corpus(path)
+    vuk = [None]
+    app = WsgiApp(corpus.key, lambda req: answer(req, vuk[0]), Counter())
+    kwargs = {'ipaddr': IPADDR, 'ttl': int(time.time()) - corpus.created + 600}
+    if options.get('binary'):
+        kwargs['binary'] = True
+    if options.get('nutcache'):
+        kwargs['nutcache'] = NutCache()
+    sink = HistogramSink()
+    if options.get('stages'):
+        kwargs['timing'] = sink
+    seconds = array('d')
+    kinds = collections.Counter()
+    mismatches = []
+    for i in range(start, len(corpus), step):
+        begin = time.perf_counter()
+        params, tif, kind, vuk[0] = corpus[i]
+        got = app.process(Request(corpus.key, params, **kwargs))._tif
+        seconds.append(time.perf_counter() - begin)
+        kinds[kind] += 1
+        if got != tif:
+            mismatches.append((i, kind, tif, got))
+    corpus.close()
+    return seconds, kinds, mismatches, sink.snapshot()
+
+def replay(args):
+    options = {'binary': args.binary, 'nutcache': args.nutcache, 'stages': args.stages}
+    start = time.perf_counter()
+    if args.workers == 1:
+        results = [work(args.path, 0, 1, options)]
+    else:
+        with multiprocessing.Pool(args.workers) as pool:
+            results = pool.starmap(work, [(args.path, i, args.workers, options) for i in range(args.workers)])
+    elapsed = time.perf_counter() - start
+
+    seconds = []
+    kinds = collections.Counter()
+    mismatches = []
+    stages = collections.defaultdict(lambda: [0, 0.0])
+    for s, k, m, st in results:
+        seconds.extend(s)
+        kinds.update(k)
+        mismatches.extend(m)
+        for stage, hist in st.items():
+            stages[stage][0] += hist['count']
+            stages[stage][1] += hist['sum']
+    seconds.sort()
+    print("{} requests in {} workers: {:.0f} req/s, {} mismatches".format(len(seconds), args.workers, len(seconds) / elapsed, len(mismatches)))
+    print("server us/request: mean {:.1f}  p50 {:.1f}  p99 {:.1f}  max {:.1f}".format(sum(seconds) / max(len(seconds), 1) * 1e6, *[percentile(seconds, p) * 1e6 for p in [0.5, 0.99, 1.0]]))
+    print("  ".join("{} {}".format(k, v) for k, v in sorted(kinds.items())))
+    for stage, (count, total) in sorted(stages.items()):
+        print("  {:12} {:8} calls {:8.1f} us mean".format(stage, count, total / count * 1e6))
+    for i, kind, tif, got in sorted(mismatches)[:10]:
+        print("record {} ({}): expected tif {:x}, got {:x}".format(i, kind, tif, got))
+    return 1 if mismatches else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+    rec = sub.add_parser('record')
+    rec.add_argument('path')
+    rec.add_argument('-n', '--count', type=int, default=100000)
+    rec.add_argument('--invalid', type=float, default=0.1)
+    rec.add_argument('--seed', type=int, default=0)
+    rep = sub.add_parser('replay')
+    rep.add_argument('path')
+    rep.add_argument('-w', '--workers', type=int, default=multiprocessing.cpu_count())
+    rep.add_argument('--binary', action='store_true')
+    rep.add_argument('--nutcache', action='store_true')
+    rep.add_argument('--stages', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        start = time.perf_counter()
+        record(args.path, args.count, key=_sqrl.KEY, invalid=args.invalid, seed=args.seed)
+        print("recorded {} requests in {:.1f} s".format(args.count, time.perf_counter() - start))
+    else:
+        sys.exit(replay(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Runs the microbenchmark suite and records or compares the results
+
+Run from the repository root::
+
+    python benchmarks/run_suite.py [-b REGEX] [-r REPEAT] [-o FILE]
+    python benchmarks/run_suite.py --compare OLD.json NEW.json [--threshold 1.1]
+
+The first form times every benchmark in ``suite.py`` (or those whose
+name matches REGEX) and writes the results as JSON, by default to
+``benchmarks/results/<version>-<commit>.json``. Each benchmark is
+calibrated to run for about 0.2 s, then timed REPEAT times; the JSON
+keeps the best and median seconds per call along with the library
+version, commit, Python and machine, so runs from different versions
+can be lined up.
+
+The second form prints the ratio of NEW to OLD for every benchmark in
+both files and exits with status 1 if any got slower than THRESHOLD.
+"""
+
+import argparse
+import datetime
+import inspect
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import timeit
+
+import _sqrl
+import sqrlserver
+import suite
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def benchmarks():
+    """Yields ``(name, class, method name, param)`` for everything in the suite"""
+
+    for cname, cls in inspect.getmembers(suite, inspect.isclass):
+        if ( (not cname.startswith('Time')) or (cls.__module__ != suite.__name__) ):
+            continue
+        params = getattr(cls, 'params', None)
+        for mname, method in inspect.getmembers(cls, inspect.isfunction):
+            if not mname.startswith('time_'):
+                continue
+            name = '{}.{}'.format(cname, mname)
+            if params is None:
+                yield name, cls, mname, ()
+            else:
+                for p in params:
+                    yield '{}({})'.format(name, p), cls, mname, (p,)
+
+def measure(cls, mname, param, repeat):
+    obj = cls()
+    if hasattr(obj, 'setup'):
+        obj.setup(*param)
+    timer = timeit.Timer(lambda: getattr(obj, mname)(*param))
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= 0.2:
+            break
+        number = max(number * 2, int(number * 0.25 / max(elapsed, 1e-9)))
+    times = [t / number for t in timer.repeat(repeat, number)]
+    return {'min': min(times), 'median': statistics.median(times), 'number': number, 'repeat': repeat}
+
+def commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def run(args):
+    pattern = re.compile(args.bench) if args.bench else None
+    results = {}
+    for name, cls, mname, param in benchmarks():
+        if ( (pattern is not None) and (not pattern.search(name)) ):
+            continue
+        results[name] = measure(cls, mname, param, args.repeat)
+        print("{:45} {:10.2f} us".format(name, results[name]['min'] * 1e6))
+        sys.stdout.flush()
+    record = {
+        'version': sqrlserver.__version__,
+        'commit': commit(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    path = args.output
+    if path is None:
+        path = os.path.join(HERE, 'results', '{}-{}.json'.format(record['version'], record['commit']))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(record, f, indent=1, sort_keys=True)
+    print("wrote", path)
+
+def compare(args):
+    with open(args.compare[0]) as f:
+        old = json.load(f)
+    with open(args.compare[1]) as f:
+        new = json.load(f)
+    print("{} ({}) -> {} ({})".format(old['commit'], old['version'], new['commit'], new['version']))
+    worse = []
+    for name in sorted(set(old['results']) & set(new['results'])):
+        ratio = new['results'][name]['min'] / old['results'][name]['min']
+        flag = ''
+        if ratio > args.threshold:
+            flag = '  SLOWER'
+            worse.append(name)
+        elif ratio < 1 / args.threshold:
+            flag = '  faster'
+        print("{:45} {:10.2f} {:10.2f} us  x{:.2f}{}".format(name, old['results'][name]['min'] * 1e6, new['results'][name]['min'] * 1e6, ratio, flag))
+    return 1 if worse else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-b', '--bench', default=None)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('-o', '--output', default=None)
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    parser.add_argument('--threshold', type=float, default=1.1)
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(compare(args))
+    run(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Microbenchmarks for the library's hot paths
+
+Laid out the way asv expects: each ``Time*`` class has a ``setup`` that
+builds its fixtures from fixed seeds, and each ``time_*`` method is one
+benchmark. Classes with ``params`` run once per value. Run them with
+``run_suite.py`` (or point asv at this directory).
+"""
+
+import random
+import urllib.parse
+
+import _sqrl
+from sqrlserver import Nut, Url, Request, Response
+from sqrlserver.corpus import answer
+
+IPADDR = '127.0.0.1'
+
+class TimeNut(object):
+    def setup(self):
+        self.nut = Nut(_sqrl.KEY).generate(IPADDR, 1)
+        self.qr = self.nut.toString('qr')
+        self.loaded = Nut(_sqrl.KEY).load(self.qr)
+
+    def time_generate(self):
+        Nut(_sqrl.KEY).generate(IPADDR, 1, timestamp=1500000000)
+
+    def time_load(self):
+        Nut(_sqrl.KEY).load(self.qr)
+
+    def time_validate(self):
+        self.loaded.validate(IPADDR, 600, maxcounter=10)
+
+    def time_tostring(self):
+        self.nut.toString('qr')
+
+class TimeUrl(object):
+    def setup(self):
+        self.url = Url('example.com')
+        self.nut = Nut(_sqrl.KEY).generate(IPADDR, 1)
+
+    def time_generate(self):
+        self.url.generate('/sqrl', nut=self.nut, ext=5)
+
+class TimeResponse(object):
+    def setup(self):
+        self.response = Response().tifOn(0x01, 0x04)
+        self.response.addParam('nut', Nut(_sqrl.KEY).generate(IPADDR, 1).toString('qr'))
+        self.response.addParam('qry', '/sqrl?nut=' + self.response.params['nut'])
+        self.response.addParam('suk', _sqrl.b64u(bytes(32)))
+
+    def time_tostring(self):
+        self.response.toString()
+
+    def time_hmac(self):
+        self.response.hmac(_sqrl.KEY)
+
+class TimeParsing(object):
+    def setup(self):
+        params = dict(urllib.parse.parse_qsl(_sqrl.first_request(_sqrl.identity(1), 1)[1].decode('ascii')))
+        self.client = params['client']
+        self.server = params['server']
+        self.ids = params['ids']
+        self.idk = Request._extract_client(self.client)['idk']
+
+    def time_extract_client(self):
+        Request._extract_client(self.client)
+
+    def time_extract_server(self):
+        Request._extract_server(self.server)
+
+    def time_signature_valid(self):
+        Request._signature_valid(self.client + self.server, self.idk, self.ids)
+
+class TimeCommands(object):
+    """A whole request, from ``handle`` through ``finalize``"""
+
+    params = ['query', 'ident', 'disable', 'enable', 'remove']
+    param_names = ['cmd']
+
+    def setup(self, cmd):
+        rand = random.Random(cmd)
+        sk = _sqrl.identity(rand.randrange(1, 2**64))
+        unlock = _sqrl.identity(rand.randrange(1, 2**64))
+        self.vuk = _sqrl.b64u(bytes(unlock.verify_key))
+        nut = Nut(_sqrl.KEY).generate(IPADDR, 1)
+        server = _sqrl.b64u(Url('example.com').generate('/sqrl', nut=nut))
+        body = _sqrl.signed_body(sk, server, cmd=cmd, unlock=unlock if cmd in ['enable', 'remove'] else None)
+        self.request = dict(urllib.parse.parse_qsl(body.decode('ascii')))
+        self.request['nut'] = nut.toString('qr')
+        #make sure the fixture really succeeds
+        response = self.run()
+        assert not response._tif & 0xC0, (cmd, response)
+
+    def run(self):
+        req = Request(_sqrl.KEY, self.request, ipaddr=IPADDR)
+        req.handle()
+        while req.state == 'ACTION':
+            req.handle(answer(req, self.vuk))
+        return req.finalize(counter=2)
+
+    def time_request(self, cmd):
+        self.run()
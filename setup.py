@@ -63,11 +63,16 @@ setup(
         # that you indicate whether you support Python 2, Python 3 or both.
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12',
     ],
 
+    # Lazy imports need module __getattr__ (3.7), and the test client uses
+    # random.randbytes (3.9).
+    python_requires='>=3.9',
+
     # What does your project relate to?
     keywords='SQRL authentication crypotgraphy signature verification',
 
@@ -1,8 +1,35 @@
-from .nut import *
-from .request import *
-from .response import *
-from .url import *
-from .utils import *
+import importlib
 
 __version__ = '0.1.0'
 
+#public names and the modules they come from, imported on first use (PEP 562)
+#so that ``import sqrlserver`` costs next to nothing
+_exports = {
+    'Nut': 'nut',
+    'NutCache': 'nut',
+    'Request': 'request',
+    'Response': 'response',
+    'Url': 'url',
+    'pad': 'utils',
+    'depad': 'utils',
+    'stripurl': 'utils',
+    'addquery': 'utils',
+    'delquery': 'utils',
+}
+#modules that used to be imported eagerly, and so were always attributes
+_modules = ['nut', 'request', 'response', 'url', 'utils']
+
+__all__ = sorted(_exports)
+
+def __getattr__(name):
+    if name in _exports:
+        value = getattr(importlib.import_module('.' + _exports[name], __name__), name)
+    elif name in _modules:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_modules))
@@ -0,0 +1,79 @@
+"""Runs the built-in benchmarks
+
+Usage::
+
+    python -m sqrlserver [BENCHMARK ...] [-n ITERATIONS] [-t THREADS] [-p PROCESSES]
+                         [--profile cprofile|sample] [-o FILE] [--list] [--env]
+
+With no names, every benchmark runs. The environment (versions, CPU) is
+printed first so results from different hosts can be compared.
+``--profile cprofile`` saves pstats to FILE (default
+``sqrlserver.prof``); ``--profile sample`` samples the stacks every
+millisecond and saves them collapsed for flamegraphs (default
+``sqrlserver.collapsed``). Profiling runs in this process only, and
+cProfile only sees the calling thread, so it needs ``-t 1``.
+"""
+
+import argparse
+import sys
+
+from .bench import BENCHMARKS, Sampler, environment, run
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sqrlserver', description=__doc__.splitlines()[0])
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK')
+    parser.add_argument('-n', '--iterations', type=int, default=2000)
+    parser.add_argument('-t', '--threads', type=int, default=1)
+    parser.add_argument('-p', '--processes', type=int, default=1)
+    parser.add_argument('--profile', choices=['cprofile', 'sample'])
+    parser.add_argument('-o', '--output', default=None)
+    parser.add_argument('--list', action='store_true', help="list the benchmarks and exit")
+    parser.add_argument('--env', action='store_true', help="print the environment and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (description, prepare) in BENCHMARKS.items():
+            print("{:16} {}".format(name, description))
+        return 0
+    for name, value in environment():
+        print("{:12} {}".format(name + ':', value))
+    if args.env:
+        return 0
+    names = args.benchmarks or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark {} (see --list)".format(name))
+    if ( (args.profile is not None) and (args.processes > 1) ):
+        parser.error("--profile needs a single process")
+    if ( (args.profile == 'cprofile') and (args.threads > 1) ):
+        #cProfile only watches the thread that enabled it
+        parser.error("--profile cprofile needs a single thread; use --profile sample")
+    print()
+    print("{:16} {:>8} {:>9} {:>12} {:>10}".format('benchmark', 'workers', 'ops', 'ops/s', 'us/op'))
+
+    profiler = None
+    if args.profile == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif args.profile == 'sample':
+        profiler = Sampler()
+        profiler.start()
+    for name in names:
+        result = run(name, args.iterations, threads=args.threads, processes=args.processes)
+        print("{:16} {:>8} {:>9} {:>12.0f} {:>10.1f}".format(name, args.threads * args.processes, result['ops'], result['rate'], result['us']))
+        sys.stdout.flush()
+    if args.profile == 'cprofile':
+        profiler.disable()
+        output = args.output or 'sqrlserver.prof'
+        profiler.dump_stats(output)
+        print("profile written to", output)
+    elif args.profile == 'sample':
+        profiler.stop()
+        output = args.output or 'sqrlserver.collapsed'
+        profiler.write(output)
+        print("collapsed stacks written to", output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+from .request import Request
+from .response import Response
+from .form import FormParser, FormError
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import inspect
+import urllib.parse
+
+_BUSY = object()
+
+class AsgiApp(object):
+    """An ASGI application that answers SQRL requests
+
+    Works like :py:class:`.WsgiApp`, but never blocks the event loop on
+    cryptography. The body is read and parsed as it arrives, and the
+    well-formedness checks run inline. Signature verification and nut
+    decryption (and the nut encryption when finalizing) run in an
+    executor.
+
+    At most ``maxpending`` requests may be waiting on the executor at
+    once. When that limit is reached, new requests are answered right
+    away with the transient error TIF (0x20 + 0x40), and the client
+    simply retries. That answer is prebuilt and carries no nut, so
+    turning a request away costs no cryptography. A request already
+    admitted (whose ``vuk`` check or finalizing finds the executor full)
+    waits for a place instead, since its actions may already be stored.
+
+    Args:
+        key (bytes) : The 32-byte key used to encrypt nuts.
+        resolver (callable) : Called as ``await resolver(request)`` each
+            time the request is in the ``ACTION`` state. It must return
+            the dictionary to pass to :py:meth:`.Request.handle`. A plain
+            function returning the dictionary also works, but will block
+            the loop while it runs.
+        counter (callable) : Called with no arguments to get the counter
+            for each new nut. May return an int or an awaitable.
+
+    Keyword Args:
+        executor (Executor) : Where to run the cryptography. Defaults to
+            a thread pool (PyNaCl releases the GIL) that is shut down with
+            the ASGI lifespan.
+        workers (uint) : Size of the default thread pool. Defaults to the
+            executor's own default.
+        maxpending (uint) : Maximum requests queued on or running in the
+            executor. Defaults to 64.
+        limits (dict) : Field limits for :py:class:`.FormParser`.
+        idempotency (IdempotencyCache) : If given, exact duplicates of a
+            recent request get the response already sent for it, and
+            duplicates of one in progress wait for it.
+
+    Any other keyword arguments (``ttl``, ``maxcounter``, ``mincounter``,
+    etc.) are passed to every :py:class:`.Request`.
+
+    Attributes:
+        pending (uint) : Requests currently waiting on the executor.
+        rejected (uint) : Requests answered with a transient error because
+            the executor was full.
+    """
+
+    _headers = [(b'content-type', b'text/plain; charset=utf-8'), (b'cache-control', b'no-store')]
+
+    def __init__(self, key, resolver, counter, executor=None, workers=None, maxpending=64, limits=None, idempotency=None, **kwargs):
+        assert len(key) == 32
+        self.key = key
+        self.resolver = resolver
+        self.counter = counter
+        self.maxpending = maxpending
+        self.limits = limits
+        self.idempotency = idempotency
+        self.options = kwargs
+        self._ownexecutor = executor is None
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sqrl')
+        self.executor = executor
+        self.pending = 0
+        self.rejected = 0
+        #admitted requests waiting for a place in the executor
+        self._waiters = collections.deque()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError("Only the 'http' and 'lifespan' scopes are supported.")
+        if scope['method'] != 'POST':
+            await send({'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'POST'), (b'content-length', b'0')]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        parser = FormParser(limits=self.limits)
+        try:
+            for name, value in scope.get('headers', []):
+                if ( (name == b'content-length') and (int(value) > parser.maxlength) ):
+                    raise FormError("The request body is too long.")
+            more = True
+            while more:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                parser.feed(message.get('body', b''))
+                more = message.get('more_body', False)
+            params = parser.close()
+        except ValueError:
+            #a FormError, or a garbled Content-Length
+            return await self._respond(send, 400, Response.failure())
+
+        query = scope.get('query_string', b'').decode('latin-1')
+        for name, value in urllib.parse.parse_qsl(query):
+            if name not in params:
+                params[name] = value
+
+        client = scope.get('client')
+        ipaddr = client[0] if client else '0.0.0.0'
+        secure = scope.get('scheme') == 'https'
+        req = Request(self.key, params, ipaddr=ipaddr, secure=secure, **self.options)
+        if self.idempotency is not None:
+            response = await self.idempotency.get_async(self.idempotency.key(params, ipaddr), lambda: self.process(req), request=req)
+        else:
+            response = await self.process(req)
+        await self._respond(send, 200, response)
+
+    async def process(self, req):
+        """Runs a request to completion and finalizes it
+
+        Args:
+            req (Request) : A new request.
+
+        Returns:
+            Response
+        """
+
+        #Cheap parsing happens here; only valid-looking requests
+        #take up a place in the executor.
+        if req.parse():
+            if await self._offload(req.handle) is _BUSY:
+                #turned away before any work, so nothing to encrypt either
+                self.rejected += 1
+                req.reject('busy', 0x20, 0x40)
+                return Response().tifOn(0x20, 0x40)
+
+        while req.state == 'ACTION':
+            args = self.resolver(req)
+            if inspect.isawaitable(args):
+                args = await args
+            #only the 'vuk' action verifies a signature
+            if any([action[0] == 'vuk' for action in req.action]):
+                await self._offload(req.handle, args, wait=True)
+            else:
+                req.handle(args)
+
+        counter = self.counter()
+        if inspect.isawaitable(counter):
+            counter = await counter
+        return await self._offload(functools.partial(req.finalize, failsafe=True, counter=counter), wait=True)
+
+    async def _offload(self, fn, *args, wait=False):
+        """Runs fn in the executor
+
+        If it's full, returns ``_BUSY``, or with ``wait`` waits for a place.
+        """
+
+        loop = asyncio.get_running_loop()
+        while self.pending >= self.maxpending:
+            if not wait:
+                return _BUSY
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            await waiter
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+            #wake the first admitted request still waiting
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    break
+
+    async def _respond(self, send, status, response):
+        body = response.toString().encode('ascii')
+        await send({'type': 'http.response.start', 'status': status, 'headers': self._headers + [(b'content-length', str(len(body)).encode('ascii'))]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._ownexecutor:
+                    self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,209 @@
+"""Built-in benchmarks, environment report and profilers for ``python -m sqrlserver``"""
+
+from .client import Client, _b64u
+from .corpus import answer
+from .nut import Nut
+from .request import Request
+from .url import Url
+from .wsgi import WsgiApp
+import collections
+import ctypes
+import ctypes.util
+import multiprocessing
+import os
+import platform
+import sys
+import threading
+import time
+import urllib.parse
+
+KEY = bytes(range(32))
+IPADDR = '127.0.0.1'
+
+VUK = _b64u(bytes(32))
+
+def _answer(req):
+    return answer(req, VUK)
+
+def _nutGenerate(n):
+    nut = Nut(KEY)
+    return lambda i: nut.generate(IPADDR, i)
+
+def _nutValidate(n):
+    nuts = [Nut(KEY).generate(IPADDR, i).toString('qr') for i in range(n)]
+    return lambda i: Nut(KEY).load(nuts[i]).validate(IPADDR, 600)
+
+def _urlGenerate(n):
+    url = Url('example.com')
+    nut = Nut(KEY).generate(IPADDR, 1)
+    return lambda i: url.generate('/sqrl', nut=nut)
+
+def _flow(cmd, keys=False):
+    def prepare(n):
+        #sign everything up front so only the server side is timed
+        url = Url('example.com')
+        bodies = []
+        for i in range(n):
+            qs, body = Client(url.generate('/sqrl', nut=Nut(KEY).generate(IPADDR, i)), seed=i).request(cmd, keys=keys)
+            bodies.append(dict(urllib.parse.parse_qsl(qs) + urllib.parse.parse_qsl(body.decode('ascii'))))
+        app = WsgiApp(KEY, _answer, lambda: 1)
+        return lambda i: app.process(Request(KEY, bodies[i], ipaddr=IPADDR))
+    return prepare
+
+#name: (description, prepare); prepare(n) returns the operation to time, taking 0 to n-1
+BENCHMARKS = collections.OrderedDict([
+    ('nut.generate', ("Generate and encrypt a nut", _nutGenerate)),
+    ('nut.validate', ("Decrypt and validate a nut", _nutValidate)),
+    ('url.generate', ("Build a sqrl:// URL around a nut", _urlGenerate)),
+    ('request.query', ("Full query: parse, verify, resolve, finalize", _flow('query'))),
+    ('request.ident', ("Full ident with suk and vuk", _flow('ident', keys=True))),
+])
+
+def environment():
+    """Describes the host, so that numbers from different machines can be compared
+
+    Returns:
+        list : ``(name, value)`` pairs.
+    """
+
+    import nacl
+    import bitstring
+    from . import __version__
+
+    cpu = platform.processor() or platform.machine()
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    cpu = line.split(':', 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    usable = os.cpu_count()
+    if hasattr(os, 'sched_getaffinity'):
+        usable = len(os.sched_getaffinity(0))
+    #PyNaCl doesn't expose the version of the libsodium it bundles
+    system = 'not found'
+    path = ctypes.util.find_library('sodium')
+    if path is not None:
+        try:
+            lib = ctypes.CDLL(path)
+            lib.sodium_version_string.restype = ctypes.c_char_p
+            system = lib.sodium_version_string().decode('ascii')
+        except (OSError, AttributeError):
+            system = path
+    return [
+        ('sqrlserver', __version__),
+        ('python', '{} {}'.format(platform.python_implementation(), platform.python_version())),
+        ('platform', platform.platform()),
+        ('cpu', cpu),
+        ('cpus', '{} ({} usable)'.format(os.cpu_count(), usable)),
+        ('pynacl', nacl.__version__),
+        ('libsodium', 'bundled with PyNaCl unless built with SODIUM_INSTALL=system; system library {}'.format(system)),
+        ('bitstring', bitstring.__version__),
+    ]
+
+def _worker(name, n):
+    """Times ``n`` operations of one benchmark; returns the seconds taken"""
+
+    op = BENCHMARKS[name][1](n)
+    start = time.perf_counter()
+    for i in range(n):
+        op(i)
+    return time.perf_counter() - start
+
+def _threaded(name, n, threads):
+    """Runs ``threads`` workers of ``n`` operations each; returns their times"""
+
+    if threads == 1:
+        return [_worker(name, n)]
+    times = [None] * threads
+    def run(t):
+        times[t] = _worker(name, n)
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return times
+
+def run(name, iterations, threads=1, processes=1):
+    """Runs one benchmark
+
+    The iterations are split evenly across ``processes`` processes of
+    ``threads`` threads each. Each worker prepares its inputs (signing
+    requests, say) before its clock starts.
+
+    Args:
+        name (string) : One of ``BENCHMARKS``.
+        iterations (uint) : Total operations.
+
+    Keyword Args:
+        threads (uint) : Threads per process. Defaults to 1.
+        processes (uint) : Processes. Defaults to 1, which runs in this
+            process.
+
+    Returns:
+        dict : ``ops`` done, ``wall`` seconds for all of them (the
+        slowest worker), ``rate`` in operations per second, and ``us``,
+        the mean microseconds per operation within a worker.
+    """
+
+    if name not in BENCHMARKS:
+        raise ValueError("Unknown benchmark {}. Choose from {}.".format(name, ', '.join(BENCHMARKS)))
+    if ( (threads < 1) or (processes < 1) ):
+        raise ValueError("threads and processes must be at least 1")
+    n = max(1, iterations // (threads * processes))
+    if processes == 1:
+        times = _threaded(name, n, threads)
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            times = sum(pool.starmap(_threaded, [(name, n, threads)] * processes), [])
+    ops = n * len(times)
+    wall = max(times)
+    return {'ops': ops, 'wall': wall, 'rate': ops / wall, 'us': sum(times) / ops * 1e6}
+
+class Sampler(object):
+    """A sampling profiler that writes collapsed stacks
+
+    A background thread looks at every other thread's stack each
+    ``interval`` seconds. The result is the "collapsed" format that
+    ``flamegraph.pl`` and speedscope read: one line per distinct stack,
+    frames from outermost to innermost joined with ``;``, then the
+    number of samples.
+
+    Keyword Args:
+        interval (float) : Seconds between samples. Defaults to 0.001.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('{}:{}'.format(os.path.basename(code.co_filename), code.co_name))
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write('{} {}\n'.format(stack, count))
@@ -0,0 +1,458 @@
+from .pending import PendingAuth
+from .utils import depad
+from base64 import urlsafe_b64encode
+import collections
+import os
+import queue
+import selectors
+import socket
+import struct
+import threading
+import time
+
+#Every frame is a header followed by ``length`` bytes of payload.
+#    op (1 byte), counter (8 bytes), length (2 bytes), network order
+_header = struct.Struct('!BQH')
+#LINK carries the new counter as its payload
+_counter = struct.Struct('!Q')
+#nut counters are 32 bits wide
+_COUNTERS = 2**32
+
+SUBSCRIBE = 1
+UNSUBSCRIBE = 2
+PUBLISH = 3
+LINK = 4
+NOTIFY = 5
+#asks for (and, coming back, grants) a block of nut counters
+ALLOC = 6
+
+def _frame(op, counter, payload=b''):
+    return _header.pack(op, counter, len(payload)) + payload
+
+def _frames(buf):
+    """Splits complete frames off the front of ``buf``
+
+    Returns:
+        tuple : A list of ``(op, counter, payload)`` and the number of
+        bytes consumed.
+    """
+
+    frames = []
+    pos = 0
+    while len(buf) - pos >= _header.size:
+        op, counter, length = _header.unpack_from(buf, pos)
+        end = pos + _header.size + length
+        if end > len(buf):
+            break
+        frames.append((op, counter, bytes(buf[pos + _header.size:end])))
+        pos = end
+    return frames, pos
+
+class _Conn(object):
+    __slots__ = ('sock', 'inbuf', 'outbuf', 'subs')
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbuf = bytearray()
+        self.outbuf = bytearray()
+        self.subs = set()
+
+class BusServer(object):
+    """A single-host broker for pending-auth notifications
+
+    Lets worker processes share one :py:class:`.PendingAuth`: a worker
+    that completes ``ident`` publishes, and whichever worker holds the
+    browser's long-poll is notified. Clients connect with
+    :py:class:`BusClient` over a Unix domain socket.
+
+    The broker remembers links and published results for ``ttl``
+    seconds, so a browser that starts waiting after the phone has
+    finished still hears about it. Links are only kept for nuts someone
+    has subscribed to, so register the QR nut before showing it.
+
+    Notifications are matched by nut counter alone, so the broker is
+    also the host's counter source: it hands each client blocks of
+    counters (see :py:meth:`BusClient.counter`) and no two workers ever
+    issue the same one.
+
+    Args:
+        path (string) : Filesystem path of the socket. An existing file
+            at that path is replaced.
+
+    Keyword Args:
+        ttl (uint) : Seconds to remember links and results. Defaults to
+            600.
+        first (uint) : The first counter handed out. Defaults to 0. If
+            the broker restarts while nuts it counted are still live,
+            start past them (the current time in seconds will do).
+
+    Attributes:
+        published (uint) : PUBLISH frames received.
+        notified (uint) : NOTIFY frames sent.
+    """
+
+    def __init__(self, path, ttl=600, first=0):
+        self.path = path
+        self.ttl = ttl
+        self._nextcounter = first % _COUNTERS
+        self.published = 0
+        self.notified = 0
+        if os.path.exists(path):
+            os.unlink(path)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(path)
+        self._listener.listen(128)
+        self._listener.setblocking(False)
+        self._wakeup, self._waker = socket.socketpair()
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ)
+        self._selector.register(self._wakeup, selectors.EVENT_READ)
+        self._closed = False
+        self._thread = None
+        #root counter -> list of (conn, subscribed counter)
+        self._subs = {}
+        #alias counter -> root counter
+        self._aliases = {}
+        #root counter -> published payload
+        self._results = {}
+        #(deadline, table, counter), in deadline order because ttl is fixed
+        self._expiry = collections.deque()
+
+    def start(self):
+        """Runs :py:meth:`serve_forever` in a daemon thread
+
+        Returns:
+            BusServer : self
+        """
+
+        self._thread = threading.Thread(target=self.serve_forever, name='sqrl-bus', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Runs the broker until :py:meth:`close` is called"""
+
+        try:
+            while not self._closed:
+                for key, events in self._selector.select(timeout=1):
+                    if key.fileobj is self._listener:
+                        self._accept()
+                    elif key.fileobj is self._wakeup:
+                        self._wakeup.recv(64)
+                    else:
+                        if events & selectors.EVENT_WRITE:
+                            self._flush(key.data)
+                        if events & selectors.EVENT_READ:
+                            self._read(key.data)
+                self._evict()
+        finally:
+            for key in list(self._selector.get_map().values()):
+                key.fileobj.close()
+            self._selector.close()
+            self._waker.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def close(self):
+        """Stops the broker and removes the socket file"""
+
+        self._closed = True
+        try:
+            self._waker.send(b'x')
+        except OSError:
+            pass
+        if ( (self._thread is not None) and (self._thread is not threading.current_thread()) ):
+            self._thread.join()
+
+    def _accept(self):
+        try:
+            sock, addr = self._listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        self._selector.register(sock, selectors.EVENT_READ, _Conn(sock))
+
+    def _read(self, conn):
+        try:
+            data = conn.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            return self._drop(conn)
+        conn.inbuf += data
+        frames, used = _frames(conn.inbuf)
+        del conn.inbuf[:used]
+        for op, counter, payload in frames:
+            if op == SUBSCRIBE:
+                self._subscribe(conn, counter)
+            elif op == UNSUBSCRIBE:
+                self._unsubscribe(conn, counter)
+            elif op == PUBLISH:
+                self._publish(counter, payload)
+            elif ( (op == LINK) and (len(payload) == _counter.size) ):
+                self._link(counter, _counter.unpack(payload)[0])
+            elif ( (op == ALLOC) and (0 < counter < _COUNTERS) ):
+                self._alloc(conn, counter)
+            else:
+                #speaking some other protocol; hang up
+                return self._drop(conn)
+
+    def _root(self, counter):
+        return self._aliases.get(counter, counter)
+
+    def _subscribe(self, conn, counter):
+        root = self._root(counter)
+        if root in self._results:
+            return self._notify(conn, counter, self._results[root])
+        self._subs.setdefault(root, []).append((conn, counter))
+        conn.subs.add(root)
+
+    def _unsubscribe(self, conn, counter):
+        root = self._root(counter)
+        subs = self._subs.get(root)
+        if subs:
+            subs[:] = [s for s in subs if s != (conn, counter)]
+            if not subs:
+                del self._subs[root]
+                conn.subs.discard(root)
+
+    def _publish(self, counter, payload):
+        self.published += 1
+        root = self._root(counter)
+        if root in self._results:
+            return
+        self._results[root] = payload
+        self._expiry.append((time.monotonic() + self.ttl, self._results, root))
+        for conn, subscribed in self._subs.pop(root, []):
+            conn.subs.discard(root)
+            self._notify(conn, subscribed, payload)
+
+    def _link(self, counter, newcounter):
+        #only chains that start at a subscribed nut are worth remembering
+        if ( (counter not in self._aliases) and (counter not in self._subs) ):
+            return
+        root = self._root(counter)
+        if ( (newcounter == root) or (newcounter in self._aliases) ):
+            return
+        self._aliases[newcounter] = root
+        self._expiry.append((time.monotonic() + self.ttl, self._aliases, newcounter))
+        #someone may already be waiting on the new counter
+        subs = self._subs.pop(newcounter, None)
+        if subs:
+            for conn, subscribed in subs:
+                conn.subs.discard(newcounter)
+                self._subscribe(conn, subscribed)
+
+    def _alloc(self, conn, size):
+        self._send(conn, _frame(ALLOC, self._nextcounter))
+        self._nextcounter = (self._nextcounter + size) % _COUNTERS
+
+    def _notify(self, conn, counter, payload):
+        self.notified += 1
+        self._send(conn, _frame(NOTIFY, counter, payload))
+
+    def _send(self, conn, data):
+        if conn.outbuf:
+            conn.outbuf += data
+            return
+        try:
+            sent = conn.sock.send(data)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            return self._drop(conn)
+        if sent < len(data):
+            conn.outbuf += data[sent:]
+            self._selector.modify(conn.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, conn)
+
+    def _flush(self, conn):
+        try:
+            sent = conn.sock.send(conn.outbuf)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            return self._drop(conn)
+        del conn.outbuf[:sent]
+        if not conn.outbuf:
+            self._selector.modify(conn.sock, selectors.EVENT_READ, conn)
+
+    def _drop(self, conn):
+        try:
+            self._selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            return
+        conn.sock.close()
+        for root in conn.subs:
+            subs = self._subs.get(root)
+            if subs:
+                subs[:] = [s for s in subs if s[0] is not conn]
+                if not subs:
+                    del self._subs[root]
+        conn.subs = set()
+
+    def _evict(self):
+        now = time.monotonic()
+        while ( (self._expiry) and (self._expiry[0][0] <= now) ):
+            deadline, table, counter = self._expiry.popleft()
+            table.pop(counter, None)
+
+class BusClient(object):
+    """A worker's connection to a :py:class:`BusServer`
+
+    Has the same interface as :py:class:`.PendingAuth`, so it can be
+    passed to :py:class:`.Request` (or the ready-made endpoints) as
+    ``pending``. Registering subscribes with the broker, ``link`` and
+    ``signal`` are forwarded to it, and notifications are delivered to
+    local waiters by a background thread.
+
+    Values must be strings or bytes (``Request`` signals with the
+    ``idk``, which is 32 raw bytes with ``binary=True``). Bytes are sent,
+    and received, as their b64u string, the same form the client sent
+    them in; a bare ``signal(counter)`` is received as ``True``.
+
+    Every worker must take its nut counters from :py:meth:`counter`,
+    both for the nuts it shows and as the endpoint's counter: the
+    broker tells logins apart by counter only, and separate
+    :py:class:`.Counter` instances in each worker would hand out the
+    same values.
+
+    Args:
+        path (string) : The broker's socket path.
+
+    Keyword Args:
+        ttl (uint) : Seconds a local registration lives. Defaults to 600.
+        timeout (float) : Seconds to keep retrying the connection while
+            the broker starts up, and to wait for a block of counters.
+            Defaults to 5.
+        block (uint) : Counters reserved from the broker at a time.
+            Defaults to 1024.
+    """
+
+    def __init__(self, path, ttl=600, timeout=5, block=1024):
+        assert 0 < block < _COUNTERS
+        self.local = PendingAuth(ttl=ttl)
+        self.timeout = timeout
+        self.block = block
+        deadline = time.monotonic() + timeout
+        while True:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self._sock.connect(path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                self._sock.close()
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.01)
+        self._lock = threading.Lock()
+        self._counterlock = threading.Lock()
+        self._nextcounter = self._endcounter = 0
+        self._blocks = queue.Queue()
+        self._reader = threading.Thread(target=self._read, name='sqrl-bus-client', daemon=True)
+        self._reader.start()
+
+    def __contains__(self, counter):
+        return counter in self.local
+
+    def __len__(self):
+        return len(self.local)
+
+    def counter(self):
+        """Returns the next nut counter, unique across the broker's clients
+
+        Pass the bound method wherever the library asks for a counter
+        provider. Counters come from a block reserved on the broker;
+        when it runs out, this waits for the next one.
+
+        Raises:
+            ConnectionError : If the broker doesn't answer within
+                ``timeout``.
+        """
+
+        with self._counterlock:
+            if self._nextcounter == self._endcounter:
+                self._send(_frame(ALLOC, self.block))
+                try:
+                    first = self._blocks.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise ConnectionError("The bus broker sent no counters.")
+                self._nextcounter, self._endcounter = first, first + self.block
+            value = self._nextcounter
+            self._nextcounter += 1
+        return value % _COUNTERS
+
+    def register(self, counter, ttl=None):
+        """Tracks a nut locally and subscribes to it"""
+
+        self.local.register(counter, ttl=ttl)
+        self._send(_frame(SUBSCRIBE, counter))
+
+    def link(self, counter, newcounter):
+        """Links two nuts on the broker (see :py:meth:`.PendingAuth.link`)"""
+
+        self.local.link(counter, newcounter)
+        self._send(_frame(LINK, counter, _counter.pack(newcounter)))
+
+    def signal(self, counter, value=True):
+        """Publishes a completed login to every worker
+
+        Returns:
+            bool : Always True; the broker doesn't acknowledge.
+        """
+
+        if value is True:
+            payload = b''
+        elif isinstance(value, bytes):
+            payload = depad(urlsafe_b64encode(value).decode('utf-8')).encode('utf-8')
+        else:
+            payload = value.encode('utf-8')
+        self._send(_frame(PUBLISH, counter, payload))
+        return True
+
+    def discard(self, counter):
+        """Stops tracking a nut and unsubscribes from it"""
+
+        self.local.discard(counter)
+        self._send(_frame(UNSUBSCRIBE, counter))
+
+    def wait(self, counter, timeout=None):
+        """See :py:meth:`.PendingAuth.wait`"""
+        return self.local.wait(counter, timeout=timeout)
+
+    async def wait_async(self, counter, timeout=None):
+        """See :py:meth:`.PendingAuth.wait_async`"""
+        return await self.local.wait_async(counter, timeout=timeout)
+
+    def close(self):
+        """Disconnects from the broker"""
+
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self._reader.join()
+
+    def _send(self, data):
+        with self._lock:
+            self._sock.sendall(data)
+
+    def _read(self):
+        buf = bytearray()
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            buf += data
+            frames, used = _frames(buf)
+            del buf[:used]
+            for op, counter, payload in frames:
+                if op == NOTIFY:
+                    self.local.signal(counter, payload.decode('utf-8') if payload else True)
+                elif op == ALLOC:
+                    self._blocks.put(counter)
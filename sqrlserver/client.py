@@ -0,0 +1,238 @@
+from .utils import pad, depad
+from .request import Request
+from .wsgi import WsgiApp
+import io
+import random
+import urllib.parse
+import nacl.signing
+import nacl.utils
+from base64 import urlsafe_b64encode
+
+def _b64u(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return depad(urlsafe_b64encode(data).decode('ascii'))
+
+class Client(object):
+    """A simulated SQRL client, for tests and load generation
+
+    Holds an identity and signs requests the way a real client would,
+    for every command. Each response is remembered, so the next request
+    echoes it as ``server`` and goes to its ``qry`` with its new nut,
+    exactly as a phone walking through a login does.
+
+    The keys are simplified: the Identity Unlock Key is an Ed25519 key
+    whose public half is sent as the ``vuk`` (and signs ``urs``), and
+    the ``suk`` is random. That is all a server can check.
+
+    Args:
+        url (string) : The ``sqrl://`` URL from the login page, nut
+            included.
+
+    Keyword Args:
+        seed (int) : Derives the keys deterministically. Defaults to
+            None, which uses random keys.
+
+    Attributes:
+        tif (int) : The TIF of the last response, or None.
+        last (dict) : The last response's parsed parameters.
+    """
+
+    def __init__(self, url, seed=None):
+        self._rand = None if seed is None else random.Random(seed)
+        self.sk = self._key()
+        self.unlock = self._key()
+        self.suk = self._bytes()
+        self.previous = None
+        self.server = _b64u(url)
+        self.qs = urllib.parse.urlparse(url).query
+        self.tif = None
+        self.last = None
+
+    def _bytes(self):
+        if self._rand is None:
+            return nacl.utils.random(32)
+        return self._rand.randbytes(32)
+
+    def _key(self):
+        return nacl.signing.SigningKey(self._bytes())
+
+    @property
+    def idk(self):
+        """The b64u Identity Key"""
+        return _b64u(bytes(self.sk.verify_key))
+
+    @property
+    def vuk(self):
+        """The b64u Verify Unlock Key"""
+        return _b64u(bytes(self.unlock.verify_key))
+
+    def rekey(self):
+        """Replaces the identity, keeping the old one as the previous identity"""
+
+        self.previous = self.sk
+        self.sk = self._key()
+        self.unlock = self._key()
+        self.suk = self._bytes()
+
+    def request(self, cmd, opts=(), keys=False, unlock=False):
+        """Builds the next request
+
+        Args:
+            cmd (string) : The command.
+
+        Keyword Args:
+            opts (list) : Options to send, such as ``suk`` or ``cps``.
+            keys (bool) : Whether to send ``suk`` and ``vuk`` (enrolling
+                with ``ident``).
+            unlock (bool) : Whether to sign with the unlock key
+                (``urs``), as ``enable`` and ``remove`` need.
+
+        Returns:
+            tuple : ``(query_string, body)``, the bytes of the
+            url-encoded POST body.
+        """
+
+        lines = ['ver=1', 'cmd=' + cmd, 'idk=' + self.idk]
+        if self.previous is not None:
+            lines.append('pidk=' + _b64u(bytes(self.previous.verify_key)))
+        if keys:
+            lines.append('suk=' + _b64u(self.suk))
+            lines.append('vuk=' + self.vuk)
+        if opts:
+            lines.append('opt=' + '~'.join(opts))
+        client = _b64u('\r\n'.join(lines) + '\r\n')
+        msg = (client + self.server).encode('utf-8')
+        params = [('client', client), ('server', self.server), ('ids', _b64u(self.sk.sign(msg).signature))]
+        if self.previous is not None:
+            params.append(('pids', _b64u(self.previous.sign(msg).signature)))
+        if unlock:
+            params.append(('urs', _b64u(self.unlock.sign(msg).signature)))
+        return self.qs, urllib.parse.urlencode(params).encode('ascii')
+
+    def receive(self, text):
+        """Takes in a response body and prepares for the next request
+
+        Returns:
+            dict : The response's parameters.
+        """
+
+        self.last = Request._extract_server(pad(text))
+        self.server = text
+        self.tif = int(self.last['tif'], 16)
+        #failures that couldn't be finalized carry no new nut
+        if 'qry' in self.last:
+            self.qs = urllib.parse.urlparse(self.last['qry']).query
+        return self.last
+
+    def send(self, transport, cmd, **kwargs):
+        """Makes one round trip through ``transport``
+
+        Takes the keyword arguments of :py:meth:`request`.
+
+        Returns:
+            dict : The response's parameters.
+        """
+
+        return self.receive(transport(*self.request(cmd, **kwargs)))
+
+    async def send_async(self, transport, cmd, **kwargs):
+        """Like :py:meth:`send`, for an :py:class:`AsgiTransport`"""
+
+        return self.receive(await transport(*self.request(cmd, **kwargs)))
+
+class RequestTransport(object):
+    """Sends requests straight to :py:class:`.Request`, with no web layer
+
+    Requests run exactly as :py:meth:`.WsgiApp.process` runs them, minus
+    the environ and form parsing.
+
+    Args:
+        key (bytes) : The 32-byte nut key.
+        resolver (callable) : As for :py:class:`.WsgiApp`.
+        counter (callable) : As for :py:class:`.WsgiApp`.
+
+    Keyword Args:
+        ipaddr (string) : The client's address. Defaults to '127.0.0.1'.
+
+    Any other keyword arguments are passed to every Request.
+    """
+
+    def __init__(self, key, resolver, counter, ipaddr='127.0.0.1', **kwargs):
+        self.key = key
+        self.ipaddr = ipaddr
+        self.options = kwargs
+        self._app = WsgiApp(key, resolver, counter)
+
+    def __call__(self, qs, body):
+        params = dict(urllib.parse.parse_qsl(body.decode('ascii')))
+        for name, value in urllib.parse.parse_qsl(qs):
+            params.setdefault(name, value)
+        req = Request(self.key, params, ipaddr=self.ipaddr, **self.options)
+        return self._app.process(req).toString()
+
+class WsgiTransport(object):
+    """Calls a WSGI application the way a server would
+
+    Args:
+        app (callable) : The application, such as a :py:class:`.WsgiApp`.
+
+    Keyword Args:
+        ipaddr (string) : The client's address. Defaults to '127.0.0.1'.
+    """
+
+    def __init__(self, app, ipaddr='127.0.0.1'):
+        self.app = app
+        self.ipaddr = ipaddr
+
+    def __call__(self, qs, body):
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'QUERY_STRING': qs,
+            'CONTENT_LENGTH': str(len(body)),
+            'REMOTE_ADDR': self.ipaddr,
+            'wsgi.url_scheme': 'https',
+            'wsgi.input': io.BytesIO(body),
+        }
+        status = []
+        out = b''.join(self.app(environ, lambda s, h: status.append(s)))
+        if status[0] != '200 OK':
+            raise ValueError("The application answered {}".format(status[0]))
+        return out.decode('ascii')
+
+class AsgiTransport(object):
+    """Calls an ASGI application the way a server would
+
+    Args:
+        app (callable) : The application, such as an :py:class:`.AsgiApp`.
+
+    Keyword Args:
+        ipaddr (string) : The client's address. Defaults to '127.0.0.1'.
+    """
+
+    def __init__(self, app, ipaddr='127.0.0.1'):
+        self.app = app
+        self.ipaddr = ipaddr
+
+    async def __call__(self, qs, body):
+        scope = {
+            'type': 'http',
+            'method': 'POST',
+            'scheme': 'https',
+            'query_string': qs.encode('ascii'),
+            'headers': [(b'content-length', str(len(body)).encode('ascii'))],
+            'client': (self.ipaddr, 0),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        async def receive():
+            return messages.pop(0)
+        out = {'body': b''}
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                out['status'] = message['status']
+            else:
+                out['body'] += message['body']
+        await self.app(scope, receive, send)
+        if out['status'] != 200:
+            raise ValueError("The application answered {}".format(out['status']))
+        return out['body'].decode('ascii')
@@ -0,0 +1,168 @@
+from .nut import Nut
+from .url import Url
+from .client import Client, _b64u
+import mmap
+import os
+import random
+import struct
+import time
+import urllib.parse
+
+#magic, format version, record count, index offset, creation time, nut key
+_header = struct.Struct('<8sIIQQ32s')
+_HEADER_SIZE = 64
+#payload offset and length, expected TIF, kind, VUK the resolver answers with
+_entry = struct.Struct('<QIHBx32s')
+_MAGIC = b'SQRLCORP'
+_VERSION = 1
+
+#the address every recorded request comes from
+IPADDR = '127.0.0.1'
+
+#what each kind of record is, and the TIF it must produce
+KINDS = ('query', 'ident', 'disable', 'enable', 'remove', 'badsig', 'badnut', 'malformed', 'nounlock')
+_expected = {
+    'query': 0x05,
+    'ident': 0x05,
+    'disable': 0x0D,
+    'enable': 0x05,
+    'remove': 0x04,
+    'badsig': 0xC0,
+    'badnut': 0xE0,
+    'malformed': 0xC0,
+    'nounlock': 0xC4,
+}
+_valid = [('query', 4), ('ident', 3), ('disable', 1), ('enable', 1), ('remove', 1)]
+
+def answer(req, vuk):
+    """The resolver a corpus's expected TIFs assume
+
+    It knows every identity, agrees to every action, and answers
+    ``vuk`` (and ``suk``) with the record's VUK. The benchmarks use it
+    too, with a VUK of their own.
+    """
+
+    args = {}
+    for action in req.action:
+        if action[0] == 'find':
+            args['found'] = [True] * len(action[1])
+        elif action[0] == 'auth':
+            args['authenticated'] = True
+        elif action[0] == 'disable':
+            args['deactivated'] = True
+            args['suk'] = vuk
+        elif action[0] == 'vuk':
+            args['vuk'] = vuk
+        elif action[0] == 'enable':
+            args['activated'] = True
+        elif action[0] == 'remove':
+            args['removed'] = True
+        elif action[0] == 'suk':
+            args['suk'] = vuk
+    return args
+
+def record(path, count, key=None, invalid=0.1, seed=0):
+    """Writes a corpus of signed requests
+
+    Each record is one complete request (query string and form body
+    together, url-encoded), tagged with its kind and the TIF it should
+    produce when run through :py:class:`.Request` from ``IPADDR`` with
+    :py:func:`answer` as the resolver. Valid records are a mix of all
+    five commands; a share ``invalid`` of records are deliberately bad:
+    a corrupted signature, a nut that doesn't decrypt, a missing
+    signature, or an ``enable`` without the unlock signature.
+
+    Args:
+        path (string) : The file to write.
+        count (uint) : Number of records.
+
+    Keyword Args:
+        key (bytes) : The nut key. Defaults to random bytes; the key is
+            stored in the file either way.
+        invalid (float) : Share of invalid records. Defaults to 0.1.
+        seed (int) : Seeds the mix and the identities. Defaults to 0.
+    """
+
+    if key is None:
+        key = os.urandom(32)
+    rand = random.Random(seed)
+    kinds = []
+    for kind, weight in _valid:
+        kinds += [kind] * weight
+    url = Url('example.com')
+    index = []
+    with open(path, 'wb') as f:
+        f.write(bytes(_HEADER_SIZE))
+        offset = _HEADER_SIZE
+        for i in range(count):
+            if rand.random() < invalid:
+                kind = rand.choice(KINDS[len(_valid):])
+            else:
+                kind = rand.choice(kinds)
+            nut = Nut(key).generate(IPADDR, i)
+            client = Client(url.generate('/sqrl', nut=nut), seed=rand.getrandbits(64))
+            cmd = kind
+            if kind in ['badsig', 'badnut', 'malformed']:
+                cmd = 'query'
+            elif kind == 'nounlock':
+                cmd = 'enable'
+            qs, body = client.request(cmd, keys=(cmd == 'ident'), unlock=(kind in ['enable', 'remove']))
+            params = urllib.parse.parse_qsl(qs) + urllib.parse.parse_qsl(body.decode('ascii'))
+            if kind == 'badsig':
+                params = [(n, v[:10] + ('A' if v[10] != 'A' else 'B') + v[11:]) if n == 'ids' else (n, v) for n, v in params]
+            elif kind == 'badnut':
+                params = [(n, Nut(os.urandom(32)).generate(IPADDR, i).toString('qr')) if n == 'nut' else (n, v) for n, v in params]
+            elif kind == 'malformed':
+                params = [(n, v) for n, v in params if n != 'ids']
+            payload = urllib.parse.urlencode(params).encode('ascii')
+            f.write(payload)
+            index.append(_entry.pack(offset, len(payload), _expected[kind], KINDS.index(kind), bytes(client.unlock.verify_key)))
+            offset += len(payload)
+        f.write(b''.join(index))
+        f.seek(0)
+        f.write(_header.pack(_MAGIC, _VERSION, count, offset, int(time.time()), key))
+
+class Corpus(object):
+    """A recorded corpus, memory-mapped for replay
+
+    Every process that opens the same file shares its pages, so replay
+    workers cost no extra memory and no parsing up front. Records are
+    decoded only when indexed.
+
+    Args:
+        path (string) : A file written by :py:func:`record`.
+
+    Attributes:
+        key (bytes) : The nut key the records were made with.
+        created (uint) : When the corpus was recorded (Unix time). Replay
+            with a ``ttl`` that covers its age.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count, self._index, self.created, self.key = _header.unpack_from(self._mmap, 0)
+        if ( (magic != _MAGIC) or (version != _VERSION) ):
+            self._mmap.close()
+            raise ValueError("{} is not a request corpus.".format(path))
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        """Returns record ``i``
+
+        Returns:
+            tuple : ``(params, tif, kind, vuk)``: the request's
+            parameters as a dictionary, its expected TIF, its kind (one
+            of ``KINDS``), and the b64u VUK to answer with.
+        """
+
+        if ( (i < 0) or (i >= self._count) ):
+            raise IndexError(i)
+        offset, length, tif, kind, vuk = _entry.unpack_from(self._mmap, self._index + i * _entry.size)
+        params = dict(urllib.parse.parse_qsl(self._mmap[offset:offset + length].decode('ascii')))
+        return params, tif, KINDS[kind], _b64u(vuk)
+
+    def close(self):
+        self._mmap.close()
@@ -0,0 +1,219 @@
+from .utils import pad, depad, addquery
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+import collections
+import hashlib
+import hmac
+import os
+import sqlite3
+import struct
+import threading
+import time
+
+#token id, expiry (Unix time), MAC of the two plus the idk
+_token = struct.Struct('!16sI12s')
+
+class CpsIssuer(object):
+    """Mints and redeems Client Provided Session tokens
+
+    When a client asks for ``cps``, the ``auth`` action must supply a
+    one-time URL that logs the browser in. Pass an issuer to
+    :py:class:`.Request` as ``cps`` and it fills that ``url`` in for you
+    (unless your resolver returns one itself).
+
+    Tokens are 43 characters of base64url: a random id, the expiry
+    time, and a MAC binding both to the ``idk``. Malformed and expired
+    tokens are rejected without touching the store. Otherwise the id is
+    removed from the store in one atomic step, so each token works
+    exactly once, and the MAC is checked against the ``idk`` stored with
+    it.
+
+    Args:
+        key (bytes) : Secret key of at least 16 bytes for the MAC.
+        store (MemoryCpsStore) : Where tokens wait to be redeemed; a
+            :py:class:`MemoryCpsStore`, :py:class:`SqliteCpsStore`, or
+            anything with the same ``put`` and ``take`` methods. Both
+            are given the issuer's ``clock`` reading as ``now``.
+        url (string) : The page that redeems tokens. The token is added
+            to its query string as ``param``.
+
+    Keyword Args:
+        ttl (uint) : Seconds a token stays valid. Defaults to 120.
+        param (string) : Name of the query parameter. Defaults to 'cps'.
+        clock (callable) : Returns the current Unix time. Defaults to
+            ``time.time``.
+    """
+
+    def __init__(self, key, store, url, ttl=120, param='cps', clock=time.time):
+        if len(key) < 16:
+            raise ValueError("The key must be at least 16 bytes long.")
+        self._key = hashlib.blake2b(key, digest_size=32).digest()
+        self.store = store
+        self.url = url
+        self.ttl = ttl
+        self.param = param
+        self.clock = clock
+
+    def _mac(self, tid, expires, idk):
+        return hashlib.blake2b(tid + struct.pack('!I', expires) + idk.encode('utf-8'), key=self._key, digest_size=12).digest()
+
+    def issue(self, idk):
+        """Creates a token for ``idk``
+
+        Returns:
+            string : The token.
+        """
+
+        tid = os.urandom(16)
+        now = int(self.clock())
+        expires = now + self.ttl
+        self.store.put(tid, idk, expires, now)
+        return depad(urlsafe_b64encode(_token.pack(tid, expires, self._mac(tid, expires, idk))).decode('ascii'))
+
+    def issueUrl(self, idk):
+        """Creates a token for ``idk`` and returns the URL to redeem it"""
+
+        return addquery(self.url, {self.param: self.issue(idk)})
+
+    def redeem(self, token):
+        """Uses up a token
+
+        Args:
+            token (string) : The token from the query string.
+
+        Returns:
+            string : The ``idk`` it was issued to, or None if the token
+            is malformed, forged, expired or already used.
+        """
+
+        try:
+            tid, expires, mac = _token.unpack(urlsafe_b64decode(pad(token)))
+        except (ValueError, TypeError, struct.error):
+            return None
+        if expires <= self.clock():
+            return None
+        idk = self.store.take(tid, self.clock())
+        if ( (idk is None) or (not hmac.compare_digest(mac, self._mac(tid, expires, idk))) ):
+            return None
+        return idk
+
+class MemoryCpsStore(object):
+    """Keeps unredeemed CPS tokens in memory
+
+    Thread-safe, but local to one process. Past ``maxsize`` tokens the
+    oldest are dropped.
+
+    Keyword Args:
+        maxsize (uint) : Most tokens kept. Defaults to 100000.
+        wheel (TimingWheel) : A running :py:class:`.TimingWheel`. If
+            given, unredeemed tokens are dropped on its tick as they
+            expire instead of waiting to be pushed out.
+    """
+
+    def __init__(self, maxsize=100000, wheel=None):
+        self.maxsize = maxsize
+        self.wheel = wheel
+        self._tokens = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def put(self, tid, idk, expires, now):
+        with self._lock:
+            timer = None
+            if self.wheel is not None:
+                timer = self.wheel.schedule(expires - now, self._expire, tid)
+            self._tokens[tid] = (idk, expires, timer)
+            while len(self._tokens) > self.maxsize:
+                self._pop(next(iter(self._tokens)))
+
+    def take(self, tid, now):
+        """Removes a token, returning its ``idk`` if it hasn't expired"""
+
+        with self._lock:
+            entry = self._pop(tid)
+        if ( (entry is None) or (entry[1] <= now) ):
+            return None
+        return entry[0]
+
+    def _pop(self, tid):
+        #caller holds the lock
+        entry = self._tokens.pop(tid, None)
+        if ( (entry is not None) and (entry[2] is not None) ):
+            entry[2].cancel()
+        return entry
+
+    def _expire(self, tid):
+        #token ids are random, so the entry can't have been replaced
+        with self._lock:
+            self._tokens.pop(tid, None)
+
+class SqliteCpsStore(object):
+    """Keeps unredeemed CPS tokens in a SQLite database
+
+    Any process opening the same file can redeem any token. Taking a
+    token is a single ``DELETE ... RETURNING`` on its primary key, so two
+    workers can never both redeem it. Writes are committed immediately,
+    since the browser may arrive at another worker right away; expired
+    rows are purged every ``purge`` insertions, or with a ``wheel``, on
+    the tick after the earliest one expires.
+
+    Args:
+        path (string) : The database file (or ``':memory:'``).
+
+    Keyword Args:
+        purge (uint) : Insertions between purges. Defaults to 1000.
+        wheel (TimingWheel) : A running :py:class:`.TimingWheel` to purge
+            on instead.
+    """
+
+    def __init__(self, path, purge=1000, wheel=None):
+        self.purge = purge
+        self.wheel = wheel
+        self._purger = None
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS sqrl_cps (id BLOB PRIMARY KEY, idk TEXT NOT NULL, expires INTEGER NOT NULL) WITHOUT ROWID')
+        self._db.execute('CREATE INDEX IF NOT EXISTS sqrl_cps_expires ON sqrl_cps (expires)')
+
+    def put(self, tid, idk, expires, now):
+        """Stores a token, purging expired ones (as of ``now``) now and then"""
+
+        with self._lock:
+            self._db.execute('INSERT INTO sqrl_cps (id, idk, expires) VALUES (?, ?, ?)', (tid, idk, expires))
+            if self.wheel is not None:
+                if ( (self._purger is None) or (not self._purger.active) ):
+                    self._purger = self.wheel.schedule(expires - now, self._purge, expires)
+                return
+            self._puts += 1
+            if self._puts % self.purge == 0:
+                self._db.execute('DELETE FROM sqrl_cps WHERE expires <= ?', (int(now),))
+
+    def _purge(self, due):
+        #runs on the wheel when the issuer's clock reads about ``due``;
+        #the store has no clock of its own, so the next delay counts from it
+        with self._lock:
+            self._db.execute('DELETE FROM sqrl_cps WHERE expires <= ?', (due,))
+            first = self._db.execute('SELECT MIN(expires) FROM sqrl_cps').fetchone()[0]
+            self._purger = None
+            if first is not None:
+                self._purger = self.wheel.schedule(first - due, self._purge, first)
+
+    def take(self, tid, now):
+        """Removes a token, returning its ``idk`` if it hasn't expired"""
+
+        with self._lock:
+            #fetch everything so the statement (and its commit) completes
+            rows = self._db.execute('DELETE FROM sqrl_cps WHERE id = ? RETURNING idk, expires', (tid,)).fetchall()
+        if ( (len(rows) == 0) or (rows[0][1] <= now) ):
+            return None
+        return rows[0][0]
+
+    def close(self):
+        with self._lock:
+            if self._purger is not None:
+                self._purger.cancel()
+            self._db.close()
@@ -0,0 +1,242 @@
+import re
+from urllib.parse import unquote_to_bytes
+
+class FormError(ValueError):
+    """Raised when a request body is not an acceptable SQRL form
+
+    It is a ``ValueError``, so existing error handling keeps working.
+    The server should treat it as a client error and not pass anything
+    to :py:class:`.Request`.
+    """
+    pass
+
+class FormParser(object):
+    """Incremental, size-bounded parser for ``application/x-www-form-urlencoded`` bodies
+
+    Feed it the body in whatever chunks your framework provides. It
+    aborts with a :py:class:`.FormError` as soon as it sees a field it
+    doesn't know, a field that is too long, a repeated field, or a body
+    that is too long, so oversized bodies are never buffered.
+
+    When done, :py:meth:`.close` returns the ``params`` dictionary
+    :py:class:`.Request` expects.
+
+    Keyword Args:
+        limits (dict) : Maps each acceptable field name to the maximum
+            length of its (still url-encoded) value. Defaults to
+            ``FormParser.limits``, which covers the fields SQRL clients
+            send (``client``, ``server``, ``ids``, ``pids``, ``urs``) plus
+            ``nut`` for servers that post it.
+        maxlength (uint) : Maximum length of the whole body. Defaults to
+            the sum of all limits, plus room for names and separators.
+
+    Attributes:
+        limits (dict) : The default limits. The signatures are 64 bytes
+            (86 characters), the nut is 75 characters, and the ``client``
+            and ``server`` limits leave generous room for every field the
+            spec defines.
+    """
+
+    limits = {
+        'client': 2048,
+        'server': 4096,
+        'ids': 88,
+        'pids': 88,
+        'urs': 88,
+        'nut': 96,
+    }
+
+    _separators = re.compile(b'[&=]')
+
+    def __init__(self, limits=None, maxlength=None):
+        if limits is None:
+            limits = self.limits
+        self._limits = limits
+        self._maxname = max([len(name) for name in limits])
+        if maxlength is None:
+            maxlength = sum(limits.values()) + (len(limits) * (self._maxname + 2))
+        self.maxlength = maxlength
+        self.params = {}
+        self._received = 0
+        self._name = bytearray()
+        self._value = None
+        self._field = None
+        self._limit = 0
+        self._closed = False
+
+    def feed(self, data):
+        """Processes the next chunk of the body
+
+        Args:
+            data (bytes) : The next chunk. May be empty.
+
+        Raises:
+            FormError : If the body is unacceptable.
+        """
+
+        if self._closed:
+            raise ValueError("The parser has already been closed.")
+        self._received += len(data)
+        if self._received > self.maxlength:
+            raise FormError("The request body is too long.")
+
+        #slices of the view don't copy the chunk
+        view = memoryview(data)
+        pos = 0
+        end = len(data)
+        while pos < end:
+            if self._value is None:
+                #reading a name
+                m = self._separators.search(data, pos)
+                if m is None:
+                    self._name += view[pos:]
+                    if len(self._name) > self._maxname:
+                        raise FormError("Unrecognized field in request body.")
+                    return
+                self._name += view[pos:m.start()]
+                pos = m.end()
+                if m.group() == b'=':
+                    self._start_value()
+                elif len(self._name) > 0:
+                    #a bare name is a field with an empty value
+                    self._start_value()
+                    self._end_value()
+            else:
+                #reading a value
+                idx = data.find(b'&', pos)
+                if idx == -1:
+                    self._value += view[pos:]
+                    if len(self._value) > self._limit:
+                        raise FormError("The field '{}' is too long.".format(self._field))
+                    return
+                self._value += view[pos:idx]
+                pos = idx + 1
+                self._end_value()
+
+    def close(self):
+        """Finishes parsing
+
+        Returns:
+            dict : The parsed parameters.
+
+        Raises:
+            FormError : If the last field is unacceptable.
+        """
+
+        if not self._closed:
+            if self._value is not None:
+                self._end_value()
+            elif len(self._name) > 0:
+                self._start_value()
+                self._end_value()
+            self._closed = True
+        return self.params
+
+    def _start_value(self):
+        try:
+            name = self._name.decode('ascii')
+        except UnicodeDecodeError:
+            raise FormError("Unrecognized field in request body.")
+        if name not in self._limits:
+            raise FormError("Unrecognized field '{}' in request body.".format(name))
+        if name in self.params:
+            raise FormError("The field '{}' was repeated.".format(name))
+        self._field = name
+        self._limit = self._limits[name]
+        self._value = bytearray()
+        self._name = bytearray()
+
+    def _end_value(self):
+        value = self._value
+        if len(value) > self._limit:
+            raise FormError("The field '{}' is too long.".format(self._field))
+        try:
+            if ( (b'%' in value) or (b'+' in value) ):
+                self.params[self._field] = unquote_to_bytes(bytes(value).replace(b'+', b' ')).decode('utf-8')
+            else:
+                self.params[self._field] = value.decode('utf-8')
+        except UnicodeDecodeError:
+            raise FormError("The field '{}' is not valid UTF-8.".format(self._field))
+        self._value = None
+        self._field = None
+
+def parse(stream, length=None, chunksize=4096, **kwargs):
+    """Parses a form body from a file-like object
+
+    Args:
+        stream (file) : Any object with a ``read(size)`` method returning
+            bytes, like WSGI's ``wsgi.input``.
+
+    Keyword Args:
+        length (uint) : Number of bytes to read (normally the
+            ``Content-Length``). If None, reads until EOF. Under WSGI you
+            should always pass it, as reading past the body may block.
+        chunksize (uint) : Maximum bytes to read at a time.
+        limits (dict) : See :py:class:`.FormParser`.
+        maxlength (uint) : See :py:class:`.FormParser`.
+
+    Returns:
+        dict : The parsed parameters.
+
+    Raises:
+        FormError : If the body is unacceptable. An oversized
+            ``length`` is rejected before anything is read.
+    """
+
+    parser = FormParser(**kwargs)
+    if length is not None:
+        if length > parser.maxlength:
+            raise FormError("The request body is too long.")
+        remaining = length
+        while remaining > 0:
+            chunk = stream.read(min(chunksize, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            parser.feed(chunk)
+    else:
+        while True:
+            chunk = stream.read(chunksize)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    return parser.close()
+
+async def parse_async(stream, length=None, chunksize=4096, **kwargs):
+    """Parses a form body from an asynchronous stream
+
+    Args:
+        stream : Either an object with a coroutine ``read(size)`` method
+            (like ``asyncio.StreamReader``) or an async iterable of bytes
+            chunks.
+
+    Keyword Args:
+        length (uint) : Number of bytes to read. If None, reads until EOF.
+        chunksize (uint) : Maximum bytes to read at a time.
+        limits (dict) : See :py:class:`.FormParser`.
+        maxlength (uint) : See :py:class:`.FormParser`.
+
+    Returns:
+        dict : The parsed parameters.
+
+    Raises:
+        FormError : If the body is unacceptable.
+    """
+
+    parser = FormParser(**kwargs)
+    if ( (length is not None) and (length > parser.maxlength) ):
+        raise FormError("The request body is too long.")
+    if hasattr(stream, 'read'):
+        remaining = length
+        while ( (remaining is None) or (remaining > 0) ):
+            size = chunksize if remaining is None else min(chunksize, remaining)
+            chunk = await stream.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            parser.feed(chunk)
+    else:
+        async for chunk in stream:
+            parser.feed(chunk)
+    return parser.close()
@@ -0,0 +1,202 @@
+from .response import Response
+import asyncio
+import collections
+import concurrent.futures
+import hashlib
+import threading
+import time
+
+#the parameters a client signs or sends with its signatures
+_signed = ('nut', 'client', 'server', 'ids', 'pids', 'urs')
+
+class IdempotencyCache(object):
+    """Answers exact duplicate requests with the response already sent
+
+    Clients on flaky networks resend the same POST when a response goes
+    missing. Without a cache each retry repeats the signature checks,
+    nut decryption and storage actions, and a repeated ``ident`` may not
+    succeed a second time. Pass an instance to :py:class:`.WsgiApp` or
+    :py:class:`.AsgiApp` as ``idempotency`` and a request whose nut,
+    ``client``, ``server``, signatures and address all match one seen in
+    the last ``ttl`` seconds gets the same finalized
+    :py:class:`.Response` back. As in :py:class:`.NutCache`, the
+    ``ttl`` counts from the time encoded in the request's nut, so a
+    cached success is never replayed for a nut that has gone stale. A
+    duplicate that arrives while the
+    original is still being processed waits for it instead of running
+    alongside it.
+
+    Responses carrying the transient error bit (0x20) are not kept, so
+    a retry after an overload is processed normally. The cache is a
+    bounded LRU in one process.
+
+    Keyword Args:
+        maxsize (uint) : Most responses kept. Defaults to 10000.
+        ttl (uint) : Seconds after its nut's timestamp that a response
+            is reused. Match it to the requests' ``ttl``. Defaults to
+            600.
+        clock (callable) : Returns the current Unix time. Defaults to
+            ``time.time``.
+        wheel (TimingWheel) : A running :py:class:`.TimingWheel` that
+            removes each response when it stops being reused. Without
+            one, expired responses linger until looked up or evicted.
+
+    Attributes:
+        hits (uint) : Duplicates answered from the cache.
+        coalesced (uint) : Duplicates that waited on one in progress.
+        misses (uint) : Requests that were processed.
+    """
+
+    def __init__(self, maxsize=10000, ttl=600, clock=time.time, wheel=None):
+        if ( (not isinstance(maxsize, int)) or (maxsize < 1) ):
+            raise ValueError("maxsize must be an integer > 0")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.wheel = wheel
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(params, ipaddr):
+        """Hashes the parts of a request that make it a duplicate
+
+        Args:
+            params (dict) : The raw query and form parameters.
+            ipaddr (string) : The client's address.
+
+        Returns:
+            bytes : A 32-byte SHA-256 digest.
+        """
+
+        h = hashlib.sha256()
+        for value in [str(ipaddr)] + [params.get(name, '') for name in _signed]:
+            value = value.encode('utf-8')
+            h.update(len(value).to_bytes(4, 'big'))
+            h.update(value)
+        return h.digest()
+
+    def _lookup(self, key):
+        #returns (response, None), (None, future to wait on) or
+        #(None, None) if the caller should compute it
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0], None
+                self._pop(key)
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return None, future
+            self.misses += 1
+            self._inflight[key] = concurrent.futures.Future()
+            return None, None
+
+    def _store(self, key, response, request):
+        now = self.clock()
+        expires = now + self.ttl
+        if ( (request is not None) and (request.nut is not None) ):
+            expires = request.nut.timestamp + self.ttl
+        with self._lock:
+            future = self._inflight.pop(key)
+            if ( (not response._tif & 0x20) and (expires > now) ):
+                self._pop(key)
+                timer = None
+                if self.wheel is not None:
+                    timer = self.wheel.schedule(expires - now, self._expire, key, expires)
+                self._entries[key] = (response, expires, timer)
+                while len(self._entries) > self.maxsize:
+                    self._pop(next(iter(self._entries)))
+        future.set_result(response)
+
+    def _pop(self, key):
+        #caller holds the lock
+        entry = self._entries.pop(key, None)
+        if ( (entry is not None) and (entry[2] is not None) ):
+            entry[2].cancel()
+
+    def _expire(self, key, expires):
+        with self._lock:
+            entry = self._entries.get(key)
+            if ( (entry is not None) and (entry[1] == expires) ):
+                del self._entries[key]
+
+    def _abandon(self, key):
+        #the computation failed; waiters retry it themselves
+        with self._lock:
+            future = self._inflight.pop(key)
+        future.set_result(None)
+
+    def get(self, key, compute, request=None):
+        """Returns the response for ``key``, computing it if needed
+
+        Args:
+            key (bytes) : From :py:meth:`key`.
+            compute (callable) : Called with no arguments to process the
+                request. Must return a finalized :py:class:`.Response`.
+
+        Keyword Args:
+            request (Request) : The request ``compute`` processes. Its
+                response is kept until the request's nut goes stale.
+                Without it, or if the nut didn't validate, the response
+                is kept for ``ttl`` from now.
+
+        Returns:
+            Response : A copy, so callers may change it freely.
+        """
+
+        while True:
+            response, future = self._lookup(key)
+            if future is not None:
+                response = future.result()
+                if response is None:
+                    continue
+            elif response is None:
+                try:
+                    response = compute()
+                except BaseException:
+                    self._abandon(key)
+                    raise
+                self._store(key, response, request)
+            return Response.load(response)
+
+    async def get_async(self, key, compute, request=None):
+        """Like :py:meth:`get`, for a coroutine function ``compute``"""
+
+        while True:
+            response, future = self._lookup(key)
+            if future is not None:
+                response = await asyncio.wrap_future(future)
+                if response is None:
+                    continue
+            elif response is None:
+                try:
+                    response = await compute()
+                except BaseException:
+                    self._abandon(key)
+                    raise
+                self._store(key, response, request)
+            return Response.load(response)
+
+    def stats(self):
+        """Hit-rate metrics
+
+        Returns:
+            dict : ``hits``, ``coalesced``, ``misses``, ``size``, and
+            ``hitrate``, the share of requests (hits and coalesced
+            duplicates) that weren't processed again.
+        """
+
+        with self._lock:
+            total = self.hits + self.coalesced + self.misses
+            return {'hits': self.hits, 'coalesced': self.coalesced, 'misses': self.misses, 'size': len(self._entries), 'hitrate': (self.hits + self.coalesced) / total if total else 0.0}
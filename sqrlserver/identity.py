@@ -0,0 +1,281 @@
+from .utils import pad, depad
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+import sqlite3
+import threading
+
+def _key(s):
+    """Decodes a b64u key, or returns None if it isn't 32 bytes
+
+    Raw keys (from a ``binary`` :py:class:`.Request`) pass through.
+    """
+
+    if isinstance(s, bytes):
+        return s if len(s) == 32 else None
+    if not isinstance(s, str):
+        return None
+    try:
+        raw = urlsafe_b64decode(pad(s))
+    except ValueError:
+        return None
+    if len(raw) != 32:
+        return None
+    return raw
+
+def _b64u(raw):
+    return depad(urlsafe_b64encode(raw).decode('ascii'))
+
+class SqliteIdentityStore(object):
+    """A reference SQRL identity store backed by SQLite
+
+    Keys are stored as 32-byte BLOBs rather than base64url text. The
+    table is ``WITHOUT ROWID`` and keyed on ``idk``, so the primary key
+    index holds the whole row and every lookup, including the ``find``
+    for both ``idk`` and ``pidk``, is a single covering index search.
+    The database runs in WAL mode, each thread gets its own connection,
+    and all SQL is fixed text, so SQLite's statement cache keeps every
+    statement prepared.
+
+    Instances are callable as the resolver for :py:class:`.WsgiApp` or
+    :py:class:`.AsgiApp` (or your own loop): given a :py:class:`.Request`
+    in the ``ACTION`` state, they return the dictionary for its next
+    :py:meth:`.Request.handle` call. Unknown identities that ``ident``
+    with a ``suk`` and ``vuk`` are enrolled, and an ``ident`` that
+    carries a known ``pidk`` rekeys that identity. The ``confirm``
+    action is a policy decision, so it is left unanswered (which
+    refuses the request); wrap the store if you want otherwise.
+
+    Keys may be given as b64u strings or, from a ``binary`` request, as
+    raw bytes; records always hold b64u strings.
+
+    Args:
+        path (string) : The database file. Use a real file;
+            ``':memory:'`` would give each thread its own database.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        db = self._db()
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('CREATE TABLE IF NOT EXISTS sqrl_identities (idk BLOB PRIMARY KEY, suk BLOB NOT NULL, vuk BLOB NOT NULL, disabled INTEGER NOT NULL DEFAULT 0, sqrlonly INTEGER NOT NULL DEFAULT 0, hardlock INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID')
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None, cached_statements=64)
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def close(self):
+        """Closes this thread's connection"""
+
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def lookup(self, idk):
+        """Returns an identity's record
+
+        Args:
+            idk (string) : The b64u Identity Key.
+
+        Returns:
+            dict : With keys ``suk`` and ``vuk`` (b64u strings) and
+            ``disabled``, ``sqrlonly`` and ``hardlock`` (bools), or None
+            if the identity is unknown.
+        """
+
+        raw = _key(idk)
+        if raw is None:
+            return None
+        row = self._db().execute('SELECT suk, vuk, disabled, sqrlonly, hardlock FROM sqrl_identities WHERE idk = ?', (raw,)).fetchone()
+        if row is None:
+            return None
+        return {'suk': _b64u(row[0]), 'vuk': _b64u(row[1]), 'disabled': bool(row[2]), 'sqrlonly': bool(row[3]), 'hardlock': bool(row[4])}
+
+    def find(self, idk, pidk=None):
+        """Looks up an identity and its previous identity in one query
+
+        Returns:
+            list : ``[idk found, pidk found]`` (the second only if
+            ``pidk`` was given) followed by the ``idk``'s record, as
+            from :py:meth:`lookup`, or None.
+        """
+
+        raws = [_key(idk), _key(pidk)]
+        rows = self._db().execute('SELECT idk, suk, vuk, disabled, sqrlonly, hardlock FROM sqrl_identities WHERE idk IN (?, ?)', raws).fetchall()
+        found = dict([(row[0], row) for row in rows])
+        record = None
+        row = found.get(raws[0])
+        if row is not None:
+            record = {'suk': _b64u(row[1]), 'vuk': _b64u(row[2]), 'disabled': bool(row[3]), 'sqrlonly': bool(row[4]), 'hardlock': bool(row[5])}
+        result = [raws[0] in found]
+        if pidk is not None:
+            result.append(raws[1] in found)
+        return result + [record]
+
+    def create(self, idk, suk, vuk):
+        """Enrolls a new identity
+
+        Returns:
+            bool : False if the keys are malformed or the identity exists.
+        """
+
+        raws = [_key(idk), _key(suk), _key(vuk)]
+        if None in raws:
+            return False
+        try:
+            self._db().execute('INSERT INTO sqrl_identities (idk, suk, vuk) VALUES (?, ?, ?)', raws)
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def rekey(self, pidk, idk, suk, vuk):
+        """Replaces a previous identity's keys with new ones
+
+        Returns:
+            bool : Whether ``pidk`` was found and replaced.
+        """
+
+        raws = [_key(idk), _key(suk), _key(vuk), _key(pidk)]
+        if None in raws:
+            return False
+        try:
+            cur = self._db().execute('UPDATE sqrl_identities SET idk = ?, suk = ?, vuk = ? WHERE idk = ?', raws)
+        except sqlite3.IntegrityError:
+            return False
+        return cur.rowcount == 1
+
+    def setDisabled(self, idk, disabled):
+        """Disables or re-enables an identity
+
+        Returns:
+            bool : Whether the identity exists.
+        """
+
+        raw = _key(idk)
+        if raw is None:
+            return False
+        return self._db().execute('UPDATE sqrl_identities SET disabled = ? WHERE idk = ?', (int(disabled), raw)).rowcount == 1
+
+    def setOptions(self, idk, sqrlonly, hardlock):
+        """Records the client's ``sqrlonly`` and ``hardlock`` choices
+
+        Returns:
+            bool : Whether the identity exists.
+        """
+
+        raw = _key(idk)
+        if raw is None:
+            return False
+        return self._db().execute('UPDATE sqrl_identities SET sqrlonly = ?, hardlock = ? WHERE idk = ?', (int(sqrlonly), int(hardlock), raw)).rowcount == 1
+
+    def remove(self, idk):
+        """Deletes an identity
+
+        Returns:
+            bool : Whether the identity existed.
+        """
+
+        raw = _key(idk)
+        if raw is None:
+            return False
+        return self._db().execute('DELETE FROM sqrl_identities WHERE idk = ?', (raw,)).rowcount == 1
+
+    def __call__(self, req):
+        """Resolves a request's pending actions (see :py:func:`resolve`)"""
+
+        return resolve(self, req)
+
+    def update(self, changes):
+        """Writes several identities in one transaction
+
+        Args:
+            changes (dict) : Maps each b64u ``idk`` to its complete new
+                record (as returned by :py:meth:`lookup`), or to None to
+                delete it.
+        """
+
+        upserts = []
+        deletes = []
+        for idk, record in changes.items():
+            if record is None:
+                deletes.append((_key(idk),))
+            else:
+                upserts.append((_key(idk), _key(record['suk']), _key(record['vuk']), int(record['disabled']), int(record['sqrlonly']), int(record['hardlock'])))
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany('DELETE FROM sqrl_identities WHERE idk = ?', deletes)
+            db.executemany('INSERT OR REPLACE INTO sqrl_identities (idk, suk, vuk, disabled, sqrlonly, hardlock) VALUES (?, ?, ?, ?, ?, ?)', upserts)
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+
+def resolve(store, req):
+    """Answers a request's pending actions from an identity store
+
+    Works with anything that has the methods of
+    :py:class:`SqliteIdentityStore`.
+
+    Args:
+        store : The identity store.
+        req (Request) : A request in the ``ACTION`` state.
+
+    Returns:
+        dict : The arguments for ``req.handle``.
+    """
+
+    client = req.params['client']
+    idk = client['idk']
+    args = {}
+    options = {}
+    for action in req.action:
+        if action[0] == 'find':
+            result = store.find(*action[1])
+            record = result.pop()
+            args['found'] = result
+            if ( (record is not None) and (record['disabled']) ):
+                args['disabled'] = True
+                args['suk'] = record['suk']
+        elif action[0] == 'auth':
+            found = store.lookup(idk)
+            if found is None:
+                #only a previous identity whose signature was checked may be rekeyed
+                if ( ('pidk' in client) and ('pids' in req.params) ):
+                    args['authenticated'] = store.rekey(client['pidk'], idk, action[2], action[3])
+                else:
+                    args['authenticated'] = store.create(idk, action[2], action[3])
+            elif found['disabled']:
+                args['authenticated'] = False
+                args['disabled'] = True
+                args['suk'] = found['suk']
+            else:
+                args['authenticated'] = True
+        elif action[0] in ['sqrlonly', 'hardlock']:
+            options[action[0]] = action[1]
+            args[action[0]] = True
+        elif action[0] == 'suk':
+            record = store.lookup(idk)
+            if record is not None:
+                args['suk'] = record['suk']
+        elif action[0] == 'disable':
+            args['deactivated'] = store.setDisabled(idk, True)
+            args['found'] = args['deactivated']
+            if args['deactivated']:
+                args['suk'] = store.lookup(idk)['suk']
+        elif action[0] == 'enable':
+            args['activated'] = store.setDisabled(idk, False)
+            args['found'] = args['activated']
+        elif action[0] == 'remove':
+            args['removed'] = store.remove(idk)
+            args['found'] = args['removed']
+        elif action[0] == 'vuk':
+            record = store.lookup(idk)
+            args['vuk'] = None if record is None else record['vuk']
+    if options:
+        store.setOptions(idk, options.get('sqrlonly', False), options.get('hardlock', False))
+    return args
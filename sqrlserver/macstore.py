@@ -0,0 +1,204 @@
+import collections
+import sqlite3
+import threading
+import time
+
+class MemoryMacStore(object):
+    """Keeps response MACs in memory, keyed by the nut they went out with
+
+    Pass it to :py:class:`.Request` as ``macstore``. Finalizing records
+    the MAC of the response under its new nut, and the request that
+    comes back with that nut is checked against it, so you don't have to
+    handle ``hmac`` yourself.
+
+    The store is a bounded LRU: past ``maxsize`` entries the least
+    recently used are dropped, and entries older than ``ttl`` are
+    ignored and removed when touched. It is thread-safe but lives in one
+    process; use :py:class:`SqliteMacStore` to share MACs between
+    processes.
+
+    Keyword Args:
+        maxsize (uint) : Most entries kept. Defaults to 100000.
+        ttl (uint) : Seconds an entry is valid. Match it to the
+            requests' ``ttl``. Defaults to 600.
+        clock (callable) : Returns the current time in seconds. Defaults
+            to ``time.monotonic``.
+        wheel (TimingWheel) : A running :py:class:`.TimingWheel`. If
+            given, each entry is removed on the wheel's tick once it
+            expires, not only when touched or evicted.
+    """
+
+    def __init__(self, maxsize=100000, ttl=600, clock=time.monotonic, wheel=None):
+        if ( (not isinstance(maxsize, int)) or (maxsize < 1) ):
+            raise ValueError("maxsize must be an integer > 0")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.wheel = wheel
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, nut):
+        """Returns the MAC stored for ``nut``, or None"""
+
+        with self._lock:
+            entry = self._entries.get(nut)
+            if entry is None:
+                return None
+            if entry[1] <= self.clock():
+                self._pop(nut)
+                return None
+            self._entries.move_to_end(nut)
+            return entry[0]
+
+    def put(self, nut, mac):
+        """Stores ``mac`` for ``nut``"""
+
+        expires = self.clock() + self.ttl
+        with self._lock:
+            self._pop(nut)
+            timer = None
+            if self.wheel is not None:
+                timer = self.wheel.schedule(self.ttl, self._expire, nut, expires)
+            self._entries[nut] = (mac, expires, timer)
+            while len(self._entries) > self.maxsize:
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, nut):
+        #caller holds the lock
+        entry = self._entries.pop(nut, None)
+        if ( (entry is not None) and (entry[2] is not None) ):
+            entry[2].cancel()
+
+    def _expire(self, nut, expires):
+        #the entry may have been replaced since the timer was set
+        with self._lock:
+            entry = self._entries.get(nut)
+            if ( (entry is not None) and (entry[1] == expires) ):
+                del self._entries[nut]
+
+class SqliteMacStore(object):
+    """Keeps response MACs in a SQLite database
+
+    Works like :py:class:`MemoryMacStore`, but any process that opens
+    the same file sees the MACs. Writes are buffered and committed in
+    batches, when ``batch`` are waiting or the oldest has waited
+    ``delay`` seconds (checked on each call), and on :py:meth:`flush`
+    and :py:meth:`close`. Lookups see this process's buffered writes
+    immediately; other processes see them once committed.
+
+    A missing MAC only means the check is skipped, the same as not
+    passing ``hmac``, so a lookup that races a buffered write costs
+    nothing but that one check. Expired rows are deleted as part of each
+    batch, or, given a ``wheel``, by a single purge timer that it fires
+    when the oldest row expires.
+
+    Args:
+        path (string) : The database file (or ``':memory:'``).
+
+    Keyword Args:
+        ttl (uint) : Seconds an entry is valid. Defaults to 600.
+        batch (uint) : Buffered writes that trigger a commit. Defaults
+            to 64.
+        delay (float) : Longest a write is buffered, in seconds.
+            Defaults to 0.05.
+        clock (callable) : Returns the current Unix time. Defaults to
+            ``time.time``.
+        wheel (TimingWheel) : A running :py:class:`.TimingWheel` to purge
+            expired rows on.
+
+    Attributes:
+        commits (uint) : Batches committed so far.
+    """
+
+    def __init__(self, path, ttl=600, batch=64, delay=0.05, clock=time.time, wheel=None):
+        self.ttl = ttl
+        self.batch = batch
+        self.delay = delay
+        self.clock = clock
+        self.wheel = wheel
+        self.commits = 0
+        self._purger = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._since = None
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS sqrl_macs (nut TEXT PRIMARY KEY, mac TEXT NOT NULL, expires REAL NOT NULL) WITHOUT ROWID')
+        self._db.execute('CREATE INDEX IF NOT EXISTS sqrl_macs_expires ON sqrl_macs (expires)')
+
+    def get(self, nut):
+        """Returns the MAC stored for ``nut``, or None"""
+
+        with self._lock:
+            self._maybe_flush()
+            entry = self._pending.get(nut)
+            if entry is None:
+                entry = self._db.execute('SELECT mac, expires FROM sqrl_macs WHERE nut = ?', (nut,)).fetchone()
+        if ( (entry is None) or (entry[1] <= self.clock()) ):
+            return None
+        return entry[0]
+
+    def put(self, nut, mac):
+        """Buffers ``mac`` for ``nut``"""
+
+        with self._lock:
+            self._pending[nut] = (mac, self.clock() + self.ttl)
+            if self._since is None:
+                self._since = self.clock()
+            if ( (self.wheel is not None) and ( (self._purger is None) or (not self._purger.active) ) ):
+                self._purger = self.wheel.schedule(self.ttl, self._purge)
+            self._maybe_flush()
+
+    def flush(self):
+        """Commits any buffered writes now"""
+
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Commits buffered writes and closes the database"""
+
+        with self._lock:
+            if self._purger is not None:
+                self._purger.cancel()
+            self._flush()
+            self._db.close()
+
+    def _maybe_flush(self):
+        #caller holds the lock
+        if ( (len(self._pending) >= self.batch) or ( (self._since is not None) and (self.clock() - self._since >= self.delay) ) ):
+            self._flush()
+
+    def _flush(self):
+        #caller holds the lock
+        if not self._pending:
+            return
+        rows = [(nut, mac, expires) for nut, (mac, expires) in self._pending.items()]
+        self._db.execute('BEGIN')
+        try:
+            self._db.executemany('INSERT OR REPLACE INTO sqrl_macs (nut, mac, expires) VALUES (?, ?, ?)', rows)
+            if self.wheel is None:
+                self._db.execute('DELETE FROM sqrl_macs WHERE expires <= ?', (self.clock(),))
+            self._db.execute('COMMIT')
+        except Exception:
+            self._db.execute('ROLLBACK')
+            raise
+        self._pending = {}
+        self._since = None
+        self.commits += 1
+
+    def _purge(self):
+        #runs on the wheel; sets itself again for the next row to expire
+        with self._lock:
+            self._flush()
+            now = self.clock()
+            self._db.execute('DELETE FROM sqrl_macs WHERE expires <= ?', (now,))
+            first = self._db.execute('SELECT MIN(expires) FROM sqrl_macs').fetchone()[0]
+            self._purger = None
+            if first is not None:
+                self._purger = self.wheel.schedule(first - now, self._purge)
@@ -0,0 +1,212 @@
+import bisect
+import threading
+
+#nut ages in seconds and counter lags, as histogram bounds
+AGE_BOUNDS = (1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+LAG_BOUNDS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+class Registry(object):
+    """Counters and fixed-bucket histograms, cheap to update from any thread
+
+    Each thread updates its own shard, so recording takes no lock; the
+    shards are only merged when the registry is scraped with
+    :py:meth:`collect` or :py:meth:`exposition`. Shards outlive their
+    threads, so nothing counted is ever lost.
+
+    A new registry already has the metrics :py:class:`.Request` records
+    when given one as ``metrics``:
+
+        - ``sqrl_requests_total{cmd}`` : Completed requests, by command
+          (``none`` if malformed).
+        - ``sqrl_tif_total{bit}`` : TIF bits set in completed requests.
+        - ``sqrl_rejected_total{reason}`` : Requests turned away or
+          questioned, by reason: ``malformed``, ``unsupported``,
+          ``busy`` (see :py:meth:`.Request.reject`), and the validity
+          check's ``sigs``, ``hmac``, ``nut``, ``ip``, ``time`` and
+          ``counter``.
+        - ``sqrl_confirm_total{result}`` : ``confirm`` actions
+          ``accepted`` or ``declined``.
+        - ``sqrl_nut_age_seconds`` : Age of each nut that decrypted.
+        - ``sqrl_counter_lag`` : How far each nut's counter is behind
+          ``maxcounter``, when one is given.
+
+    Add your own with :py:meth:`counter` and :py:meth:`histogram`.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._order = []
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        self.counter('sqrl_requests_total', 'Completed SQRL requests by command.')
+        self.counter('sqrl_tif_total', 'TIF bits set in completed SQRL requests.')
+        self.counter('sqrl_rejected_total', 'SQRL requests rejected or questioned, by reason.')
+        self.counter('sqrl_confirm_total', 'Confirm actions accepted or declined.')
+        self.histogram('sqrl_nut_age_seconds', 'Age of received nuts in seconds.', AGE_BOUNDS)
+        self.histogram('sqrl_counter_lag', 'How far received nut counters are behind maxcounter.', LAG_BOUNDS)
+
+    def _register(self, name, kind, help, bounds):
+        if name in self._metrics:
+            raise ValueError("A metric named {} is already registered.".format(name))
+        self._metrics[name] = (kind, help, bounds)
+        self._order.append(name)
+
+    def counter(self, name, help):
+        """Registers a counter
+
+        Args:
+            name (string) : The metric's name.
+            help (string) : One line describing it.
+        """
+
+        self._register(name, 'counter', help, None)
+
+    def histogram(self, name, help, bounds):
+        """Registers a histogram
+
+        Args:
+            name (string) : The metric's name.
+            help (string) : One line describing it.
+            bounds (tuple) : The buckets' upper bounds, ascending.
+        """
+
+        if list(bounds) != sorted(bounds):
+            raise ValueError("Bucket bounds must be in ascending order.")
+        self._register(name, 'histogram', help, tuple(bounds))
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def inc(self, name, labels=(), value=1):
+        """Adds to a counter
+
+        Args:
+            name (string) : A registered counter.
+
+        Keyword Args:
+            labels (tuple) : ``(name, value)`` pairs, always in the same
+                order for the same series.
+            value (number) : Defaults to 1.
+        """
+
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        """Adds a value to a histogram
+
+        Args:
+            name (string) : A registered histogram.
+            value (number) : The observation.
+
+        Keyword Args:
+            labels (tuple) : As for :py:meth:`inc`.
+        """
+
+        bounds = self._metrics[name][2]
+        shard = self._shard()
+        key = (name, labels)
+        hist = shard.get(key)
+        if hist is None:
+            #bucket counts, then the overflow bucket, then the sum
+            hist = shard[key] = [0] * (len(bounds) + 1) + [0]
+        hist[bisect.bisect_left(bounds, value)] += 1
+        hist[-1] += value
+
+    def collect(self):
+        """Merges every thread's shard
+
+        Returns:
+            dict : ``{(name, labels): value}``. A counter's value is its
+            total; a histogram's is a list of per-bucket counts (not
+            cumulative, overflow last) followed by the sum.
+        """
+
+        with self._lock:
+            shards = list(self._shards)
+        merged = {}
+        for shard in shards:
+            #copying is atomic; the owning thread may be writing
+            for key, value in shard.copy().items():
+                if isinstance(value, list):
+                    value = list(value)
+                    if key in merged:
+                        merged[key] = [a + b for a, b in zip(merged[key], value)]
+                    else:
+                        merged[key] = value
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def exposition(self):
+        """Renders every metric in the Prometheus text format
+
+        Returns:
+            string
+        """
+
+        merged = self.collect()
+        series = {}
+        for (name, labels), value in merged.items():
+            series.setdefault(name, []).append((labels, value))
+        lines = []
+        for name in self._order:
+            kind, help, bounds = self._metrics[name]
+            lines.append('# HELP {} {}'.format(name, help))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for labels, value in sorted(series.get(name, [])):
+                if kind == 'counter':
+                    lines.append('{}{} {}'.format(name, _labels(labels), _number(value)))
+                    continue
+                total = 0
+                for bound, n in zip(bounds + ('+Inf',), value):
+                    total += n
+                    lines.append('{}_bucket{} {}'.format(name, _labels(labels + (('le', _number(bound)),)), total))
+                lines.append('{}_sum{} {}'.format(name, _labels(labels), _number(value[-1])))
+                lines.append('{}_count{} {}'.format(name, _labels(labels), total))
+        return '\n'.join(lines) + '\n'
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in labels) + '}'
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+class MetricsApp(object):
+    """A WSGI application serving a registry for scraping
+
+    Answers every ``GET`` with :py:meth:`Registry.exposition`. Serve it
+    on its own port, or mount it beside your :py:class:`.WsgiApp`; for a
+    quick standalone endpoint the standard library is enough::
+
+        from wsgiref.simple_server import make_server
+        make_server('', 9100, MetricsApp(registry)).serve_forever()
+
+    Args:
+        registry (Registry) : The registry to serve.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD', 'GET') not in ['GET', 'HEAD']:
+            start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD'), ('Content-Length', '0')])
+            return [b'']
+        body = self.registry.exposition().encode('utf-8')
+        start_response('200 OK', [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'), ('Content-Length', str(len(body)))])
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return [b'']
+        return [body]
@@ -1,14 +1,28 @@
-import ipaddress
-import hashlib
 import time
 import struct
-import nacl.secret
+import threading
+import collections
 import urllib.parse
 from base64 import urlsafe_b64encode, urlsafe_b64decode
-from bitstring import BitArray
 
 from .utils import pad, depad
 
+#nacl, bitstring, ipaddress and hashlib are imported by the methods that
+#need them, so that a process only building URLs never loads them
+
+#one SecretBox per key, shared by every nut (and thread) in the process
+_boxes = {}
+
+def _box(key):
+    box = _boxes.get(key)
+    if box is None:
+        import nacl.secret
+        if len(_boxes) >= 16:
+            #servers use one key or a few; don't grow without bound
+            _boxes.clear()
+        box = _boxes[key] = nacl.secret.SecretBox(key)
+    return box
+
 class Nut(object):
     """A class encompassing SQRL nuts.
 
@@ -66,6 +80,11 @@ class Nut(object):
             Nut : The populated Nut object.
         """
 
+        import ipaddress
+        import hashlib
+        import nacl.utils
+        from bitstring import BitArray
+
         self.ip = ipaddress.ip_address(ipaddr)
         baip = BitArray(self.ip.packed)
         #Shorten to 32 bits if IPv6
@@ -94,26 +113,51 @@ class Nut(object):
         self.nuts['link'][-1] = 1
 
         #encrypt
-        box = nacl.secret.SecretBox(self.key)
+        box = _box(self.key)
         self.nuts['qr'] = box.encrypt(self.nuts['qr'].bytes)
         self.nuts['link'] = box.encrypt(self.nuts['link'].bytes)
 
         return self
 
-    def load(self, nut):
+    def load(self, nut, cache=None, timing=None):
         """Decrypts the given nut and extracts its parts.
 
         Args:
             nut (string) : A previously generated nut string
 
+        Keyword Args:
+            cache (NutCache) : If given, a nut this cache has seen
+                decrypt (under the same key) isn't decrypted again, and
+                one that decrypts is added to it.
+            timing (HistogramSink) : If given, the decryption is
+                recorded as the ``nut.decrypt`` stage (see
+                :py:class:`.Request`).
+
         Returns
             Nut
         """
 
+        from bitstring import BitArray, Bits
+
+        #use the fields already decoded, if cached
+        if cache is not None:
+            fields = cache.get(self.key, nut)
+            if fields is not None:
+                self.nuts['raw'], self.timestamp, self.counter, self.isqr = fields
+                self.islink = not self.isqr
+                self.ip = None
+                return self
+
         #decrypt the nut
-        box = nacl.secret.SecretBox(self.key)
+        if timing is not None:
+            start = time.perf_counter()
+        box = _box(self.key)
         msg = urlsafe_b64decode(pad(nut).encode('utf-8'))
-        out = box.decrypt(msg)
+        try:
+            out = box.decrypt(msg)
+        finally:
+            if timing is not None:
+                timing.record('nut.decrypt', time.perf_counter() - start)
         self.nuts['raw'] = BitArray(out)
         assert len(self.nuts['raw']) == 128
 
@@ -134,6 +178,9 @@ class Nut(object):
             self.isqr = False
             self.islink = True
 
+        if cache is not None:
+            cache.put(self.key, nut, (Bits(self.nuts['raw']), self.timestamp, self.counter, self.isqr))
+
         return self
 
     def validate(self, ipaddr, ttl, maxcounter=None, mincounter=0):
@@ -162,6 +209,10 @@ class Nut(object):
             validated.
         """
 
+        import ipaddress
+        import hashlib
+        from bitstring import BitArray
+
         #verify ipaddress
         ip = ipaddress.ip_address(ipaddr)
         baip = BitArray(ip.packed)
@@ -208,4 +259,105 @@ class Nut(object):
 
         if flag not in self.nuts:
             return None
-        return depad(urlsafe_b64encode(self.nuts[flag]).decode('utf-8'))
\ No newline at end of file
+        return depad(urlsafe_b64encode(self.nuts[flag]).decode('utf-8'))
+
+class NutCache(object):
+    """Remembers the decrypted contents of recently seen nuts
+
+    The same nut string comes back more than once: client retries,
+    repeated queries, and your own code checking a nut the browser is
+    polling with. Passing a cache to :py:meth:`Nut.load` (or to
+    :py:class:`.Request` as ``nutcache``) skips the decoding and
+    decryption for a nut that has already decrypted. Only nuts that
+    passed authenticated decryption are stored, and lookups are by the
+    exact string, so a forged or altered nut always goes through the
+    real check.
+
+    An entry expires when the nut itself goes stale, ``ttl`` seconds
+    after the time encoded in it, or earlier when it is evicted or
+    :py:meth:`invalidate` is called. The cache is a bounded LRU and is
+    thread-safe.
+
+    Keyword Args:
+        maxsize (uint) : Most nuts kept. Defaults to 10000.
+        ttl (uint) : Seconds after its timestamp that a nut is kept.
+            Match it to the requests' ``ttl``. Defaults to 600.
+        clock (callable) : Returns the current Unix time. Defaults to
+            ``time.time``.
+        wheel (TimingWheel) : A running :py:class:`.TimingWheel`. If
+            given, stale nuts are dropped on its tick rather than left
+            until they are looked up or pushed out.
+
+    Entries hold the decoded fields (the raw nut as an immutable
+    ``Bits``, timestamp, counter and flavor), so a hit skips the bit
+    parsing as well as the decryption.
+
+    Attributes:
+        hits (uint) : Loads answered from the cache.
+        misses (uint) : Lookups that found nothing.
+    """
+
+    def __init__(self, maxsize=10000, ttl=600, clock=time.time, wheel=None):
+        if ( (not isinstance(maxsize, int)) or (maxsize < 1) ):
+            raise ValueError("maxsize must be an integer > 0")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.wheel = wheel
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, nut):
+        """Returns the cached fields of ``nut``, or None"""
+
+        with self._lock:
+            entry = self._entries.get(nut)
+            if ( (entry is None) or (entry[0] != key) ):
+                self.misses += 1
+                return None
+            if entry[2] <= self.clock():
+                self._pop(nut)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(nut)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, nut, fields):
+        """Stores the fields of a nut that decrypted under ``key``"""
+
+        expires = fields[1] + self.ttl
+        now = self.clock()
+        if expires <= now:
+            return
+        with self._lock:
+            self._pop(nut)
+            timer = None
+            if self.wheel is not None:
+                timer = self.wheel.schedule(expires - now, self._expire, nut, expires)
+            self._entries[nut] = (key, fields, expires, timer)
+            while len(self._entries) > self.maxsize:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self, nut):
+        """Forgets ``nut``, for example once it has been used to log in"""
+
+        with self._lock:
+            self._pop(nut)
+
+    def _pop(self, nut):
+        #caller holds the lock
+        entry = self._entries.pop(nut, None)
+        if ( (entry is not None) and (entry[3] is not None) ):
+            entry[3].cancel()
+
+    def _expire(self, nut, expires):
+        with self._lock:
+            entry = self._entries.get(nut)
+            if ( (entry is not None) and (entry[2] == expires) ):
+                del self._entries[nut]
@@ -0,0 +1,240 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+class _Entry(object):
+    """One pending login and everyone waiting on it"""
+
+    __slots__ = ('done', 'value', 'expires', 'counters', 'cond', 'futures', 'timer')
+
+    def __init__(self, lock, expires):
+        self.done = False
+        self.value = None
+        self.expires = expires
+        self.counters = []
+        self.cond = threading.Condition(lock)
+        self.futures = []
+        self.timer = None
+
+class PendingAuth(object):
+    """An in-memory registry of logins waiting on a phone
+
+    When a page shows a QR code, register the counter of the nut in it.
+    The page (or the request serving it) then waits on that counter
+    until a client completes ``ident`` for it, instead of polling your
+    database.
+
+    The phone never returns the QR nut in its ``ident``; it returns
+    the nut issued in response to its ``query``. A :py:class:`.Request`
+    given this registry as ``pending`` links each new nut to the one it
+    answered, and signals the chain once ``ident`` is authenticated, so
+    waiters only ever need the counter they registered.
+
+    Waiting is available both as a blocking call (for threaded servers)
+    and as a coroutine (for asyncio). Entries, signalled or not, are
+    dropped once their TTL runs out and anyone still waiting is woken
+    with ``None``. Without a ``wheel`` that happens lazily, on the next
+    call after expiry; with one, it happens on the wheel's tick.
+
+    Keyword Args:
+        ttl (uint) : Seconds an entry lives after registration. Defaults
+            to 600, the same as :py:class:`.Request`.
+        clock (callable) : Returns the current time in seconds. Defaults
+            to ``time.monotonic``.
+        wheel (TimingWheel) : A running :py:class:`.TimingWheel` to
+            expire entries with. It should share ``clock``.
+    """
+
+    def __init__(self, ttl=600, clock=time.monotonic, wheel=None):
+        if ( (not isinstance(ttl, (int, float))) or (ttl <= 0) ):
+            raise ValueError("TTL must be a number > 0")
+        self.ttl = ttl
+        self.clock = clock
+        self.wheel = wheel
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._expiry = []
+        self._seq = itertools.count()
+
+    def __len__(self):
+        with self._lock:
+            self._evict()
+            return len(set(map(id, self._entries.values())))
+
+    def __contains__(self, counter):
+        with self._lock:
+            self._evict()
+            return counter in self._entries
+
+    def register(self, counter, ttl=None):
+        """Starts tracking a nut
+
+        Registering a counter that is already tracked does nothing.
+
+        Args:
+            counter (uint) : The counter of the nut shown to the user.
+
+        Keyword Args:
+            ttl (uint) : Overrides the registry's TTL for this entry.
+        """
+
+        if ttl is None:
+            ttl = self.ttl
+        with self._lock:
+            self._evict()
+            if counter in self._entries:
+                return
+            entry = _Entry(self._lock, self.clock() + ttl)
+            entry.counters.append(counter)
+            self._entries[counter] = entry
+            if self.wheel is None:
+                heapq.heappush(self._expiry, (entry.expires, next(self._seq), entry))
+            else:
+                entry.timer = self.wheel.schedule(ttl, self._expire, entry)
+
+    def link(self, counter, newcounter):
+        """Makes ``newcounter`` an alias of a tracked ``counter``
+
+        Called by :py:meth:`.Request.finalize` with the counters of the
+        nut it received and the nut it issued. Does nothing if
+        ``counter`` isn't tracked.
+        """
+
+        with self._lock:
+            entry = self._entries.get(counter)
+            if ( (entry is not None) and (newcounter not in self._entries) ):
+                entry.counters.append(newcounter)
+                self._entries[newcounter] = entry
+
+    def signal(self, counter, value=True):
+        """Marks a login as complete and wakes its waiters
+
+        Args:
+            counter (uint) : The counter of any nut in the chain.
+
+        Keyword Args:
+            value : What the waiters receive. :py:class:`.Request` passes
+                the client's ``idk``. Defaults to True.
+
+        Returns:
+            bool : Whether the counter was tracked.
+        """
+
+        with self._lock:
+            entry = self._entries.get(counter)
+            if ( (entry is None) or (entry.done) ):
+                return entry is not None
+            self._finish(entry, value)
+            return True
+
+    def discard(self, counter):
+        """Stops tracking a nut (and every nut linked to it)
+
+        Anyone still waiting receives ``None``.
+        """
+
+        with self._lock:
+            entry = self._entries.get(counter)
+            if entry is not None:
+                self._drop(entry)
+
+    def wait(self, counter, timeout=None):
+        """Blocks until the login completes
+
+        Args:
+            counter (uint) : A registered counter.
+
+        Keyword Args:
+            timeout (float) : Seconds to wait. Defaults to waiting until
+                the entry expires.
+
+        Returns:
+            The signalled value, or None on timeout, expiry, or if the
+            counter isn't tracked.
+        """
+
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(counter)
+            if entry is None:
+                return None
+            deadline = entry.expires
+            if timeout is not None:
+                deadline = min(deadline, self.clock() + timeout)
+            while not entry.done:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    break
+                entry.cond.wait(remaining)
+            return entry.value
+
+    async def wait_async(self, counter, timeout=None):
+        """Awaits the login without blocking the event loop
+
+        Takes the same arguments and returns the same thing as
+        :py:meth:`wait`. Signals may come from any thread.
+        """
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(counter)
+            if entry is None:
+                return None
+            if entry.done:
+                return entry.value
+            remaining = entry.expires - self.clock()
+            if timeout is not None:
+                remaining = min(remaining, timeout)
+            future = loop.create_future()
+            entry.futures.append((loop, future))
+        try:
+            return await asyncio.wait_for(future, max(remaining, 0))
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self._lock:
+                if (loop, future) in entry.futures:
+                    entry.futures.remove((loop, future))
+
+    def evict(self):
+        """Drops expired entries now instead of on the next call"""
+
+        with self._lock:
+            self._evict()
+
+    def _finish(self, entry, value):
+        #caller holds the lock
+        entry.done = True
+        entry.value = value
+        entry.cond.notify_all()
+        for loop, future in entry.futures:
+            loop.call_soon_threadsafe(_resolve, future, value)
+        entry.futures = []
+
+    def _expire(self, entry):
+        with self._lock:
+            self._drop(entry)
+
+    def _drop(self, entry):
+        #caller holds the lock
+        if entry.timer is not None:
+            entry.timer.cancel()
+            entry.timer = None
+        for counter in entry.counters:
+            if self._entries.get(counter) is entry:
+                del self._entries[counter]
+        if not entry.done:
+            self._finish(entry, None)
+
+    def _evict(self):
+        #caller holds the lock
+        now = self.clock()
+        while ( (self._expiry) and (self._expiry[0][0] <= now) ):
+            self._drop(heapq.heappop(self._expiry)[2])
+
+def _resolve(future, value):
+    if not future.done():
+        future.set_result(value)
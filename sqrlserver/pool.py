@@ -0,0 +1,126 @@
+from .nut import NutCache
+from .request import Request
+import concurrent.futures
+
+#set up once in each worker process by _initialize
+_worker = None
+
+def _initialize(key, resolver, nutcache, options):
+    global _worker
+    options = dict(options)
+    if nutcache:
+        options['nutcache'] = NutCache()
+    _worker = (key, resolver(), options)
+
+def _run(params, ipaddr, counter):
+    """Runs one request to completion in a worker and returns its result record"""
+
+    key, resolver, options = _worker
+    req = Request(key, params, ipaddr=ipaddr, **options)
+    actions = []
+    req.handle()
+    while req.state == 'ACTION':
+        actions.extend(action[0] for action in req.action)
+        req.handle(resolver(req))
+    response = req.finalize(failsafe=True, counter=counter)
+    nut = None
+    if req.nut is not None:
+        nut = (req.nut.timestamp, req.nut.counter, req.nut.isqr, req.nut.ipmatch, req.nut.fresh, req.nut.countersane)
+    return (response._tif, response.toString(), tuple(actions), nut)
+
+class RequestPool(object):
+    """Runs requests to completion across a pool of worker processes
+
+    For CPU-bound bursts: signature checks and nut decryption hold a
+    core each, and a process pool uses all of them whatever the GIL
+    does. Each worker is set up once, when it starts: it gets the key,
+    makes its own resolver, and (by default) its own
+    :py:class:`.NutCache`. The nut cipher is built once per process
+    too, on the worker's first nut, and reused for every one after. After that a task carries only the request's
+    parameters, address and counter, and what comes back is a small
+    result record rather than the Request itself.
+
+    Each result is a tuple ``(tif, response, actions, nut)``: the
+    response's TIF as an int, the finalized response as the string to
+    send the client, the names of the actions the resolver was asked
+    (in order), and the received nut's ``(timestamp, counter, isqr,
+    ipmatch, fresh, countersane)``, or None if it never decrypted.
+
+    Args:
+        key (bytes) : The 32-byte key used to encrypt nuts.
+        resolver (callable) : Called once in each worker, with no
+            arguments, to make that worker's resolver (which is then used
+            as for :py:class:`.WsgiApp`). It must be picklable, such as a
+            module-level function or a ``functools.partial`` of
+            :py:class:`.SqliteIdentityStore` and a path; a resolver holding
+            only in-process state would not be shared between workers.
+        counter (callable) : Called in this process, with no arguments,
+            to get the counter for each new nut. A :py:class:`.Counter`
+            will do.
+
+    Keyword Args:
+        workers (uint) : Number of processes. Defaults to the executor's
+            default (the number of CPUs).
+        nutcache (bool) : Whether each worker keeps a
+            :py:class:`.NutCache`. Defaults to True.
+        context (multiprocessing context) : Passed to the
+            ProcessPoolExecutor, to choose how workers start.
+
+    Any other keyword arguments (``ttl``, ``maxcounter``, ``binary``,
+    etc.) are passed to every :py:class:`.Request`; they must be
+    picklable too.
+    """
+
+    def __init__(self, key, resolver, counter, workers=None, nutcache=True, context=None, **kwargs):
+        assert len(key) == 32
+        self.counter = counter
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_initialize, initargs=(key, resolver, nutcache, kwargs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, params, ipaddr='0.0.0.0'):
+        """Queues a request
+
+        Args:
+            params (dict) : The request's parameters, the query string's
+                and the body's together (as :py:class:`.Request` takes).
+
+        Keyword Args:
+            ipaddr (string) : The client's address. Defaults to '0.0.0.0'.
+
+        Returns:
+            Future : Resolves to the result record. Use
+            ``asyncio.wrap_future`` to await it.
+        """
+
+        return self.executor.submit(_run, params, ipaddr, self.counter())
+
+    def process(self, params, ipaddr='0.0.0.0'):
+        """Runs a request and waits for its result record"""
+
+        return self.submit(params, ipaddr).result()
+
+    def map(self, requests, chunksize=1):
+        """Runs many requests, yielding their result records in order
+
+        Args:
+            requests (iterable) : ``(params, ipaddr)`` pairs.
+
+        Keyword Args:
+            chunksize (uint) : Requests sent to a worker at a time.
+                Larger chunks mean fewer round trips between processes.
+                Defaults to 1.
+        """
+
+        requests = list(requests)
+        counters = [self.counter() for r in requests]
+        return self.executor.map(_run, [r[0] for r in requests], [r[1] for r in requests], counters, chunksize=chunksize)
+
+    def close(self):
+        """Waits for queued requests and stops the workers"""
+
+        self.executor.shutdown(wait=True)
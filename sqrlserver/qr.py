@@ -0,0 +1,574 @@
+import operator
+import re
+from .nut import Nut
+
+class QrCode(object):
+    """A rendered QR symbol
+
+    Attributes:
+        version (uint) : The QR version (1-40) of the symbol.
+        size (uint) : The width/height of the symbol in modules.
+        ecc (string) : The error correction level (``L``, ``M``, ``Q``, or ``H``).
+        mask (uint) : The mask pattern (0-7) applied to the data modules.
+        matrix (list) : One ``bytearray`` per row. A value of 1 is a dark
+            module, 0 is a light one.
+    """
+
+    _halfblocks = {(0, 0): ' ', (1, 0): '▀', (0, 1): '▄', (1, 1): '█'}
+
+    def __init__(self, version, ecc, mask, matrix):
+        self.version = version
+        self.size = len(matrix)
+        self.ecc = ecc
+        self.mask = mask
+        self.matrix = matrix
+
+    def __repr__(self):
+        return "<QrCode(version={}, ecc={}, mask={})>".format(self.version, self.ecc, self.mask)
+
+    def toText(self, border=4, compact=True):
+        """Renders the symbol as plain text
+
+        Keyword Args:
+            border (uint) : Width of the quiet zone in modules. Defaults
+                to 4, as required by the spec.
+            compact (bool) : If True (default), two rows of modules are
+                packed into each line using Unicode half blocks.
+                Otherwise each module is two characters wide (``##`` or
+                two spaces) and each row is its own line.
+
+        Returns:
+            string : The rendered symbol. Dark modules are drawn as
+            filled characters, so it is meant for dark text on a light
+            background.
+        """
+
+        width = self.size + (2 * border)
+        quiet = _quiet_lines(width, border, compact)
+        pad = quiet['pad']
+        lines = list(quiet['top'])
+        if compact:
+            blocks = self._halfblocks
+            rows = self.matrix + [bytearray(self.size)]
+            for y in range(0, self.size, 2):
+                top = rows[y]
+                bottom = rows[y + 1]
+                lines.append(pad + ''.join([blocks[(top[x], bottom[x])] for x in range(self.size)]) + pad)
+            lines.extend(quiet['bottom'])
+        else:
+            for row in self.matrix:
+                lines.append(pad + ''.join([('##' if m else '  ') for m in row]) + pad)
+            lines.extend(quiet['bottom'])
+        return '\n'.join(lines)
+
+class QrEncoder(object):
+    """Encodes SQRL URLs into QR symbols (byte mode only)
+
+    The encoder caches everything that depends only on the version,
+    error correction level and mask: the function patterns, the order in
+    which data modules are filled, and the mask itself. When constructed
+    with a ``prefix`` (and usually a ``suffix`` and ``length``), the
+    mode indicator, character count, and fixed parts of the data
+    codewords are also precomputed, so encoding a new URL only touches
+    the bytes that change (normally just the nut).
+
+    Any string that doesn't fit the template is still encoded correctly,
+    just without the shortcut.
+
+    Args:
+        prefix (string) : Fixed leading portion of every URL (normally
+            everything up to and including ``nut=``).
+
+    Keyword Args:
+        suffix (string) : Fixed trailing portion of every URL (anything
+            after the nut). Defaults to ''.
+        length (uint) : The length of the variable portion. Required if
+            ``prefix`` is given.
+        ecc (string) : Error correction level. One of ``L``, ``M``
+            (default), ``Q``, or ``H``.
+        mask (uint) : Force a given mask pattern (0-7). Defaults to None,
+            which scores all eight patterns as the spec recommends.
+            Fixing the mask skips the scoring and is roughly eight
+            times faster. Every mask is equally readable by scanners.
+    """
+
+    def __init__(self, prefix=None, suffix='', length=None, ecc='M', mask=None):
+        if ecc not in _ECC_FORMAT:
+            raise ValueError("The error correction level must be one of 'L', 'M', 'Q', or 'H'.")
+        if ( (mask is not None) and (mask not in range(8)) ):
+            raise ValueError("If given, mask must be an integer from 0 to 7.")
+        self.ecc = ecc
+        self.mask = mask
+        self._template = None
+        if prefix is not None:
+            if ( (not isinstance(length, int)) or (length < 1) ):
+                raise ValueError("A positive length must be given with a prefix.")
+            self._template = _Template(prefix.encode('utf-8'), suffix.encode('utf-8'), length, ecc)
+
+    @classmethod
+    def forUrl(cls, url, path, ecc='M', mask=None, **kwargs):
+        """Builds an encoder primed for the URLs a :py:class:`.Url` produces
+
+        Args:
+            url (Url) : The object you will generate URLs with.
+            path (string) : The path you will pass to
+                :py:meth:`.Url.generate`.
+
+        Keyword Args:
+            ecc (string) : See the class description.
+            mask (uint) : See the class description.
+            query (list) : The ``query`` you will pass to
+                :py:meth:`.Url.generate`, if any.
+            ext (uint) : The ``ext`` you will pass to
+                :py:meth:`.Url.generate`, if any.
+
+        Returns:
+            QrEncoder
+        """
+
+        opts = {}
+        if 'query' in kwargs:
+            opts['query'] = list(kwargs['query'])
+        if 'ext' in kwargs:
+            opts['ext'] = kwargs['ext']
+        dummy = Nut(bytes(32)).generate('0.0.0.0', 0, timestamp=0)
+        nutstr = dummy.toString('qr')
+        s = url.generate(path, nut=dummy, **opts)
+        idx = s.index('nut=' + nutstr) + 4
+        return cls(s[:idx], suffix=s[idx + len(nutstr):], length=len(nutstr), ecc=ecc, mask=mask)
+
+    def encode(self, data):
+        """Encodes a string into a :py:class:`.QrCode`
+
+        Args:
+            data (string) : The URL (or any other text) to encode.
+
+        Returns:
+            QrCode
+        """
+
+        codewords = None
+        if self._template is not None:
+            codewords = self._template.codewords(data)
+        if codewords is None:
+            raw = data.encode('utf-8')
+            version = _choose_version(len(raw), self.ecc)
+            codewords = _data_codewords(raw, version, self.ecc)
+        else:
+            version = self._template.version
+        layout = _layout(version, self.ecc)
+        bits = layout.interleave(codewords)
+
+        if self.mask is not None:
+            mask = self.mask
+            rows = layout.place(bits, mask)
+        else:
+            mask = None
+            rows = None
+            best = None
+            for m in range(8):
+                candidate = layout.place(bits, m)
+                score = _penalty(candidate)
+                if ( (best is None) or (score < best) ):
+                    best = score
+                    mask = m
+                    rows = candidate
+        matrix = [bytearray(row.encode('ascii').translate(_FROM_ASCII)) for row in rows]
+        return QrCode(version, self.ecc, mask, matrix)
+
+def encode(data, ecc='M', mask=None):
+    """Convenience function that encodes a string without a template
+
+    Args:
+        data (string) : The text to encode.
+
+    Keyword Args:
+        ecc (string) : Error correction level. Defaults to ``M``.
+        mask (uint) : Mask pattern to use. Defaults to None (best score).
+
+    Returns:
+        QrCode
+    """
+
+    return QrEncoder(ecc=ecc, mask=mask).encode(data)
+
+#
+# Everything below is private plumbing. The tables and algorithms follow
+# ISO/IEC 18004:2015.
+#
+
+_ECC_FORMAT = {'L': 1, 'M': 0, 'Q': 3, 'H': 2}
+_ECC_INDEX = {'L': 0, 'M': 1, 'Q': 2, 'H': 3}
+
+_ECC_CODEWORDS_PER_BLOCK = (
+    (None, 7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28, 28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    (None, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26, 26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28),
+    (None, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30, 28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    (None, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28, 30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+)
+
+_NUM_ECC_BLOCKS = (
+    (None, 1, 1, 1, 1, 1, 2, 2, 2, 2, 4, 4, 4, 4, 4, 6, 6, 6, 6, 7, 8, 8, 9, 9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25),
+    (None, 1, 1, 1, 2, 2, 4, 4, 4, 5, 5, 5, 8, 9, 9, 10, 10, 11, 13, 14, 16, 17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49),
+    (None, 1, 1, 2, 2, 4, 4, 6, 6, 8, 8, 8, 10, 12, 16, 12, 17, 16, 18, 21, 20, 23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68),
+    (None, 1, 1, 2, 4, 4, 4, 5, 6, 8, 8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25, 25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81),
+)
+
+_MASKS = (
+    lambda x, y: (x + y) % 2 == 0,
+    lambda x, y: y % 2 == 0,
+    lambda x, y: x % 3 == 0,
+    lambda x, y: (x + y) % 3 == 0,
+    lambda x, y: (x // 3 + y // 2) % 2 == 0,
+    lambda x, y: x * y % 2 + x * y % 3 == 0,
+    lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+    lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+)
+
+#GF(256) log/antilog tables using the QR polynomial 0x11D
+_EXP = [0] * 512
+_LOG = [0] * 256
+_v = 1
+for _i in range(255):
+    _EXP[_i] = _v
+    _LOG[_v] = _i
+    _v <<= 1
+    if _v & 0x100:
+        _v ^= 0x11D
+for _i in range(255, 512):
+    _EXP[_i] = _EXP[_i - 255]
+del _v, _i
+
+_layouts = {}
+_divisors = {}
+_quiet = {}
+
+def _num_raw_modules(version):
+    result = (16 * version + 128) * version + 64
+    if version >= 2:
+        numalign = version // 7 + 2
+        result -= (25 * numalign - 10) * numalign - 55
+        if version >= 7:
+            result -= 36
+    return result
+
+def _num_data_codewords(version, ecc):
+    i = _ECC_INDEX[ecc]
+    return (_num_raw_modules(version) // 8) - (_ECC_CODEWORDS_PER_BLOCK[i][version] * _NUM_ECC_BLOCKS[i][version])
+
+def _count_bits(version):
+    if version < 10:
+        return 8
+    return 16
+
+def _choose_version(length, ecc):
+    for version in range(1, 41):
+        needed = 4 + _count_bits(version) + (8 * length)
+        if needed <= _num_data_codewords(version, ecc) * 8:
+            return version
+    raise ValueError("The data is too long to fit in a QR code.")
+
+def _header(length, version):
+    """Mode indicator (byte mode) and character count as (int, nbits)"""
+
+    nbits = _count_bits(version)
+    return ((0x4 << nbits) | length, 4 + nbits)
+
+def _finish(value, nbits, version, ecc):
+    """Adds terminator and padding to a bit stream, returning bytes"""
+
+    capacity = _num_data_codewords(version, ecc) * 8
+    term = min(4, capacity - nbits)
+    value <<= term
+    nbits += term
+    if nbits % 8 != 0:
+        value <<= (8 - (nbits % 8))
+        nbits += 8 - (nbits % 8)
+    out = bytearray(value.to_bytes(nbits // 8, 'big'))
+    pad = 0xEC
+    while len(out) * 8 < capacity:
+        out.append(pad)
+        pad ^= 0xEC ^ 0x11
+    return out
+
+def _data_codewords(raw, version, ecc):
+    head, nbits = _header(len(raw), version)
+    value = (head << (8 * len(raw))) | int.from_bytes(raw, 'big')
+    return _finish(value, nbits + (8 * len(raw)), version, ecc)
+
+def _rs_divisor(degree):
+    if degree in _divisors:
+        return _divisors[degree]
+    result = [0] * (degree - 1) + [1]
+    root = 1
+    for _ in range(degree):
+        for j in range(degree):
+            if result[j] != 0:
+                result[j] = _EXP[_LOG[result[j]] + _LOG[root]]
+            if j + 1 < degree:
+                result[j] ^= result[j + 1]
+        root = _EXP[_LOG[root] + 1]
+    #store as logs for the remainder loop
+    divisor = tuple([_LOG[c] for c in result])
+    _divisors[degree] = divisor
+    return divisor
+
+def _rs_remainder(data, divisor):
+    result = [0] * len(divisor)
+    exp = _EXP
+    log = _LOG
+    for b in data:
+        factor = b ^ result.pop(0)
+        result.append(0)
+        if factor == 0:
+            continue
+        lf = log[factor]
+        for i, lc in enumerate(divisor):
+            result[i] ^= exp[lc + lf]
+    return result
+
+def _alignment_positions(version):
+    if version == 1:
+        return []
+    numalign = version // 7 + 2
+    size = (version * 4) + 17
+    step = (version * 8 + numalign * 3 + 5) // (numalign * 4 - 4) * 2
+    result = [size - 7 - i * step for i in range(numalign - 1)] + [6]
+    return list(reversed(result))
+
+def _layout(version, ecc):
+    key = (version, ecc)
+    if key not in _layouts:
+        _layouts[key] = _Layout(version, ecc)
+    return _layouts[key]
+
+class _Layout(object):
+    """Everything about a (version, ecc) pair that never changes"""
+
+    def __init__(self, version, ecc):
+        self.version = version
+        self.ecc = ecc
+        self.size = size = (version * 4) + 17
+        i = _ECC_INDEX[ecc]
+        self.numblocks = _NUM_ECC_BLOCKS[i][version]
+        self.blockecclen = _ECC_CODEWORDS_PER_BLOCK[i][version]
+        self.rawcodewords = _num_raw_modules(version) // 8
+        self.divisor = _rs_divisor(self.blockecclen)
+
+        modules = [bytearray(size) for _ in range(size)]
+        isfunc = [bytearray(size) for _ in range(size)]
+
+        def setf(x, y, dark):
+            modules[y][x] = 1 if dark else 0
+            isfunc[y][x] = 1
+
+        #timing patterns
+        for j in range(size):
+            setf(6, j, j % 2 == 0)
+            setf(j, 6, j % 2 == 0)
+
+        #finder patterns (with separators)
+        for (cx, cy) in ((3, 3), (size - 4, 3), (3, size - 4)):
+            for dy in range(-4, 5):
+                for dx in range(-4, 5):
+                    x = cx + dx
+                    y = cy + dy
+                    if ( (0 <= x < size) and (0 <= y < size) ):
+                        dist = max(abs(dx), abs(dy))
+                        setf(x, y, dist not in (2, 4))
+
+        #alignment patterns
+        pos = _alignment_positions(version)
+        n = len(pos)
+        for a in range(n):
+            for b in range(n):
+                if ( ((a == 0) and (b == 0)) or ((a == 0) and (b == n - 1)) or ((a == n - 1) and (b == 0)) ):
+                    continue
+                for dy in range(-2, 3):
+                    for dx in range(-2, 3):
+                        setf(pos[a] + dx, pos[b] + dy, max(abs(dx), abs(dy)) != 1)
+
+        #reserve format areas (real bits are drawn per mask)
+        self.formatcoords = self._format_coords()
+        for (x, y) in self.formatcoords:
+            setf(x, y, False)
+        setf(8, size - 8, True)
+
+        #version information
+        if version >= 7:
+            rem = version
+            for _ in range(12):
+                rem = (rem << 1) ^ ((rem >> 11) * 0x1F25)
+            bits = (version << 12) | rem
+            for k in range(18):
+                dark = ((bits >> k) & 1) != 0
+                a = size - 11 + (k % 3)
+                b = k // 3
+                setf(a, b, dark)
+                setf(b, a, dark)
+
+        self.template = modules
+
+        #zigzag order of data modules
+        coords = []
+        right = size - 1
+        while right >= 1:
+            if right == 6:
+                right = 5
+            for vert in range(size):
+                for j in range(2):
+                    x = right - j
+                    upward = ((right + 1) & 2) == 0
+                    y = (size - 1 - vert) if upward else vert
+                    if not isfunc[y][x]:
+                        coords.append((y, x))
+            right -= 2
+        self.coords = coords
+        #Placing the data is a single gather over ``bits + template``:
+        #data modules pick from the bit string, the rest from the template.
+        lookup = {}
+        for i, (y, x) in enumerate(coords):
+            lookup[(y * size) + x] = i
+        self._gather = operator.itemgetter(*[lookup.get(k, len(coords) + k) for k in range(size * size)])
+        self._masked = {}
+
+    def _format_coords(self):
+        size = self.size
+        first = [(8, i) for i in range(6)] + [(8, 7), (8, 8), (7, 8)] + [(14 - i, 8) for i in range(9, 15)]
+        second = [(size - 1 - i, 8) for i in range(8)] + [(8, size - 15 + i) for i in range(8, 15)]
+        return first + second
+
+    def _mask_template(self, mask):
+        """Template with format bits drawn, and the mask as an int over ``coords``"""
+
+        if mask in self._masked:
+            return self._masked[mask]
+        data = (_ECC_FORMAT[self.ecc] << 3) | mask
+        rem = data
+        for _ in range(10):
+            rem = (rem << 1) ^ ((rem >> 9) * 0x537)
+        bits = ((data << 10) | rem) ^ 0x5412
+        template = [bytearray(row) for row in self.template]
+        for i, (x, y) in enumerate(self.formatcoords):
+            template[y][x] = (bits >> (i % 15)) & 1
+        flat = b''.join(template).translate(_TO_ASCII).decode('ascii')
+        fn = _MASKS[mask]
+        maskint = 0
+        for (y, x) in self.coords:
+            maskint = (maskint << 1) | (1 if fn(x, y) else 0)
+        self._masked[mask] = (flat, maskint)
+        return self._masked[mask]
+
+    def interleave(self, data):
+        """Splits data into blocks, adds ECC, and returns the final bit stream as an int"""
+
+        numblocks = self.numblocks
+        blockecclen = self.blockecclen
+        numshort = numblocks - (self.rawcodewords % numblocks)
+        shortlen = self.rawcodewords // numblocks
+        blocks = []
+        k = 0
+        for i in range(numblocks):
+            datlen = shortlen - blockecclen + (0 if i < numshort else 1)
+            dat = data[k:k + datlen]
+            k += datlen
+            ecc = _rs_remainder(dat, self.divisor)
+            if i < numshort:
+                dat = dat + b'\x00'
+            blocks.append(bytes(dat) + bytes(ecc))
+        out = bytearray()
+        skip = shortlen - blockecclen
+        for i in range(len(blocks[0])):
+            for j, blk in enumerate(blocks):
+                if ( (i != skip) or (j >= numshort) ):
+                    out.append(blk[i])
+        #remainder bits (unused modules) are zero before masking
+        remainder = len(self.coords) - (len(out) * 8)
+        return int.from_bytes(out, 'big') << remainder
+
+    def place(self, bits, mask):
+        """Returns the masked symbol as a list of '0'/'1' row strings"""
+
+        template, maskint = self._mask_template(mask)
+        s = bin(bits ^ maskint)[2:].zfill(len(self.coords))
+        flat = ''.join(self._gather(s + template))
+        size = self.size
+        return [flat[i:i + size] for i in range(0, size * size, size)]
+
+class _Template(object):
+    """Precomputed data codewords for URLs sharing a prefix and suffix"""
+
+    def __init__(self, prefix, suffix, length, ecc):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.length = length
+        total = len(prefix) + length + len(suffix)
+        self.total = total
+        self.version = _choose_version(total, ecc)
+        head, nbits = _header(total, self.version)
+        value = (head << (8 * total)) | (int.from_bytes(prefix, 'big') << (8 * (length + len(suffix)))) | int.from_bytes(suffix, 'big')
+        self.fixed = bytes(_finish(value, nbits + (8 * total), self.version, ecc))
+        #bit offset of the variable part, counted from the end of the codewords
+        self.shift = (len(self.fixed) * 8) - (nbits + (8 * total)) + (8 * len(suffix))
+        self.fixedint = int.from_bytes(self.fixed, 'big')
+
+    def codewords(self, data):
+        if len(data) != self.total:
+            return None
+        raw = data.encode('utf-8')
+        if ( (len(raw) != self.total) or (not raw.startswith(self.prefix)) or (not raw.endswith(self.suffix)) ):
+            return None
+        middle = raw[len(self.prefix):len(self.prefix) + self.length]
+        value = self.fixedint | (int.from_bytes(middle, 'big') << self.shift)
+        return value.to_bytes(len(self.fixed), 'big')
+
+def _quiet_lines(width, border, compact):
+    key = (width, border, compact)
+    if key not in _quiet:
+        if compact:
+            blank = ' ' * width
+            top = [blank] * ((border + 1) // 2)
+            #symbols always have an odd size, so the last line of the
+            #symbol already holds one quiet row
+            bottom = [blank] * (border // 2)
+            pad = ' ' * border
+        else:
+            blank = '  ' * width
+            top = [blank] * border
+            bottom = [blank] * border
+            pad = '  ' * border
+        _quiet[key] = {'top': top, 'bottom': bottom, 'pad': pad}
+    return _quiet[key]
+
+def _penalty(rows):
+    """Mask penalty score as described in section 7.8.3 of the spec"""
+
+    size = len(rows)
+    score = 0
+    cols = [''.join(col) for col in zip(*rows)]
+    #rows and columns are scanned as one string; no pattern spans a newline
+    lines = '\n'.join(rows + cols)
+    #N1: runs of five or more same-coloured modules
+    runs = _RUNS.findall(lines)
+    score += sum(map(len, runs)) - (2 * len(runs))
+    #N3: finder-like patterns
+    score += 40 * (lines.count('10111010000') + lines.count('00001011101'))
+    #N2: 2x2 blocks, using each row as an integer
+    full = (1 << (size - 1)) - 1
+    ints = [int(line, 2) for line in rows]
+    for y in range(size - 1):
+        a = ints[y]
+        b = ints[y + 1]
+        dark = a & b & (a >> 1) & (b >> 1) & full
+        light = ~(a | b | (a >> 1) | (b >> 1)) & full
+        score += 3 * (bin(dark).count('1') + bin(light).count('1'))
+    #N4: proportion of dark modules
+    dark = sum([line.count('1') for line in rows])
+    total = size * size
+    k = (abs(dark * 20 - total * 10) + total - 1) // total - 1
+    score += max(k, 0) * 10
+    return score
+
+_TO_ASCII = bytes.maketrans(b'\x00\x01', b'01')
+_FROM_ASCII = bytes.maketrans(b'01', b'\x00\x01')
+_RUNS = re.compile(r'0{5,}|1{5,}')
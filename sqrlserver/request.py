@@ -2,6 +2,7 @@ from .utils import pad, depad, stripurl, addquery, delquery
 from .response import Response
 from .nut import Nut
 import ipaddress
+import time
 import urllib.parse
 import nacl.exceptions
 import nacl.signing
@@ -81,13 +82,63 @@ class Request(object):
             check will verify that the MAC is valid. It is keyed by
             the master key passed at object instantiation. Unless that
             key is relatively stable, this check may not be useful.
+        pending (PendingAuth) : A :py:class:`.PendingAuth` (or anything
+            with the same ``link`` and ``signal`` methods). If given, a
+            successful ``ident`` signals the nut's counter with the
+            client's ``idk``, and ``finalize`` links the new nut to the
+            one received.
+        seen (SeenNuts) : A :py:class:`.SeenNuts` replay list (or
+            anything with the same ``add`` method). If given, each valid
+            nut is recorded until it would go stale, and a nut that was
+            already recorded is treated as a bad nut.
+        macstore (MemoryMacStore) : A :py:class:`.MemoryMacStore`,
+            :py:class:`.SqliteMacStore`, or anything with the same
+            ``get`` and ``put`` methods. If given, ``finalize`` stores
+            the response's MAC under its new nut, and unless ``hmac`` is
+            passed, the MAC stored under the received nut (if any) is
+            checked.
+        cps (CpsIssuer) : A :py:class:`.CpsIssuer`. If given, and the
+            client asked for ``cps``, a successful ``auth`` action gets a
+            one-time ``url`` from it unless the resolver supplies one.
+        binary (bool) : If True, the client's keys (``idk``, ``pidk``,
+            ``suk`` and ``vuk``) and signatures (``ids``, ``pids`` and
+            ``urs``) are decoded once, during the well-formedness check,
+            into 32- and 64-byte ``bytes``. A key or signature of any
+            other length makes the request malformed. Resolvers then get
+            ``bytes`` keys in the action tuples (and ``pending`` is
+            signalled with one) and may answer ``suk`` and ``vuk`` with
+            either ``bytes`` or b64u strings. Defaults to False.
+        nutcache (NutCache) : A :py:class:`.NutCache`. If given, the
+            received nut is decrypted only if the cache hasn't already
+            seen it, and a successful ``ident`` drops it from the cache.
+        timing (HistogramSink) : A :py:class:`.HistogramSink`,
+            :py:class:`.CallbackSink`, or anything with the same
+            ``record(stage, seconds)`` method. If given, the time spent
+            in each stage is recorded: ``parse`` (the well-formedness
+            check), ``signature`` (Ed25519), ``hmac`` (SipHash, if a MAC
+            is checked), ``nut`` (loading and validating the nut, which
+            includes ``nut.decrypt``), ``resolver`` (from ``handle``
+            asking for an action to being called again) and
+            ``finalize``. Defaults to None, which records nothing.
+        tracer (Tracer) : A :py:class:`.Tracer`, such as an
+            :py:class:`.OpenTelemetryTracer`. If given, each of the
+            stages above (but ``nut.decrypt``) gets a span named
+            ``sqrl.<stage>`` with the stage's outcome as attributes.
+            Defaults to None, which traces nothing.
+        metrics (Registry) : A :py:class:`.Registry`. If given, the
+            request's outcome is counted there: its command and TIF bits
+            once complete, why it was rejected or questioned, whether a
+            ``confirm`` was accepted, and the nut's age and counter lag.
     """
 
-    _supported_versions = ['1']
-    _known_cmds = ['query', 'ident', 'disable', 'enable', 'remove']  
-    _supported_cmds = ['query', 'ident', 'disable', 'enable', 'remove']
-    _known_opts = ['sqrlonly', 'hardlock', 'cps', 'suk']
-    _supported_opts = ['sqrlonly', 'hardlock', 'cps', 'suk']
+    #tuples, so that no request can change them for every other thread
+    _supported_versions = ('1',)
+    _known_cmds = ('query', 'ident', 'disable', 'enable', 'remove')
+    _supported_cmds = ('query', 'ident', 'disable', 'enable', 'remove')
+    _known_opts = ('sqrlonly', 'hardlock', 'cps', 'suk')
+    _supported_opts = ('sqrlonly', 'hardlock', 'cps', 'suk')
+    _key_params = ('idk', 'pidk', 'suk', 'vuk')
+    _sig_params = ('ids', 'pids', 'urs')
 
     def __init__(self, key, params, **kwargs):
         self.ipaddr = ipaddress.ip_address('0.0.0.0')
@@ -122,11 +173,50 @@ class Request(object):
         self.hmac = None
         if 'hmac' in kwargs:
             self.hmac = kwargs['hmac']
+
+        self.pending = None
+        if 'pending' in kwargs:
+            self.pending = kwargs['pending']
+
+        self.seen = None
+        if 'seen' in kwargs:
+            self.seen = kwargs['seen']
+
+        self.macstore = None
+        if 'macstore' in kwargs:
+            self.macstore = kwargs['macstore']
+
+        self.cps = None
+        if 'cps' in kwargs:
+            self.cps = kwargs['cps']
+
+        self.binary = False
+        if 'binary' in kwargs:
+            self.binary = kwargs['binary']
+
+        self.nutcache = None
+        if 'nutcache' in kwargs:
+            self.nutcache = kwargs['nutcache']
+
+        self.timing = None
+        if 'timing' in kwargs:
+            self.timing = kwargs['timing']
+
+        self.tracer = None
+        if 'tracer' in kwargs:
+            self.tracer = kwargs['tracer']
+        self._observed = ( (self.timing is not None) or (self.tracer is not None) )
+        self._waiting = None
+
+        self.metrics = None
+        if 'metrics' in kwargs:
+            self.metrics = kwargs['metrics']
         
         self._response = Response()
         self.params = dict(params)
         self.key = key
         self.admin = False
+        self.nut = None
 
         #set initial state 
         self.state = 'NEW'
@@ -169,6 +259,10 @@ class Request(object):
             For more details, please read the standalone docs.
         """
 
+        if ( (self._observed) and (self._waiting is not None) ):
+            self._finish('resolver', self._waiting, {'sqrl.answered': ','.join(sorted(args))})
+            self._waiting = None
+
         #First check if we're in an ``ACTION`` state and process given data
         #Throw error if insufficient or malformed data is passed.
         #Otherwise, set appropriate state and continue.
@@ -180,15 +274,17 @@ class Request(object):
                     else:
                         self._response.tifOn(0x20, 0x40)
                         self.state = 'COMPLETE'
+                    if self.metrics is not None:
+                        self.metrics.inc('sqrl_confirm_total', (('result', 'accepted' if self.state == 'VALID' else 'declined'),))
                 elif action[0] == 'find':
                     if ( ('found' in args) and (isinstance(args['found'], list)) and (len(args['found']) > 0) ):
                         if args['found'][0] == True:
                             self._response.tifOn(0x01)
                             if 'disabled' in args:
                                 self._response.tifOn(0x08)
-                                if ( ('suk' not in args) or (not isinstance(args['suk'], str)) or (len(args['suk']) == 0) ):
+                                if ( ('suk' not in args) or (not isinstance(args['suk'], (str, bytes))) or (len(args['suk']) == 0) ):
                                     raise ValueError("You must provide the Server Unlock Key if you encounter a disabled account.")
-                                self._response.addParam('suk', args['suk'])
+                                self._response.addParam('suk', Request._b64u(args['suk']))
                         if (len(args['found']) > 1):
                             if args['found'][1] == True:
                                 self._response.tifOn(0x02)
@@ -200,15 +296,21 @@ class Request(object):
                         raise ValueError("The server failed to respond adequately to the 'ident' action. The handler expects the key 'authenticated' with a boolean value.")
                     if args['authenticated']:
                         self._response.tifOn(0x01)
+                        if self.pending is not None:
+                            self.pending.signal(self.nut.counter, self.params['client']['idk'])
+                        if self.nutcache is not None:
+                            self.nutcache.invalidate(self.params['nut'])
                         if 'url' in args:
                             self._response.addParam('url', args['url'])
+                        elif ( (self.cps is not None) and ('cps' in action) ):
+                            self._response.addParam('url', self.cps.issueUrl(Request._b64u(self.params['client']['idk'])))
                         self.state = 'COMPLETE'
                     else:
                         if 'disabled' in args:
                             self._response.tifOn(0x01, 0x08, 0x40)
-                            if ( ('suk' not in args) or (not isinstance(args['suk'], str)) or (len(args['suk']) == 0) ):
+                            if ( ('suk' not in args) or (not isinstance(args['suk'], (str, bytes))) or (len(args['suk']) == 0) ):
                                 raise ValueError("You must provide the Server Unlock Key if you encounter a disabled account.")
-                            self._response.addParam('suk', args['suk'])
+                            self._response.addParam('suk', Request._b64u(args['suk']))
                         else:
                             self._response.tifOn(0x40, 0x80)
                         self.state = 'COMPLETE'
@@ -216,10 +318,10 @@ class Request(object):
                     if 'deactivated' not in args:
                         raise ValueError("The server failed to respond adequately to the 'disable' action. The handler expects the key 'deactivated' with a boolean value.")
                     if args['deactivated']:
-                        if ( ('suk' not in args) or (not isinstance(args['suk'], str)) or (len(args['suk']) == 0) ):
+                        if ( ('suk' not in args) or (not isinstance(args['suk'], (str, bytes))) or (len(args['suk']) == 0) ):
                             raise ValueError("You must provide the Server Unlock Key if you encounter a disabled account.") 
                         else:
-                            self._response.addParam('suk', args['suk'])
+                            self._response.addParam('suk', Request._b64u(args['suk']))
 
                         self._response.tifOn(0x01, 0x08)
                         self.state = 'COMPLETE'
@@ -238,7 +340,7 @@ class Request(object):
                         self.state = 'COMPLETE'
                 elif action[0] == 'suk':
                     if 'suk' in args:
-                        self._response.addParam('suk', args['suk'])
+                        self._response.addParam('suk', Request._b64u(args['suk']))
                 elif action[0] == 'vuk':
                     if 'vuk' not in args:
                         raise ValueError("The server failed to adequately respond to the 'vuk' action. The handler expects either the stored VUK or None if the user isn't recognized.")
@@ -278,6 +380,9 @@ class Request(object):
                             self._response.tifOn(0x01)
                         self._response.tifOn(0x40)
                         self.state = 'COMPLETE'
+                elif action[0] in ['btn', 'ins', 'pins']:
+                    #informational only; nothing is expected back
+                    pass
                 else:
                     raise ValueError('Unrecognized action ({}). This should never happen!'.format(action[0]))
             self.action = []
@@ -301,9 +406,11 @@ class Request(object):
                         txt += ';' + stripurl(btn[1])
                     msg += '~' + txt
             self._response.addParam('ask', msg)
-        for param in ['btn', 'ins', 'pins']:
-            if param in self.params['client']:
-                self.action.append((param, self.params['client'][param]))
+        #``client`` is only a dict once it has been parsed
+        if isinstance(self.params.get('client'), dict):
+            for param in ['btn', 'ins', 'pins']:
+                if param in self.params['client']:
+                    self.action.append((param, self.params['client'][param]))
 
         #Loop until we need additional information or are finished.
         #TODO: Need to prove there's no chance of an infinite loop, or rewrite.
@@ -314,16 +421,12 @@ class Request(object):
             if count > 5:
                 raise RuntimeError("Looks like an infinite loop. Here's the request:\n{}".format(self))
             if self.state == 'NEW':
-                #perform basic well-formedness checks and set state accordingly
-                wf = self._check_well_formedness()
-                if wf:
-                    self.state = 'WELLFORMED'
-                else:
-                    self._response.tifOn(0x40, 0x80)
-                    self.state = 'COMPLETE'
+                self._parse()
             elif self.state == 'WELLFORMED':
                 #perform validity tests and set state accordingly
                 errs = self._check_validity()
+                if self.metrics is not None:
+                    self._measure(errs)
                 #invalid signature
                 if 'sigs' in errs:
                     self._response.tifOn(0x40, 0x80)
@@ -346,6 +449,8 @@ class Request(object):
                 if (cmd not in self._supported_cmds):
                     self._response.tifOn(0x10, 0x40)
                     self.state = 'COMPLETE'
+                    if self.metrics is not None:
+                        self.metrics.inc('sqrl_rejected_total', (('reason', 'unsupported'),))
                 else:
                     if cmd == 'query':
                         self.state = 'ACTION'
@@ -363,7 +468,7 @@ class Request(object):
                             act.append(self.params['client']['vuk'])
                         else:
                             act.append(None)
-                        if 'cps' in self.params['client']['opt']:
+                        if 'cps' in self.params['client'].get('opt', []):
                             act.append('cps')
                         self.action.append(tuple(act))
                         self._process_opts()
@@ -394,6 +499,114 @@ class Request(object):
 
         #This code should never exit in a state other than ``ACTION`` or ``COMPLETE``
         assert self.state in ['ACTION', 'COMPLETE']
+        if ( (self._observed) and (self.state == 'ACTION') ):
+            self._waiting = self._begin('resolver')
+            if self._waiting[1] is not None:
+                self._waiting[1].set_attribute('sqrl.actions', ','.join(action[0] for action in self.action))
+        if ( (self.metrics is not None) and (self.state == 'COMPLETE') ):
+            self._count()
+
+    def parse(self):
+        """Runs only the well-formedness checks on a new request
+
+        These are cheap: no signature is verified and no nut decrypted.
+        Servers that run the cryptography elsewhere (such as
+        :py:class:`.AsgiApp`, in an executor) call this first, then
+        :py:meth:`handle` as usual. A malformed request is ``COMPLETE``
+        afterwards, with the same response and metrics as if
+        :py:meth:`handle` had found it.
+
+        Returns:
+            bool : Whether the request still needs handling.
+        """
+
+        if self.state == 'NEW':
+            self._parse()
+            if ( (self.metrics is not None) and (self.state == 'COMPLETE') ):
+                self._count()
+        return self.state != 'COMPLETE'
+
+    def reject(self, reason, *bits):
+        """Ends the request early, answering with the given TIF bits
+
+        For servers that turn a request away themselves, such as
+        :py:class:`.AsgiApp` when its executor is full. Metrics count it
+        as rejected for ``reason`` and as a completed request.
+
+        Args:
+            reason (string) : The ``sqrl_rejected_total`` label.
+            bits (uint) : TIF bits to set.
+        """
+
+        if ( (self._observed) and (self._waiting is not None) ):
+            self._finish('resolver', self._waiting)
+            self._waiting = None
+        self._response.tifOn(*bits)
+        self.state = 'COMPLETE'
+        self.action = []
+        if self.metrics is not None:
+            self.metrics.inc('sqrl_rejected_total', (('reason', reason),))
+            self._count()
+
+    def _parse(self):
+        """Moves a NEW request to WELLFORMED, or COMPLETE if malformed"""
+
+        if self._observed:
+            started = self._begin('parse')
+        wf = self._check_well_formedness()
+        if self._observed:
+            self._finish('parse', started, {'sqrl.wellformed': wf})
+        if wf:
+            self.state = 'WELLFORMED'
+        else:
+            self._response.tifOn(0x40, 0x80)
+            self.state = 'COMPLETE'
+            if self.metrics is not None:
+                self.metrics.inc('sqrl_rejected_total', (('reason', 'malformed'),))
+
+    def _begin(self, stage):
+        """Starts timing and tracing a stage"""
+
+        span = None
+        if self.tracer is not None:
+            span = self.tracer.start_span('sqrl.' + stage)
+        return (time.perf_counter(), span)
+
+    def _finish(self, stage, started, attributes=None):
+        """Records a stage started with :py:meth:`_begin`"""
+
+        if self.timing is not None:
+            self.timing.record(stage, time.perf_counter() - started[0])
+        if started[1] is not None:
+            if attributes is not None:
+                for name, value in attributes.items():
+                    started[1].set_attribute(name, value)
+            started[1].end()
+
+    def _measure(self, errs):
+        """Records the validity check's errors and the nut's age and counter lag"""
+
+        for err in errs:
+            self.metrics.inc('sqrl_rejected_total', (('reason', err),))
+        if self.nut is not None:
+            self.metrics.observe('sqrl_nut_age_seconds', time.time() - self.nut.timestamp)
+            if self.maxcounter is not None:
+                self.metrics.observe('sqrl_counter_lag', self.maxcounter - self.nut.counter)
+
+    def _count(self):
+        """Records a completed request's command and TIF bits"""
+
+        #only known commands become labels, or clients could add series at will
+        cmd = 'none'
+        if ( (isinstance(self.params.get('client'), dict)) and (self.params['client'].get('cmd') in self._known_cmds) ):
+            cmd = self.params['client']['cmd']
+        self.metrics.inc('sqrl_requests_total', (('cmd', cmd),))
+        tif = self._response._tif
+        bit = 1
+        while bit <= tif:
+            if tif & bit:
+                self.metrics.inc('sqrl_tif_total', (('bit', '0x{:02x}'.format(bit)),))
+            bit <<= 1
 
     def _process_opts(self):
         """Private method for extracting and acting on options.
@@ -405,7 +618,7 @@ class Request(object):
         """
 
         assert self.state == 'VALID'
-        opts = self.params['client']['opt']
+        opts = self.params['client'].get('opt', [])
         if 'sqrlonly' in opts:
             self.action.append(('sqrlonly', True))
         else:
@@ -419,13 +632,19 @@ class Request(object):
         if 'suk' in opts:
             self.action.append(('suk',))
 
-    def finalize(self, **kwargs):
+    def finalize(self, failsafe=False, **kwargs):
         """Finalizes and returns the internal Response object.
 
-        This function has no side effects. It can be called multiple
-        times without issue. SFN is injected automatically.
+        This function has no side effects on the request. It can be
+        called multiple times without issue. SFN is injected
+        automatically. If the request was given a ``pending`` registry
+        or a ``macstore``, the new nut is recorded there.
 
         Keyword Args:
+            failsafe (bool) : If True, a request with no nut to answer
+                (missing, or one that doesn't decrypt) gets
+                :py:meth:`.Response.failure` instead of an exception.
+                Defaults to False.
             counter (uint) : 32-byte integer to encode as the 
                 counter value in the new nut. Must be provided if you 
                 want the object to generate the nut for you.
@@ -453,7 +672,24 @@ class Request(object):
         Returns:
             Response : the finalized response object.
         """
-        
+
+        try:
+            if not self._observed:
+                return self._finalize(**kwargs)
+            started = self._begin('finalize')
+            r = None
+            try:
+                r = self._finalize(**kwargs)
+                return r
+            finally:
+                self._finish('finalize', started, None if r is None else {'sqrl.tif': r._tif})
+        except (KeyError, ValueError, nacl.exceptions.CryptoError):
+            if not failsafe:
+                raise
+            #no usable nut to answer with
+            return Response.failure(self._response)
+
+    def _finalize(self, **kwargs):
         #choose a nut
         nut = None
         if 'nut' in kwargs:
@@ -470,11 +706,15 @@ class Request(object):
                 timestamp = kwargs['timestamp']
             nut.generate(ipaddr, kwargs['counter'], timestamp=timestamp)
         assert nut is not None
-        oldnut = Nut(self.key)
-        oldnut.load(self.params['nut'])
+        #reuse the nut already loaded by the validity check
+        oldnut = self.nut
+        if oldnut is None:
+            oldnut = Nut(self.key).load(self.params['nut'], cache=self.nutcache)
         nutstr = nut.toString('qr')
         if oldnut.islink:
             nutstr = nut.toString('link')
+        if self.pending is not None:
+            self.pending.link(oldnut.counter, nut.counter)
 
         #finalize qry
         qry = None
@@ -494,6 +734,8 @@ class Request(object):
         #add to response object
         r.addParam('nut', nutstr)
         r.addParam('qry', qry)
+        if self.macstore is not None:
+            self.macstore.put(nutstr, r.hmac(self.key))
 
         #return response object
         return r
@@ -504,7 +746,8 @@ class Request(object):
         Ensures that
             - the required parameters are present,
             - the ``client`` parameter can be parsed,
-            - the parsed ``client`` parameter contains required and valid keys, and
+            - the parsed ``client`` parameter contains required and valid keys,
+            - a ``pidk`` comes with its ``pids`` signature, and
             - the ``server`` parameter can be parsed.
 
         Returns:
@@ -540,6 +783,9 @@ class Request(object):
             for opt in self.params['client']['opt']:
                 if opt not in self._known_opts:
                     return False
+        #a previous identity must prove itself, or anyone could claim one
+        if ( ('pidk' in self.params['client']) and ('pids' not in self.params) ):
+            return False
 
         #valid server
         try:
@@ -547,6 +793,16 @@ class Request(object):
         except:
             return False
 
+        #decode keys and signatures once, rejecting the wrong lengths
+        if self.binary:
+            self._tosign = self._tosign.encode('utf-8')
+            for params, names, size in [(self.params['client'], self._key_params, 32), (self.params, self._sig_params, 64)]:
+                for name in names:
+                    if name in params:
+                        params[name] = Request._decode(params[name], size)
+                        if params[name] is None:
+                            return False
+
         return True
 
     def _check_validity(self):
@@ -566,7 +822,8 @@ class Request(object):
 
             ``sigs`` : One or more signatures were invalid.
             ``hmac`` : The HMAC didn't match.
-            ``nut`` : The nut failed fundamental decryption checks.
+            ``nut`` : The nut failed fundamental decryption checks, or
+                was replayed.
             ``ip`` : The ip addresses didn't match. Request confirmation.
             ``time`` : The nut is stale. Request confirmation.
             ``counter`` : The counter was out of bounds (if provided). 
@@ -581,17 +838,27 @@ class Request(object):
         errs = []
 
         # Validate the signatures. If any of them are invalid, reject everything.
+        if self._observed:
+            started = self._begin('signature')
         validsigs = Request._signature_valid(self._tosign, self.params['client']['idk'], self.params['ids'])
         if ( (validsigs) and ('pidk' in self.params['client']) and ('pids' in self.params) ):
             validsigs = Request._signature_valid(self._tosign, self.params['client']['pidk'], self.params['pids'])
+        if self._observed:
+            self._finish('signature', started, {'sqrl.valid': validsigs})
         if not validsigs:
             errs.append('sigs')
 
         if validsigs:
             #validate hmac if present
             validmac = True
+            if ( (self.hmac is None) and (self.macstore is not None) ):
+                self.hmac = self.macstore.get(self.params['nut'])
             if self.hmac is not None:
+                if self._observed:
+                    started = self._begin('hmac')
                 mac = depad(nacl.hash.siphash24(self._origserver.encode('utf-8'), key=self.key[:16], encoder=nacl.encoding.URLSafeBase64Encoder).decode('utf-8'))
+                if self._observed:
+                    self._finish('hmac', started, {'sqrl.valid': self.hmac == mac})
                 if self.hmac != mac:
                     validmac = False
                     errs.append('hmac')
@@ -600,14 +867,22 @@ class Request(object):
                 # Validate nut 
                 validnut = True
                 nut = Nut(self.key)
+                if self._observed:
+                    started = self._begin('nut')
                 try:
-                    nut = nut.load(self.params['nut']).validate(self.ipaddr, self.ttl, maxcounter=self.maxcounter, mincounter=self.mincounter)
+                    nut = nut.load(self.params['nut'], cache=self.nutcache, timing=self.timing).validate(self.ipaddr, self.ttl, maxcounter=self.maxcounter, mincounter=self.mincounter)
                 except nacl.exceptions.CryptoError:
                     validnut = False
+                if self._observed:
+                    self._finish('nut', started, {'sqrl.valid': validnut, 'sqrl.ipmatch': nut.ipmatch, 'sqrl.fresh': nut.fresh, 'sqrl.countersane': nut.countersane})
+                #only record nuts we issued, or anyone could fill the list
+                if ( (validnut) and (self.seen is not None) ):
+                    validnut = self.seen.add(self.params['nut'], nut.timestamp + self.ttl)
                 if not validnut:
                     errs.append('nut')
 
                 if validnut:
+                    self.nut = nut
                     if not nut.ipmatch:
                         errs.append('ip')
                     else:
@@ -673,25 +948,59 @@ class Request(object):
             server[name] = value
         return server
 
+    @staticmethod
+    def _decode(s, size):
+        """Decodes a b64u key or signature
+
+        Returns:
+            bytes : The decoded value, or None if it isn't ``size`` bytes.
+        """
+
+        try:
+            raw = urlsafe_b64decode(pad(s))
+        except (ValueError, TypeError):
+            return None
+        if len(raw) != size:
+            return None
+        return raw
+
+    @staticmethod
+    def _b64u(value):
+        """Encodes raw bytes as b64u, passing strings through"""
+
+        if isinstance(value, bytes):
+            return depad(urlsafe_b64encode(value).decode('utf-8'))
+        return value
+
     @staticmethod
     def _signature_valid(msg, key, sig):
         """Validates Ed25519 signatures
 
         Args:
-            msg (string) : The signed message.
-            key (string) : The b64u-encoded signing key.
-            sig (string) : The b64u-encoded signature.
+            msg (string) : The signed message (or its UTF-8 bytes).
+            key (string) : The b64u-encoded signing key (or its raw
+                32 bytes).
+            sig (string) : The b64u-encoded signature (or its raw 64
+                bytes).
 
         Returns:
             bool : Whether the signature matches or not.
         """
 
         try:
-            vk = nacl.signing.VerifyKey(pad(key), encoder=nacl.encoding.URLSafeBase64Encoder)
-            vk.verify(msg.encode('utf-8'), urlsafe_b64decode(pad(sig)))
+            if isinstance(key, str):
+                key = urlsafe_b64decode(pad(key))
+            if isinstance(sig, str):
+                sig = urlsafe_b64decode(pad(sig))
+            if isinstance(msg, str):
+                msg = msg.encode('utf-8')
+            nacl.signing.VerifyKey(key).verify(msg, sig)
             return True
         except nacl.exceptions.BadSignatureError:
             return False
+        except ValueError:
+            #undecodable or wrong-length keys and signatures
+            return False
 
 
 
@@ -1,5 +1,4 @@
 from .utils import depad
-import nacl.hash
 from base64 import urlsafe_b64encode
 
 class Response:
@@ -15,7 +14,7 @@ class Response:
         params (dict) : The name-value pairs currently set.
     """
 
-    _bits = [0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80, 0x100]
+    _bits = (0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80, 0x100)
     _supportedvers = '1'
 
     def __init__(self, ver=1):
@@ -28,14 +27,32 @@ class Response:
 
     @staticmethod
     def load(ref):
-        """Loads an existing response into a new one"""
+        """Loads an existing response into a new one
+
+        The new response gets its own copy of the parameters, so changing
+        either one leaves the other alone.
+        """
 
         assert isinstance(ref, Response)
         r = Response(ref.ver)
         r._tif = ref._tif
-        r.params = ref.params
+        r.params = dict(ref.params)
         return r
 
+    @staticmethod
+    def failure(ref=None):
+        """A client-failure response (TIF 0x40 + 0x80)
+
+        For requests that can't be answered normally. If ``ref`` is
+        given, its parameters and TIF bits are kept.
+        """
+
+        if ref is None:
+            r = Response()
+        else:
+            r = Response.load(ref)
+        return r.tifOn(0x40, 0x80)
+
     @staticmethod
     def _compose(params):
         """Compose a dictionary of name-value pairs into the format required by the spec
@@ -60,6 +77,9 @@ class Response:
     def hmac(self, key):
         """Computes the HMAC for the current state of the response"""
 
+        import nacl.hash
+        import nacl.encoding
+
         assert len(key) >= 16
         s = self.toString()
         return depad(nacl.hash.siphash24(s.encode('utf-8'), key=key[:16], encoder=nacl.encoding.URLSafeBase64Encoder).decode('utf-8'))
@@ -0,0 +1,187 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+#magic, format version, capacity, probe limit, fingerprint salt
+_header = struct.Struct('<8sIIII16s')
+_HEADER_SIZE = 64
+_MAGIC = b'SQRLSEEN'
+_VERSION = 1
+
+#fcntl locks belong to the process, so every instance in the process
+#that has the same file open shares one thread lock instead:
+#(device, inode) -> [lock, instances]
+_locks = {}
+_locksLock = threading.Lock()
+
+class SeenNuts(object):
+    """A replay list shared by every process on the host
+
+    :py:meth:`.Nut.validate` leaves it to you to reject nuts that have
+    already been used. This is a fixed-size, open-addressing hash table
+    in a memory-mapped file, so every worker that opens the same path
+    sees the same list. Pass it to :py:class:`.Request` as ``seen``.
+
+    Each slot holds two native 64-bit integers: an 8-byte keyed
+    fingerprint of the nut (BLAKE2b, salted with a random value stored in
+    the file) and the Unix time the entry expires. There are no
+    per-entry Python objects, so millions of entries cost only the 16
+    bytes a slot takes in the page cache.
+
+    Lookups probe at most ``maxprobe`` consecutive slots from the home
+    slot. Expired slots met along the way are reused, so nothing needs
+    sweeping. If every slot in the window is live, the one closest to
+    expiry is overwritten, and that nut could then be replayed. Keep the
+    table at most half full (at least twice the number of nuts you issue
+    per TTL) and the default window won't fill up.
+
+    Writers lock only the bytes of their probe window with ``fcntl``,
+    so processes touching different parts of the table never wait on
+    each other. ``fcntl`` locks belong to the process, so within one
+    process every instance open on the same file (for instance one per
+    app or per thread) shares a single thread lock instead.
+
+    Args:
+        path (string) : The table's file. It is created if missing or
+            empty.
+
+    Keyword Args:
+        capacity (uint) : Number of slots for a new file, rounded up to a
+            power of two. Defaults to 2**20 (16 MiB). An existing file
+            keeps its own size.
+        maxprobe (uint) : Slots examined per lookup for a new file.
+            Defaults to 64.
+        clock (callable) : Returns the current Unix time. Defaults to
+            ``time.time``.
+    """
+
+    def __init__(self, path, capacity=2**20, maxprobe=64, clock=time.time):
+        if ( (not isinstance(capacity, int)) or (capacity < 1) ):
+            raise ValueError("Capacity must be an integer > 0")
+        if ( (not isinstance(maxprobe, int)) or (maxprobe < 1) ):
+            raise ValueError("maxprobe must be an integer > 0")
+        self.path = path
+        self.clock = clock
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        stat = os.fstat(self._fd)
+        self._file = (stat.st_dev, stat.st_ino)
+        with _locksLock:
+            shared = _locks.setdefault(self._file, [threading.Lock(), 0])
+            shared[1] += 1
+        self._lock = shared[0]
+        try:
+            with self._lock:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, _HEADER_SIZE, 0)
+                try:
+                    if os.fstat(self._fd).st_size == 0:
+                        capacity = 1 << (capacity - 1).bit_length()
+                        #the probe window never wraps; the tail absorbs overruns
+                        os.ftruncate(self._fd, _HEADER_SIZE + (capacity + maxprobe) * 16)
+                        os.pwrite(self._fd, _header.pack(_MAGIC, _VERSION, capacity, maxprobe, 0, os.urandom(16)), 0)
+                    magic, version, capacity, maxprobe, unused, salt = _header.unpack(os.pread(self._fd, _header.size, 0))
+                finally:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, _HEADER_SIZE, 0)
+            if ( (magic != _MAGIC) or (version != _VERSION) ):
+                raise ValueError("{} is not a seen-nut table.".format(path))
+            if os.fstat(self._fd).st_size != _HEADER_SIZE + (capacity + maxprobe) * 16:
+                raise ValueError("{} has the wrong size.".format(path))
+            self._mmap = mmap.mmap(self._fd, 0)
+        except Exception:
+            self._release()
+            raise
+        self.capacity = capacity
+        self.maxprobe = maxprobe
+        self._mask = capacity - 1
+        self._salt = salt
+        #even indexes are fingerprints, odd ones are expiries
+        self._slots = memoryview(self._mmap)[_HEADER_SIZE:].cast('Q')
+
+    def _fingerprint(self, nut):
+        fp = int.from_bytes(hashlib.blake2b(nut.encode('ascii'), key=self._salt, digest_size=8).digest(), 'little')
+        #zero marks an empty slot
+        return fp or 1
+
+    def add(self, nut, expires):
+        """Records a nut, unless it's already there
+
+        Args:
+            nut (string) : The nut as received from the client.
+            expires (uint) : Unix time after which the nut no longer needs
+                remembering (when it would fail the TTL check anyway).
+
+        Returns:
+            bool : True if the nut was new, False if it is a replay.
+        """
+
+        fp = self._fingerprint(nut)
+        home = fp & self._mask
+        slots = self._slots
+        now = int(self.clock())
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, self.maxprobe * 16, _HEADER_SIZE + home * 16)
+            try:
+                free = None
+                oldest = None
+                for i in range(home, home + self.maxprobe):
+                    slot = slots[2 * i]
+                    if slot == 0:
+                        if free is None:
+                            free = i
+                        break
+                    exp = slots[2 * i + 1]
+                    if exp <= now:
+                        if free is None:
+                            free = i
+                    elif slot == fp:
+                        return False
+                    elif ( (oldest is None) or (exp < slots[2 * oldest + 1]) ):
+                        oldest = i
+                if free is None:
+                    free = oldest
+                slots[2 * free + 1] = max(int(expires), now + 1)
+                slots[2 * free] = fp
+                return True
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.maxprobe * 16, _HEADER_SIZE + home * 16)
+
+    def __contains__(self, nut):
+        fp = self._fingerprint(nut)
+        home = fp & self._mask
+        slots = self._slots
+        now = int(self.clock())
+        for i in range(home, home + self.maxprobe):
+            slot = slots[2 * i]
+            if slot == 0:
+                return False
+            if ( (slot == fp) and (slots[2 * i + 1] > now) ):
+                return True
+        return False
+
+    def __len__(self):
+        """Number of live entries (scans the whole table)"""
+
+        now = int(self.clock())
+        slots = self._slots
+        return sum([1 for i in range(0, len(slots), 2) if ( (slots[i] != 0) and (slots[i + 1] > now) )])
+
+    def close(self):
+        """Unmaps the table and closes the file"""
+
+        self._slots.release()
+        self._mmap.close()
+        self._release()
+
+    def _release(self):
+        #closing any descriptor drops all of the process's locks on the
+        #file, so wait until no other instance is holding one
+        with self._lock:
+            os.close(self._fd)
+        with _locksLock:
+            shared = _locks[self._file]
+            shared[1] -= 1
+            if shared[1] == 0:
+                del _locks[self._file]
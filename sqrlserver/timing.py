@@ -0,0 +1,92 @@
+import bisect
+import threading
+
+#upper bounds in seconds, from 1 microsecond to 1 second
+BOUNDS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+
+class CallbackSink(object):
+    """Passes every timing to a function
+
+    Args:
+        callback (callable) : Called as ``callback(stage, seconds)``.
+            It runs inline, so it should be quick.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record(self, stage, seconds):
+        self.callback(stage, seconds)
+
+class HistogramSink(object):
+    """Collects timings into a fixed-bucket histogram per stage
+
+    Cheap enough to leave on in production: recording is a binary search
+    and three increments under a lock, and memory doesn't grow with the
+    number of requests.
+
+    Keyword Args:
+        bounds (tuple) : The buckets' upper bounds in seconds, ascending.
+            Anything slower lands in a final overflow bucket. Defaults to
+            ``BOUNDS``, 1 us to 1 s.
+    """
+
+    def __init__(self, bounds=BOUNDS):
+        if list(bounds) != sorted(bounds):
+            raise ValueError("Bucket bounds must be in ascending order.")
+        self.bounds = tuple(bounds)
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        i = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = [0, 0.0, [0] * (len(self.bounds) + 1)]
+            hist[0] += 1
+            hist[1] += seconds
+            hist[2][i] += 1
+
+    def snapshot(self):
+        """Returns a copy of everything recorded so far
+
+        Returns:
+            dict : ``{stage: {'count': n, 'sum': seconds, 'buckets':
+            [...]}}``, where ``buckets`` counts the timings at or under
+            each bound, plus the overflow bucket last (not cumulative).
+        """
+
+        with self._lock:
+            return {stage: {'count': h[0], 'sum': h[1], 'buckets': list(h[2])} for stage, h in self._stages.items()}
+
+    def percentile(self, stage, p):
+        """Estimates a percentile of one stage
+
+        Args:
+            stage (string) : The stage.
+            p (float) : Between 0 and 1.
+
+        Returns:
+            float : The upper bound of the bucket holding the percentile
+            (infinity for the overflow bucket), or None if the stage has
+            no timings.
+        """
+
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                return None
+            rank = p * hist[0]
+            seen = 0
+            for i, n in enumerate(hist[2]):
+                seen += n
+                if ( (seen >= rank) and (n > 0) ):
+                    break
+        if i == len(self.bounds):
+            return float('inf')
+        return self.bounds[i]
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
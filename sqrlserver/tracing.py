@@ -0,0 +1,52 @@
+class Span(object):
+    """A span that records nothing
+
+    Spans handed out by tracers need only these two methods, which are
+    named as in OpenTelemetry so its spans can be used as they are.
+    """
+
+    def set_attribute(self, key, value):
+        pass
+
+    def end(self):
+        pass
+
+_span = Span()
+
+class Tracer(object):
+    """A tracer that records nothing, and the interface tracers follow
+
+    :py:class:`.Request` (given a ``tracer``) starts one span per stage,
+    named ``sqrl.parse``, ``sqrl.signature``, ``sqrl.hmac``,
+    ``sqrl.nut``, ``sqrl.resolver`` (from an ``ACTION`` being asked for
+    to it being answered) and ``sqrl.finalize``, and sets a few
+    attributes on each before ending it. Any object with a
+    ``start_span(name)`` method returning such spans will do. Spans
+    should become children of whatever span is current, so the SQRL
+    stages show up inside your own request's span.
+    """
+
+    def start_span(self, name):
+        return _span
+
+class OpenTelemetryTracer(object):
+    """Sends spans to OpenTelemetry
+
+    ``opentelemetry-api`` is only imported when this is constructed, so
+    installing it (or not) costs nothing until tracing is turned on.
+    Spans are started in the current context, and so nest under the
+    active span.
+
+    Keyword Args:
+        tracer (opentelemetry.trace.Tracer) : The tracer to use.
+            Defaults to ``trace.get_tracer('sqrlserver')``.
+    """
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace
+            tracer = trace.get_tracer('sqrlserver')
+        self.tracer = tracer
+
+    def start_span(self, name):
+        return self.tracer.start_span(name)
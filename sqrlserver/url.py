@@ -84,9 +84,10 @@ class Url(object):
         nutstr = nut.toString(flag)
 
         #query
+        #a copy: the caller's list may be shared with other threads
         query = []
         if 'query' in kwargs:
-            query = kwargs['query']
+            query = list(kwargs['query'])
         if ( ('ext' in kwargs) and (kwargs['ext'] is not None) and (kwargs['ext'] > 0) ):
             query.insert(0, ('x', kwargs['ext']))
         query.insert(0, ('nut', nutstr))
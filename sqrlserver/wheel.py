@@ -0,0 +1,230 @@
+import asyncio
+import math
+import threading
+import time
+
+class Timer(object):
+    """A scheduled expiry, as returned by :py:meth:`TimingWheel.schedule`
+
+    Attributes:
+        deadline (uint) : The tick the timer fires on.
+        callback (callable) : What gets called.
+        args (tuple) : Arguments for ``callback``.
+    """
+
+    __slots__ = ('deadline', 'callback', 'args', '_bucket', '_wheel')
+
+    def __init__(self, wheel, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self._bucket = None
+        self._wheel = wheel
+
+    @property
+    def active(self):
+        """Whether the timer is still waiting to fire"""
+        return self._bucket is not None
+
+    def cancel(self):
+        """Unschedules the timer
+
+        Returns:
+            bool : False if it had already fired or been cancelled.
+        """
+
+        return self._wheel._cancel(self)
+
+class TimingWheel(object):
+    """A hierarchical timing wheel for expiring TTL-scoped state
+
+    Stores holding nuts, MACs, CPS tokens or pending logins schedule a
+    callback for each entry instead of sweeping themselves. Scheduling
+    and cancelling are O(1). Every ``resolution`` seconds the wheel
+    ticks and calls everything in the current slot as one batch.
+
+    Level 0 has ``slots`` slots of one tick each; each further level
+    covers ``slots`` times the span of the one below, and its entries
+    are moved down as their time approaches. Four levels of 64 slots at
+    one-second resolution span about six months; anything later is
+    parked at the top and re-filed until it comes into range.
+
+    Timers fire on the first tick at or after their deadline, so never
+    early and at most one ``resolution`` late. Callbacks run on whatever
+    drives the wheel: your own calls to :py:meth:`advance`, the thread
+    started by :py:meth:`start`, or the :py:meth:`run` coroutine. They
+    should be quick and must not raise. If one does, the rest of the
+    batch still runs, and :py:meth:`advance` re-raises the first
+    exception afterwards; the built-in drivers ignore it.
+
+    Keyword Args:
+        resolution (float) : Seconds per tick. Defaults to 1.
+        slots (uint) : Slots per level; a power of two. Defaults to 64.
+        levels (uint) : Number of levels. Defaults to 4.
+        clock (callable) : Returns the current time in seconds. Defaults
+            to ``time.monotonic``.
+
+    Attributes:
+        live (uint) : Timers currently scheduled.
+        expired (uint) : Timers fired since creation.
+        lastexpired (uint) : Timers fired by the most recent tick.
+        ticks (uint) : Ticks processed since creation.
+    """
+
+    def __init__(self, resolution=1, slots=64, levels=4, clock=time.monotonic):
+        if ( (not isinstance(resolution, (int, float))) or (resolution <= 0) ):
+            raise ValueError("Resolution must be a number > 0")
+        if ( (not isinstance(slots, int)) or (slots < 2) or (slots & (slots - 1)) ):
+            raise ValueError("Slots must be a power of two >= 2")
+        if ( (not isinstance(levels, int)) or (levels < 1) ):
+            raise ValueError("Levels must be an integer >= 1")
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+        self.clock = clock
+        self.live = 0
+        self.expired = 0
+        self.lastexpired = 0
+        self.ticks = 0
+        self._bits = slots.bit_length() - 1
+        self._mask = slots - 1
+        #each slot maps Timer -> None; dicts keep insertion order
+        self._wheel = [[{} for i in range(slots)] for j in range(levels)]
+        self._tick = self._now()
+        self._lock = threading.Lock()
+        self._stop = None
+
+    def _now(self):
+        return int(self.clock() / self.resolution)
+
+    def schedule(self, delay, callback, *args):
+        """Calls ``callback(*args)`` after ``delay`` seconds
+
+        Returns:
+            Timer
+        """
+
+        deadline = math.ceil((self.clock() + delay) / self.resolution)
+        timer = Timer(self, deadline, callback, args)
+        with self._lock:
+            if timer.deadline <= self._tick:
+                timer.deadline = self._tick + 1
+            self._file(timer)
+            self.live += 1
+        return timer
+
+    def _file(self, timer):
+        #caller holds the lock
+        diff = timer.deadline - self._tick
+        level = 0
+        while ( (level < self.levels - 1) and (diff >= (1 << (self._bits * (level + 1)))) ):
+            level += 1
+        tick = timer.deadline
+        if diff >= (1 << (self._bits * self.levels)):
+            #out of range; park it in the furthest slot and re-file later
+            tick = self._tick + (1 << (self._bits * self.levels)) - 1
+        bucket = self._wheel[level][(tick >> (self._bits * level)) & self._mask]
+        bucket[timer] = None
+        timer._bucket = bucket
+
+    def _cancel(self, timer):
+        with self._lock:
+            if timer._bucket is None:
+                return False
+            del timer._bucket[timer]
+            timer._bucket = None
+            self.live -= 1
+            return True
+
+    def advance(self, now=None):
+        """Processes every tick up to the current time
+
+        Keyword Args:
+            now (float) : The time to advance to, in the units of
+                ``clock``. Defaults to ``clock()``.
+
+        Returns:
+            uint : Number of timers fired.
+        """
+
+        target = int((self.clock() if now is None else now) / self.resolution)
+        fired = []
+        with self._lock:
+            while self._tick < target:
+                if self.live == 0:
+                    self.ticks += target - self._tick
+                    self._tick = target
+                    break
+                self._tick += 1
+                self.ticks += 1
+                tick = self._tick
+                #move higher levels down, from the top, as their window opens
+                for level in range(self.levels - 1, 0, -1):
+                    if tick & ((1 << (self._bits * level)) - 1) == 0:
+                        index = (tick >> (self._bits * level)) & self._mask
+                        bucket = self._wheel[level][index]
+                        self._wheel[level][index] = {}
+                        for timer in bucket:
+                            self._file(timer)
+                index = tick & self._mask
+                bucket = self._wheel[0][index]
+                self._wheel[0][index] = {}
+                for timer in bucket:
+                    timer._bucket = None
+                self.live -= len(bucket)
+                self.expired += len(bucket)
+                self.lastexpired = len(bucket)
+                fired.extend(bucket)
+        error = None
+        for timer in fired:
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+        return len(fired)
+
+    def start(self):
+        """Drives the wheel from a daemon thread
+
+        Returns:
+            TimingWheel : self
+        """
+
+        self._stop = threading.Event()
+        stop = self._stop
+        def loop():
+            while not stop.wait(self._sleep()):
+                try:
+                    self.advance()
+                except Exception:
+                    pass
+        threading.Thread(target=loop, name='sqrl-wheel', daemon=True).start()
+        return self
+
+    async def run(self):
+        """Drives the wheel from the running event loop until :py:meth:`stop`
+
+        Start it with ``asyncio.ensure_future(wheel.run())``.
+        """
+
+        self._stop = threading.Event()
+        stop = self._stop
+        while not stop.is_set():
+            await asyncio.sleep(self._sleep())
+            try:
+                self.advance()
+            except Exception:
+                pass
+
+    def stop(self):
+        """Stops the driver started by :py:meth:`start` or :py:meth:`run`"""
+
+        if self._stop is not None:
+            self._stop.set()
+
+    def _sleep(self):
+        #time left until the next tick boundary
+        return self.resolution - (self.clock() % self.resolution)
@@ -0,0 +1,336 @@
+from .identity import _key, _b64u, resolve
+import collections
+import threading
+import time
+
+_MISSING = object()
+
+class WriteBehindStore(object):
+    """Buffers identity writes and commits them in batches
+
+    Wraps a :py:class:`.SqliteIdentityStore` (or anything with its
+    methods and ``update``) and has the same interface, so it can be
+    used as the resolver in its place. Mutations (enrolling, rekeying,
+    disabling, enabling, removing, and recording options) update an
+    in-memory record for the ``idk``; repeated changes to one identity
+    coalesce into a single row write. A background thread commits the
+    buffer in one transaction when ``batch`` identities are waiting or
+    every ``delay`` seconds. Lookups check the buffer first, so this
+    process always reads its own writes.
+
+    The buffer lives in one process. Other processes reading the same
+    database see changes once they are committed, and concurrent
+    writers to the same identity from several processes resolve as last
+    write wins.
+
+    Args:
+        store (SqliteIdentityStore) : The store to write behind.
+
+    Keyword Args:
+        batch (uint) : Buffered identities that trigger a commit.
+            Defaults to 256.
+        delay (float) : Longest time between commits, in seconds.
+            Defaults to 0.05.
+        durability (string) : One of
+
+            - ``async`` (default): mutations return at once. A crash
+              loses at most the last ``delay`` seconds of writes.
+            - ``group``: mutations block until the batch holding them is
+              committed. Nothing acknowledged is lost, but concurrent
+              writers still share transactions. If that commit fails,
+              its writers get the error; their changes stay buffered
+              and are retried.
+            - ``sync``: every mutation is committed on its own before it
+              returns (no buffering).
+
+    Attributes:
+        flushes (uint) : Transactions committed.
+        rows (uint) : Identities written by those transactions.
+        coalesced (uint) : Mutations absorbed by an already-buffered
+            change to the same identity.
+        errors (uint) : Commits that failed (and were retried).
+    """
+
+    _durabilities = ['async', 'group', 'sync']
+
+    def __init__(self, store, batch=256, delay=0.05, durability='async'):
+        if durability not in self._durabilities:
+            raise ValueError("durability must be one of {}".format(', '.join(self._durabilities)))
+        self.store = store
+        self.batch = batch
+        self.delay = delay
+        self.durability = durability
+        self.flushes = 0
+        self.rows = 0
+        self.coalesced = 0
+        self.errors = 0
+        #(commit seconds, seconds the oldest write waited) per flush
+        self._latencies = collections.deque(maxlen=1024)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._buffer = {}
+        self._inflight = {}
+        self._oldest = None
+        self._taken = 0
+        self._committed = 0
+        self._failed = 0
+        self._error = None
+        self._closed = False
+        self._thread = None
+        if durability != 'sync':
+            self._thread = threading.Thread(target=self._run, name='sqrl-writebehind', daemon=True)
+            self._thread.start()
+
+    def __call__(self, req):
+        """Resolves a request's pending actions (see :py:func:`.identity.resolve`)"""
+
+        return resolve(self, req)
+
+    def _peek(self, idk):
+        #caller holds the lock; returns the buffered record, None if
+        #deleted, or _MISSING if the store has the answer
+        record = self._buffer.get(idk, _MISSING)
+        if record is _MISSING:
+            record = self._inflight.get(idk, _MISSING)
+        return record
+
+    def _current(self, *idks):
+        #caller holds the lock, which is let go while the store is read;
+        #returns the records as they stand once it is held again
+        while True:
+            records = [self._peek(idk) for idk in idks]
+            missing = [i for i in range(len(idks)) if records[i] is _MISSING]
+            if not missing:
+                return records
+            committed = self._committed
+            self._lock.release()
+            try:
+                found = [self.store.lookup(idks[i]) for i in missing]
+            finally:
+                self._lock.acquire()
+            #buffered since, or committed over what was read: go again
+            records = [self._peek(idk) for idk in idks]
+            if self._committed == committed:
+                for i, record in zip(missing, found):
+                    if records[i] is _MISSING:
+                        records[i] = record
+            if _MISSING not in records:
+                return records
+
+    def lookup(self, idk):
+        """See :py:meth:`.SqliteIdentityStore.lookup`"""
+
+        raw = _key(idk)
+        if raw is None:
+            return None
+        with self._lock:
+            record = self._peek(_b64u(raw))
+        if record is _MISSING:
+            return self.store.lookup(idk)
+        return None if record is None else dict(record)
+
+    def find(self, idk, pidk=None):
+        """See :py:meth:`.SqliteIdentityStore.find`"""
+
+        keys = [idk] if pidk is None else [idk, pidk]
+        with self._lock:
+            known = [_MISSING if _key(k) is None else self._peek(_b64u(_key(k))) for k in keys]
+        base = None
+        if _MISSING in known:
+            base = self.store.find(idk, pidk)
+        result = []
+        for i in range(len(keys)):
+            result.append(base[i] if known[i] is _MISSING else known[i] is not None)
+        record = base[-1] if known[0] is _MISSING else known[0]
+        return result + [None if record is None else dict(record)]
+
+    def create(self, idk, suk, vuk):
+        """See :py:meth:`.SqliteIdentityStore.create`"""
+
+        raws = [_key(idk), _key(suk), _key(vuk)]
+        if None in raws:
+            return False
+        idk = _b64u(raws[0])
+        with self._lock:
+            if self._current(idk)[0] is not None:
+                return False
+            target = self._put(idk, {'suk': _b64u(raws[1]), 'vuk': _b64u(raws[2]), 'disabled': False, 'sqrlonly': False, 'hardlock': False})
+        return self._settle(target)
+
+    def rekey(self, pidk, idk, suk, vuk):
+        """See :py:meth:`.SqliteIdentityStore.rekey`"""
+
+        raws = [_key(idk), _key(suk), _key(vuk), _key(pidk)]
+        if None in raws:
+            return False
+        idk = _b64u(raws[0])
+        pidk = _b64u(raws[3])
+        with self._lock:
+            old, new = self._current(pidk, idk)
+            if ( (old is None) or (new is not None) ):
+                return False
+            record = dict(old, suk=_b64u(raws[1]), vuk=_b64u(raws[2]))
+            self._put(pidk, None)
+            target = self._put(idk, record)
+        return self._settle(target)
+
+    def setDisabled(self, idk, disabled):
+        """See :py:meth:`.SqliteIdentityStore.setDisabled`"""
+
+        return self._change(idk, disabled=bool(disabled))
+
+    def setOptions(self, idk, sqrlonly, hardlock):
+        """See :py:meth:`.SqliteIdentityStore.setOptions`"""
+
+        return self._change(idk, sqrlonly=bool(sqrlonly), hardlock=bool(hardlock))
+
+    def remove(self, idk):
+        """See :py:meth:`.SqliteIdentityStore.remove`"""
+
+        raw = _key(idk)
+        if raw is None:
+            return False
+        idk = _b64u(raw)
+        with self._lock:
+            if self._current(idk)[0] is None:
+                return False
+            target = self._put(idk, None)
+        return self._settle(target)
+
+    def _change(self, idk, **fields):
+        raw = _key(idk)
+        if raw is None:
+            return False
+        idk = _b64u(raw)
+        with self._lock:
+            record = self._current(idk)[0]
+            if record is None:
+                return False
+            target = self._put(idk, dict(record, **fields))
+        return self._settle(target)
+
+    def _put(self, idk, record):
+        #caller holds the lock; returns the flush that will commit it
+        if idk in self._buffer:
+            self.coalesced += 1
+        self._buffer[idk] = record
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        if ( (len(self._buffer) >= self.batch) or (self.durability == 'group') ):
+            self._cond.notify_all()
+        return self._taken + 1
+
+    def _settle(self, target):
+        #waits for durability, as configured
+        if self.durability == 'sync':
+            self.flush()
+        elif self.durability == 'group':
+            with self._lock:
+                while ( (self._committed < target) and (not self._closed) ):
+                    if self._failed >= target:
+                        raise self._error
+                    self._cond.wait()
+        return True
+
+    def flush(self):
+        """Commits everything buffered so far"""
+
+        with self._lock:
+            #one commit at a time
+            while self._inflight:
+                self._cond.wait()
+            if not self._buffer:
+                return
+            changes, taken, oldest = self._take()
+        self._commit(changes, taken, oldest)
+
+    def _take(self):
+        #caller holds the lock
+        changes = self._buffer
+        oldest = self._oldest
+        self._inflight = changes
+        self._buffer = {}
+        self._oldest = None
+        self._taken += 1
+        return changes, self._taken, oldest
+
+    def _commit(self, changes, taken, oldest):
+        start = time.monotonic()
+        try:
+            self.store.update(changes)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                self._failed = taken
+                self._error = e
+                #put them back under anything newer, and retry later
+                for idk, record in changes.items():
+                    self._buffer.setdefault(idk, record)
+                self._oldest = oldest
+                self._inflight = {}
+                self._cond.notify_all()
+            raise
+        end = time.monotonic()
+        with self._lock:
+            self._inflight = {}
+            self._committed = taken
+            self.flushes += 1
+            self.rows += len(changes)
+            self._latencies.append((end - start, end - oldest))
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._ready():
+                    timeout = None
+                    if ( (self._buffer) and (not self._inflight) ):
+                        timeout = self.delay - (time.monotonic() - self._oldest)
+                    self._cond.wait(timeout)
+                if self._closed:
+                    return
+                changes, taken, oldest = self._take()
+            try:
+                self._commit(changes, taken, oldest)
+            except Exception:
+                time.sleep(self.delay)
+
+    def _ready(self):
+        #caller holds the lock
+        if self._closed:
+            return True
+        if ( (not self._buffer) or (self._inflight) ):
+            return False
+        return ( (len(self._buffer) >= self.batch) or (self.durability == 'group') or (time.monotonic() - self._oldest >= self.delay) )
+
+    def stats(self):
+        """Flush metrics
+
+        Returns:
+            dict : Counts (``flushes``, ``rows``, ``coalesced``,
+            ``errors``, ``pending``) and, over the last 1024 flushes,
+            ``commit_p50``, ``commit_p99`` and ``commit_max`` (seconds
+            spent in the transaction) and ``lag_p50``, ``lag_p99`` and
+            ``lag_max`` (seconds from the oldest write in a batch to its
+            commit).
+        """
+
+        with self._lock:
+            stats = {'flushes': self.flushes, 'rows': self.rows, 'coalesced': self.coalesced, 'errors': self.errors, 'pending': len(self._buffer)}
+            latencies = list(self._latencies)
+        for i, name in [(0, 'commit'), (1, 'lag')]:
+            values = sorted([l[i] for l in latencies]) or [0.0]
+            stats[name + '_p50'] = values[len(values) // 2]
+            stats[name + '_p99'] = values[min(len(values) - 1, (len(values) * 99) // 100)]
+            stats[name + '_max'] = values[-1]
+        return stats
+
+    def close(self):
+        """Commits what is buffered and stops the background thread"""
+
+        with self._lock:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
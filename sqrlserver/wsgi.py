@@ -0,0 +1,127 @@
+from .request import Request
+from .response import Response
+from .form import parse, FormError
+import threading
+import urllib.parse
+
+class Counter(object):
+    """A thread-safe, monotonically increasing counter
+
+    Instances can be passed anywhere the library asks for a counter
+    provider.
+
+    Keyword Args:
+        start (uint) : The first value returned. Defaults to 0.
+    """
+
+    def __init__(self, start=0):
+        self._next = start
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            value = self._next
+            self._next += 1
+        return value
+
+    @property
+    def value(self):
+        """The last value handed out"""
+        return self._next - 1
+
+class WsgiApp(object):
+    """A WSGI application that answers SQRL requests
+
+    Point your SQRL path at an instance of this class. For each POST it
+    parses the body with :py:func:`sqrlserver.form.parse`, runs a
+    :py:class:`.Request` until it is ``COMPLETE``, and returns the
+    finalized :py:class:`.Response`.
+
+    The application keeps no per-request state, so it is safe under
+    multi-threaded servers as long as ``resolver`` and ``counter`` are.
+
+    Args:
+        key (bytes) : The 32-byte key used to encrypt nuts.
+        resolver (callable) : Called as ``resolver(request)`` each time
+            the request is in the ``ACTION`` state. It must return the
+            dictionary to pass to :py:meth:`.Request.handle` (see the
+            usage docs for what each action expects).
+        counter (callable) : Called with no arguments to get the counter
+            to encode into each new nut. A :py:class:`.Counter` will do.
+
+    Keyword Args:
+        ipaddr (callable) : Called as ``ipaddr(environ)`` to get the
+            client's address. Defaults to ``REMOTE_ADDR``. Override it if
+            you sit behind a proxy.
+        limits (dict) : Field limits for :py:class:`.FormParser`.
+        idempotency (IdempotencyCache) : If given, exact duplicates of a
+            recent request get the response already sent for it (see
+            :py:class:`.IdempotencyCache`).
+
+    Any other keyword arguments (``ttl``, ``maxcounter``, ``mincounter``,
+    etc.) are passed to every :py:class:`.Request`.
+    """
+
+    _headers = [('Content-Type', 'text/plain; charset=utf-8'), ('Cache-Control', 'no-store')]
+
+    def __init__(self, key, resolver, counter, ipaddr=None, limits=None, idempotency=None, **kwargs):
+        assert len(key) == 32
+        self.key = key
+        self.resolver = resolver
+        self.counter = counter
+        self.ipaddr = ipaddr
+        self.limits = limits
+        self.idempotency = idempotency
+        self.options = kwargs
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD', 'GET') != 'POST':
+            start_response('405 Method Not Allowed', [('Allow', 'POST'), ('Content-Length', '0')])
+            return [b'']
+
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        try:
+            params = parse(environ['wsgi.input'], length=length, limits=self.limits)
+        except FormError:
+            return self._respond(start_response, '400 Bad Request', Response.failure())
+
+        #the nut (and anything else the server put in the URL) arrives in the query string
+        for name, value in urllib.parse.parse_qsl(environ.get('QUERY_STRING', '')):
+            if name not in params:
+                params[name] = value
+
+        if self.ipaddr is not None:
+            ipaddr = self.ipaddr(environ)
+        else:
+            ipaddr = environ.get('REMOTE_ADDR', '0.0.0.0')
+        secure = environ.get('wsgi.url_scheme') == 'https'
+        req = Request(self.key, params, ipaddr=ipaddr, secure=secure, **self.options)
+        if self.idempotency is not None:
+            response = self.idempotency.get(self.idempotency.key(params, ipaddr), lambda: self.process(req), request=req)
+        else:
+            response = self.process(req)
+        return self._respond(start_response, '200 OK', response)
+
+    def process(self, req):
+        """Runs a request to completion and finalizes it
+
+        Args:
+            req (Request) : A new request.
+
+        Returns:
+            Response
+        """
+
+        req.handle()
+        while req.state == 'ACTION':
+            req.handle(self.resolver(req))
+        return req.finalize(failsafe=True, counter=self.counter())
+
+    def _respond(self, start_response, status, response):
+        #encoded exactly once; the string is pure ASCII
+        body = response.toString().encode('ascii')
+        start_response(status, self._headers + [('Content-Length', str(len(body)))])
+        return [body]
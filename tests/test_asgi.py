@@ -0,0 +1,140 @@
+import sqrlserver
+from sqrlserver.utils import pad, depad
+from sqrlserver.asgi import AsgiApp
+from sqrlserver.wsgi import Counter
+from sqrlserver.timing import HistogramSink
+from base64 import urlsafe_b64encode
+import asyncio
+import threading
+import urllib.parse
+import nacl.signing
+import nacl.utils
+
+key = nacl.utils.random(32)
+sk = nacl.signing.SigningKey.generate()
+
+def b64u(s):
+    return depad(urlsafe_b64encode(s.encode('utf-8')).decode('utf-8'))
+
+def body(server, cmd='query', extra=''):
+    idk = depad(urlsafe_b64encode(bytes(sk.verify_key)).decode('utf-8'))
+    client = b64u('ver=1\r\ncmd={}\r\nidk={}\r\n{}'.format(cmd, idk, extra))
+    ids = depad(urlsafe_b64encode(sk.sign((client + server).encode('utf-8')).signature).decode('utf-8'))
+    return urllib.parse.urlencode({'client': client, 'server': server, 'ids': ids}).encode('utf-8')
+
+async def call(app, data, qs='', method='POST', chunk=16):
+    scope = {
+        'type': 'http',
+        'method': method,
+        'scheme': 'https',
+        'query_string': qs.encode('ascii'),
+        'headers': [(b'content-length', str(len(data)).encode('ascii'))],
+        'client': ('1.2.3.4', 5000),
+    }
+    chunks = [data[i:i + chunk] for i in range(0, len(data), chunk)] or [b'']
+    async def receive():
+        part = chunks.pop(0)
+        return {'type': 'http.request', 'body': part, 'more_body': len(chunks) > 0}
+    out = {'body': b''}
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            out['status'] = message['status']
+            out['headers'] = dict(message['headers'])
+        else:
+            out['body'] += message['body']
+    await app(scope, receive, send)
+    return out
+
+async def resolver(req):
+    await asyncio.sleep(0)
+    args = {}
+    for action in req.action:
+        if action[0] == 'find':
+            args['found'] = [True]
+    return args
+
+def server_of(out):
+    return sqrlserver.Request._extract_server(pad(out['body'].decode('ascii')))
+
+def first():
+    nut = sqrlserver.Nut(key).generate('1.2.3.4', 99)
+    url = sqrlserver.Url('example.com').generate('/sqrl', nut=nut)
+    return b64u(url), 'nut=' + nut.toString('qr')
+
+def test_query():
+    app = AsgiApp(key, resolver, Counter(100), workers=2)
+    server, qs = first()
+    out = asyncio.run(call(app, body(server), qs=qs))
+    assert out['status'] == 200
+    assert int(out['headers'][b'content-length']) == len(out['body'])
+    result = server_of(out)
+    assert result['tif'] == '5'
+    assert sqrlserver.Nut(key).load(result['nut']).counter == 100
+
+    #informational actions (btn) don't trip up the action loop
+    out = asyncio.run(call(app, body(server, extra='btn=1\r\n'), qs=qs))
+    assert server_of(out)['tif'] == '5'
+
+def test_errors():
+    app = AsgiApp(key, resolver, Counter())
+    server, qs = first()
+
+    out = asyncio.run(call(app, body(server).replace(b'ids=', b'ids=A'), qs=qs))
+    assert int(server_of(out)['tif'], 16) & 0x80
+
+    out = asyncio.run(call(app, body(server) + b'&evil=1', qs=qs))
+    assert out['status'] == 400
+
+    out = asyncio.run(call(app, b'', method='GET'))
+    assert out['status'] == 405
+
+def test_timing():
+    #the inline parse is timed like any other stage, malformed or not
+    sink = HistogramSink()
+    app = AsgiApp(key, resolver, Counter(), timing=sink)
+    server, qs = first()
+    asyncio.run(call(app, body(server), qs=qs))
+    unsigned = b'&'.join(p for p in body(server).split(b'&') if not p.startswith(b'ids='))
+    out = asyncio.run(call(app, unsigned, qs=qs))
+    assert int(server_of(out)['tif'], 16) == 0xC0
+    stats = sink.snapshot()
+    assert stats['parse']['count'] == 2
+    assert stats['signature']['count'] == 1
+
+def test_backpressure(monkeypatch):
+    #with no room in the executor, everything gets a prebuilt transient error
+    app = AsgiApp(key, resolver, Counter(), maxpending=0)
+    server, qs = first()
+    out = asyncio.run(call(app, body(server), qs=qs))
+    result = server_of(out)
+    assert int(result['tif'], 16) == 0x20 | 0x40
+    assert 'nut' not in result
+    assert app.rejected == 1
+
+    #concurrency up to the limit, and never any cryptography on the loop
+    loop = []
+    finalize = sqrlserver.Request.finalize
+    def watched(self, **kwargs):
+        loop.append(threading.current_thread() is threading.main_thread())
+        return finalize(self, **kwargs)
+    monkeypatch.setattr(sqrlserver.Request, 'finalize', watched)
+    app = AsgiApp(key, resolver, Counter(), maxpending=4)
+    async def many():
+        return await asyncio.gather(*[call(app, body(server), qs=qs) for i in range(20)])
+    outs = asyncio.run(many())
+    tifs = [server_of(out)['tif'] for out in outs]
+    assert len([t for t in tifs if t == '5']) + app.rejected == 20
+    assert len([t for t in tifs if t == '60']) == app.rejected
+    assert not any(loop)
+    assert app.pending == 0
+
+def test_lifespan():
+    app = AsgiApp(key, resolver, Counter())
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+    async def receive():
+        return messages.pop(0)
+    async def send(message):
+        sent.append(message['type'])
+    asyncio.run(app({'type': 'lifespan'}, receive, send))
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
@@ -0,0 +1,36 @@
+from sqrlserver.bench import BENCHMARKS, run, environment
+from sqrlserver.__main__ import main
+import pytest
+
+@pytest.mark.parametrize('name', list(BENCHMARKS))
+def test_run(name):
+    result = run(name, 10, threads=2)
+    assert result['ops'] == 10
+    assert result['rate'] > 0
+
+def test_bad():
+    with pytest.raises(ValueError):
+        run('nope', 10)
+    with pytest.raises(ValueError):
+        run('nut.generate', 10, threads=0)
+
+def test_environment():
+    env = dict(environment())
+    for name in ['python', 'cpus', 'pynacl', 'libsodium']:
+        assert env[name]
+
+def test_main(tmp_path, capsys):
+    assert main(['--list']) == 0
+    assert 'request.query' in capsys.readouterr().out
+    out = str(tmp_path / 'stacks')
+    assert main(['url.generate', '-n', '2000', '--profile', 'sample', '-o', out]) == 0
+    assert 'url.generate' in capsys.readouterr().out
+    with open(out) as f:
+        for line in f:
+            stack, count = line.rsplit(' ', 1)
+            assert int(count) > 0
+    with pytest.raises(SystemExit):
+        main(['nope'])
+    #cProfile would miss the worker threads
+    with pytest.raises(SystemExit):
+        main(['url.generate', '-t', '2', '--profile', 'cprofile'])
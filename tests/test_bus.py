@@ -0,0 +1,136 @@
+import sqrlserver
+from sqrlserver.utils import pad, depad
+from sqrlserver.bus import BusServer, BusClient
+from sqrlserver.wsgi import WsgiApp
+from base64 import urlsafe_b64encode
+import asyncio
+import io
+import socket
+import urllib.parse
+import nacl.signing
+import nacl.utils
+
+key = nacl.utils.random(32)
+sk = nacl.signing.SigningKey.generate()
+idk = depad(urlsafe_b64encode(bytes(sk.verify_key)).decode('utf-8'))
+
+def body(server, cmd):
+    client = depad(urlsafe_b64encode('ver=1\r\ncmd={}\r\nidk={}\r\n'.format(cmd, idk).encode('utf-8')).decode('utf-8'))
+    ids = depad(urlsafe_b64encode(sk.sign((client + server).encode('utf-8')).signature).decode('utf-8'))
+    return urllib.parse.urlencode({'client': client, 'server': server, 'ids': ids}).encode('utf-8')
+
+def call(app, data, qs):
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'QUERY_STRING': qs,
+        'CONTENT_LENGTH': str(len(data)),
+        'REMOTE_ADDR': '1.2.3.4',
+        'wsgi.input': io.BytesIO(data),
+    }
+    return b''.join(app(environ, lambda s, h: None)).decode('ascii')
+
+def resolver(req):
+    args = {}
+    for action in req.action:
+        if action[0] == 'find':
+            args['found'] = [True]
+        elif action[0] == 'auth':
+            args['authenticated'] = True
+    return args
+
+def test_workers(tmp_path):
+    path = str(tmp_path / 'bus.sock')
+    server = BusServer(path).start()
+    phone = BusClient(path)
+    browser = BusClient(path)
+    try:
+        #the browser's worker shows the QR code
+        counter = browser.counter()
+        nut = sqrlserver.Nut(key).generate('1.2.3.4', counter)
+        browser.register(counter)
+        assert browser.wait(counter, timeout=0.05) is None
+
+        #the phone's requests land on another worker
+        app = WsgiApp(key, resolver, phone.counter, pending=phone)
+        url = sqrlserver.Url('example.com').generate('/sqrl', nut=nut)
+        out = call(app, body(depad(urlsafe_b64encode(url.encode('utf-8')).decode('utf-8')), 'query'), 'nut=' + nut.toString('qr'))
+        newnut = sqrlserver.Request._extract_server(pad(out))['nut']
+        call(app, body(out, 'ident'), 'nut=' + newnut)
+
+        assert browser.wait(counter, timeout=5) == idk
+        assert server.published == 1
+
+        #late subscribers hear about it too, including over asyncio
+        late = BusClient(path)
+        late.register(counter)
+        assert asyncio.run(late.wait_async(counter, timeout=5)) == idk
+        late.close()
+
+        #a bare signal arrives as True
+        browser.register(7)
+        phone.signal(7)
+        assert browser.wait(7, timeout=5) is True
+    finally:
+        phone.close()
+        browser.close()
+        server.close()
+
+def test_binary(tmp_path):
+    path = str(tmp_path / 'bus.sock')
+    server = BusServer(path).start()
+    phone = BusClient(path)
+    browser = BusClient(path)
+    try:
+        counter = browser.counter()
+        nut = sqrlserver.Nut(key).generate('1.2.3.4', counter)
+        browser.register(counter)
+
+        #raw-byte keys are published as the b64u the client sent
+        app = WsgiApp(key, resolver, phone.counter, pending=phone, binary=True)
+        url = sqrlserver.Url('example.com').generate('/sqrl', nut=nut)
+        out = call(app, body(depad(urlsafe_b64encode(url.encode('utf-8')).decode('utf-8')), 'query'), 'nut=' + nut.toString('qr'))
+        newnut = sqrlserver.Request._extract_server(pad(out))['nut']
+        call(app, body(out, 'ident'), 'nut=' + newnut)
+        assert browser.wait(counter, timeout=5) == idk
+    finally:
+        phone.close()
+        browser.close()
+        server.close()
+
+def test_counters(tmp_path):
+    path = str(tmp_path / 'bus.sock')
+    server = BusServer(path, first=2**32 - 6).start()
+    one = BusClient(path, block=4)
+    two = BusClient(path, block=4)
+    try:
+        #workers never hand out the same counter, even across blocks
+        seen = [one.counter() for i in range(6)] + [two.counter() for i in range(6)] + [one.counter() for i in range(3)]
+        assert len(set(seen)) == len(seen)
+        #and they stay within the nut's 32 bits
+        assert max(seen) < 2**32
+        assert 0 in seen
+    finally:
+        one.close()
+        two.close()
+        server.close()
+
+def test_garbage(tmp_path):
+    path = str(tmp_path / 'bus.sock')
+    server = BusServer(path).start()
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        sock.sendall(b'\xff' + bytes(10))
+        #the broker hangs up on unknown frames
+        sock.settimeout(5)
+        assert sock.recv(10) == b''
+        sock.close()
+
+        #and keeps serving everyone else
+        client = BusClient(path)
+        client.register(1)
+        client.signal(1, 'x')
+        assert client.wait(1, timeout=5) == 'x'
+        client.close()
+    finally:
+        server.close()
@@ -0,0 +1,62 @@
+import sqrlserver
+from sqrlserver.client import Client, RequestTransport, WsgiTransport, AsgiTransport
+from sqrlserver.identity import SqliteIdentityStore
+from sqrlserver.wsgi import WsgiApp, Counter
+from sqrlserver.asgi import AsgiApp
+import asyncio
+import nacl.utils
+
+key = nacl.utils.random(32)
+
+def url():
+    nut = sqrlserver.Nut(key).generate('127.0.0.1', 1)
+    return sqrlserver.Url('example.com').generate('/sqrl', nut=nut)
+
+def lifecycle(client, send):
+    tifs = []
+    for cmd, kwargs in [('query', {}), ('ident', {'keys': True}), ('query', {}), ('disable', {}), ('enable', {'unlock': True}), ('remove', {'unlock': True}), ('query', {})]:
+        send(cmd, **kwargs)
+        tifs.append(client.tif)
+    return tifs
+
+def test_lifecycle(tmp_path):
+    store = SqliteIdentityStore(str(tmp_path / 'ids.db'))
+    expected = [0x04, 0x05, 0x05, 0x0D, 0x05, 0x04, 0x04]
+    for transport in [WsgiTransport(WsgiApp(key, store, Counter())), RequestTransport(key, store, Counter())]:
+        client = Client(url())
+        assert lifecycle(client, lambda cmd, **kw: client.send(transport, cmd, **kw)) == expected
+        assert client.qs == 'nut=' + client.last['nut']
+
+    #rekeying signs with the previous identity too
+    client = Client(url(), seed=1)
+    transport = RequestTransport(key, store, Counter())
+    client.send(transport, 'ident', keys=True)
+    old = client.idk
+    client.rekey()
+    assert client.send(transport, 'query')['tif'] == '6'
+    assert client.send(transport, 'ident', keys=True)['tif'] == '5'
+    assert store.lookup(old) is None
+    assert store.lookup(client.idk) is not None
+
+    #seeds make the same keys
+    assert Client(url(), seed=1).idk == Client(url(), seed=1).idk != Client(url(), seed=2).idk
+
+def test_asgi(tmp_path):
+    store = SqliteIdentityStore(str(tmp_path / 'ids.db'))
+    transport = AsgiTransport(AsgiApp(key, store, Counter()))
+    async def main():
+        client = Client(url())
+        tifs = []
+        for cmd, kwargs in [('query', {}), ('ident', {'keys': True}), ('remove', {'unlock': True})]:
+            await client.send_async(transport, cmd, **kwargs)
+            tifs.append(client.tif)
+        return tifs
+    assert asyncio.run(main()) == [0x04, 0x05, 0x04]
+
+def test_failure():
+    client = Client(url())
+    transport = RequestTransport(nacl.utils.random(32), lambda req: {}, Counter())
+    qs = client.qs
+    client.send(transport, 'query')
+    assert client.tif & 0x40
+    assert client.qs == qs
@@ -0,0 +1,39 @@
+from sqrlserver.corpus import record, Corpus, answer, IPADDR, KINDS
+from sqrlserver.request import Request
+from sqrlserver.wsgi import WsgiApp, Counter
+import nacl.utils
+import pytest
+
+def test_replay(tmp_path):
+    path = str(tmp_path / 'corpus.bin')
+    key = nacl.utils.random(32)
+    record(path, 300, key=key, invalid=0.3, seed=1)
+    corpus = Corpus(path)
+    assert len(corpus) == 300
+    assert corpus.key == key
+
+    vuk = [None]
+    app = WsgiApp(key, lambda req: answer(req, vuk[0]), Counter())
+    seen = set()
+    for i in range(len(corpus)):
+        params, tif, kind, vuk[0] = corpus[i]
+        seen.add(kind)
+        assert app.process(Request(key, params, ipaddr=IPADDR))._tif == tif, kind
+    assert seen == set(KINDS)
+    with pytest.raises(IndexError):
+        corpus[300]
+    corpus.close()
+
+    #same seed, same records
+    again = str(tmp_path / 'again.bin')
+    record(again, 300, key=key, invalid=0.3, seed=1)
+    corpus, other = Corpus(path), Corpus(again)
+    assert [corpus[i][1:] for i in range(300)] == [other[i][1:] for i in range(300)]
+    corpus.close()
+    other.close()
+
+def test_bad_file(tmp_path):
+    path = tmp_path / 'junk.bin'
+    path.write_bytes(bytes(128))
+    with pytest.raises(ValueError):
+        Corpus(str(path))
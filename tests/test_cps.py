@@ -0,0 +1,106 @@
+import sqrlserver
+from sqrlserver.utils import pad, depad
+from sqrlserver.cps import CpsIssuer, MemoryCpsStore, SqliteCpsStore
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+import sqlite3
+import threading
+import urllib.parse
+import nacl.signing
+import nacl.utils
+
+key = nacl.utils.random(32)
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000000
+    def __call__(self):
+        return self.now
+
+def check(store):
+    clock = Clock()
+    issuer = CpsIssuer(key, store, 'https://example.com/login?next=/', ttl=60, clock=clock)
+    token = issuer.issue('IDK')
+    assert len(token) == 43
+    assert issuer.redeem(token) == 'IDK'
+    #single use
+    assert issuer.redeem(token) is None
+
+    #forged or garbled
+    token = issuer.issue('IDK')
+    raw = bytearray(urlsafe_b64decode(pad(token)))
+    raw[-1] ^= 1
+    assert issuer.redeem(depad(urlsafe_b64encode(bytes(raw)).decode('ascii'))) is None
+    assert issuer.redeem('nonsense') is None
+    assert issuer.redeem(token[:-2]) is None
+
+    #expired
+    token = issuer.issue('IDK')
+    clock.now += 61
+    assert issuer.redeem(token) is None
+
+    url = urllib.parse.urlparse(issuer.issueUrl('IDK'))
+    query = urllib.parse.parse_qs(url.query)
+    assert query['next'] == ['/']
+    assert issuer.redeem(query['cps'][0]) == 'IDK'
+
+def test_memory():
+    check(MemoryCpsStore())
+    store = MemoryCpsStore(maxsize=2)
+    for i in range(5):
+        store.put(bytes([i]), 'IDK', 2**31, 0)
+    assert len(store) == 2
+
+def test_sqlite(tmp_path):
+    path = str(tmp_path / 'cps.db')
+    check(SqliteCpsStore(path))
+
+    #only one of several concurrent redemptions succeeds
+    issuer = CpsIssuer(key, SqliteCpsStore(path), 'https://example.com/')
+    token = issuer.issue('IDK')
+    results = []
+    def worker():
+        other = CpsIssuer(key, SqliteCpsStore(path), 'https://example.com/')
+        results.append(other.redeem(token))
+    threads = [threading.Thread(target=worker) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results, key=str) == ['IDK', None, None, None]
+
+    #purges go by the issuer's clock, not the system's
+    clock = Clock()
+    clock.now = 3000000000
+    issuer = CpsIssuer(key, SqliteCpsStore(str(tmp_path / 'purge.db'), purge=2), 'https://example.com/', ttl=60, clock=clock)
+    issuer.issue('OLD')
+    clock.now += 61
+    issuer.issue('NEW')
+    db = sqlite3.connect(str(tmp_path / 'purge.db'))
+    assert db.execute('SELECT idk FROM sqrl_cps').fetchall() == [('NEW',)]
+    db.close()
+
+def test_request():
+    issuer = CpsIssuer(key, MemoryCpsStore(), 'https://example.com/cps')
+    sk = nacl.signing.SigningKey.generate()
+    idk = depad(urlsafe_b64encode(bytes(sk.verify_key)).decode('utf-8'))
+    nut = sqrlserver.Nut(key).generate('1.2.3.4', 1)
+    url = sqrlserver.Url('example.com').generate('/sqrl', nut=nut)
+    client = depad(urlsafe_b64encode('ver=1\r\ncmd=ident\r\nidk={}\r\nopt=cps\r\n'.format(idk).encode('utf-8')).decode('utf-8'))
+    server = depad(urlsafe_b64encode(url.encode('utf-8')).decode('utf-8'))
+    ids = depad(urlsafe_b64encode(sk.sign((client + server).encode('utf-8')).signature).decode('utf-8'))
+    params = {'nut': nut.toString('qr'), 'client': client, 'server': server, 'ids': ids}
+
+    req = sqrlserver.Request(key, params, ipaddr='1.2.3.4', cps=issuer)
+    req.handle()
+    assert req.action[0][-1] == 'cps'
+    req.handle({'authenticated': True})
+    assert req.state == 'COMPLETE'
+    result = sqrlserver.Request._extract_server(pad(req.finalize(counter=2).toString()))
+    token = urllib.parse.parse_qs(urllib.parse.urlparse(result['url']).query)['cps'][0]
+    assert issuer.redeem(token) == idk
+
+    #a url from the resolver wins
+    req = sqrlserver.Request(key, params, ipaddr='1.2.3.4', cps=issuer)
+    req.handle()
+    req.handle({'authenticated': True, 'url': 'https://example.com/mine'})
+    assert req.finalize(counter=3).params['url'] == 'https://example.com/mine'
@@ -0,0 +1,83 @@
+from sqrlserver.form import FormParser, FormError, parse, parse_async
+import asyncio
+import io
+import pytest
+
+body = b'client=dmVyPTENCmNtZD1xdWVyeQ0K&server=c3FybDovL2V4YW1wbGUuY29t&ids=tCTr1DoEYANtxGE_kRNHgSsHa87aRG9C0vNqy7h6CaV8tH5TnBJmdW0gbDsja1JsRbSNA4ZeFVUIfOnzdEz8DA'
+target = {
+    'client': 'dmVyPTENCmNtZD1xdWVyeQ0K',
+    'server': 'c3FybDovL2V4YW1wbGUuY29t',
+    'ids': 'tCTr1DoEYANtxGE_kRNHgSsHa87aRG9C0vNqy7h6CaV8tH5TnBJmdW0gbDsja1JsRbSNA4ZeFVUIfOnzdEz8DA',
+}
+
+def test_whole():
+    assert parse(io.BytesIO(body)) == target
+    assert parse(io.BytesIO(body), length=len(body)) == target
+
+def test_chunked():
+    #every possible split point, including inside names and separators
+    for chunksize in range(1, 8):
+        assert parse(io.BytesIO(body), chunksize=chunksize) == target
+
+def test_decoding():
+    p = FormParser()
+    p.feed(b'client=a%3Db+c&server=&ids')
+    assert p.close() == {'client': 'a=b c', 'server': '', 'ids': ''}
+
+    #stray separators are ignored
+    p = FormParser()
+    p.feed(b'&&client=abc&&')
+    assert p.close() == {'client': 'abc'}
+
+def test_rejections():
+    #unknown field
+    with pytest.raises(FormError):
+        parse(io.BytesIO(b'client=abc&evil=1'))
+    #unknown field is caught before its value arrives
+    p = FormParser()
+    with pytest.raises(FormError):
+        p.feed(b'averyveryverylongname')
+    #repeated field
+    with pytest.raises(FormError):
+        parse(io.BytesIO(b'ids=abc&ids=def'))
+    #oversized field is caught mid-stream
+    p = FormParser()
+    p.feed(b'ids=' + (b'a' * 80))
+    with pytest.raises(FormError):
+        p.feed(b'a' * 10)
+    #oversized body is rejected before reading
+    class Unreadable(object):
+        def read(self, size):
+            raise AssertionError("should not have been read")
+    with pytest.raises(FormError):
+        parse(Unreadable(), length=1000000)
+    #invalid utf-8
+    with pytest.raises(FormError):
+        parse(io.BytesIO(b'client=%ff'))
+    #FormError is a ValueError
+    with pytest.raises(ValueError):
+        parse(io.BytesIO(b'evil=1'))
+
+def test_limits():
+    p = FormParser(limits={'a': 3})
+    p.feed(b'a=123')
+    assert p.close() == {'a': '123'}
+    with pytest.raises(FormError):
+        parse(io.BytesIO(b'a=1234'), limits={'a': 3})
+
+def test_async():
+    class Reader(object):
+        def __init__(self, data):
+            self.data = io.BytesIO(data)
+        async def read(self, size):
+            return self.data.read(size)
+
+    async def chunks():
+        for i in range(0, len(body), 10):
+            yield body[i:i + 10]
+
+    assert asyncio.run(parse_async(Reader(body), chunksize=7)) == target
+    assert asyncio.run(parse_async(Reader(body), length=len(body))) == target
+    assert asyncio.run(parse_async(chunks())) == target
+    with pytest.raises(FormError):
+        asyncio.run(parse_async(Reader(b'evil=1')))
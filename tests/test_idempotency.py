@@ -0,0 +1,195 @@
+import sqrlserver
+from sqrlserver.utils import pad, depad
+from sqrlserver.idempotency import IdempotencyCache
+from sqrlserver.wsgi import WsgiApp, Counter
+from sqrlserver.asgi import AsgiApp
+from base64 import urlsafe_b64encode
+import asyncio
+import io
+import threading
+import urllib.parse
+import nacl.signing
+import nacl.utils
+import pytest
+
+key = nacl.utils.random(32)
+sk = nacl.signing.SigningKey.generate()
+
+class Clock(object):
+    now = 0.0
+    def __call__(self):
+        return self.now
+
+def b64u(s):
+    return depad(urlsafe_b64encode(s.encode('utf-8')).decode('utf-8'))
+
+def request(cmd='ident'):
+    nut = sqrlserver.Nut(key).generate('1.2.3.4', 7)
+    server = b64u(sqrlserver.Url('example.com').generate('/sqrl', nut=nut))
+    idk = depad(urlsafe_b64encode(bytes(sk.verify_key)).decode('utf-8'))
+    client = b64u('ver=1\r\ncmd={}\r\nidk={}\r\n'.format(cmd, idk))
+    ids = depad(urlsafe_b64encode(sk.sign((client + server).encode('utf-8')).signature).decode('utf-8'))
+    data = urllib.parse.urlencode({'client': client, 'server': server, 'ids': ids}).encode('utf-8')
+    return data, 'nut=' + nut.toString('qr')
+
+class Resolver(object):
+    """Lets the first ident through and refuses the rest"""
+
+    def __init__(self):
+        self.calls = 0
+    def __call__(self, req):
+        self.calls += 1
+        args = {}
+        for action in req.action:
+            if action[0] == 'auth':
+                args['authenticated'] = self.calls == 1
+        return args
+
+def call(app, data, qs):
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'QUERY_STRING': qs,
+        'CONTENT_LENGTH': str(len(data)),
+        'REMOTE_ADDR': '1.2.3.4',
+        'wsgi.input': io.BytesIO(data),
+    }
+    return b''.join(app(environ, lambda s, h: None)).decode('ascii')
+
+def test_cache():
+    clock = Clock()
+    cache = IdempotencyCache(maxsize=2, ttl=10, clock=clock)
+    params = {'nut': 'n', 'client': 'c', 'server': 's', 'ids': 'i'}
+    k = cache.key(params, '1.2.3.4')
+    assert k != cache.key(params, '1.2.3.5')
+    assert k != cache.key(dict(params, client='cs', server=''), '1.2.3.4')
+
+    calls = []
+    def compute():
+        calls.append(1)
+        return sqrlserver.Response().tifOn(0x01)
+    first = cache.get(k, compute)
+    second = cache.get(k, compute)
+    assert len(calls) == 1
+    assert second.toString() == first.toString()
+    #copies, so callers can't spoil the cached one
+    second.addParam('nut', 'x')
+    assert 'nut' not in cache.get(k, compute).params
+
+    clock.now = 11
+    cache.get(k, compute)
+    assert len(calls) == 2
+    assert cache.stats() == {'hits': 2, 'coalesced': 0, 'misses': 2, 'size': 1, 'hitrate': 0.5}
+
+    #transient errors are retried for real
+    k2 = cache.key(params, '::1')
+    busy = lambda: sqrlserver.Response().tifOn(0x20, 0x40)
+    cache.get(k2, busy)
+    assert len(cache) == 1
+
+    #so are failures
+    def broken():
+        raise RuntimeError()
+    with pytest.raises(RuntimeError):
+        cache.get(k2, broken)
+    assert len(cache.get(k2, compute).params) == 0
+
+    for ip in ['a', 'b', 'c']:
+        cache.get(cache.key(params, ip), compute)
+    assert len(cache) == 2
+
+    with pytest.raises(ValueError):
+        IdempotencyCache(maxsize=0)
+
+def test_stale():
+    class Req(object):
+        nut = None
+    req = Req()
+    req.nut = sqrlserver.Nut(key).generate('1.2.3.4', 7, timestamp=1000)
+    clock = Clock()
+    cache = IdempotencyCache(ttl=10, clock=clock)
+    calls = []
+    def compute():
+        calls.append(1)
+        return sqrlserver.Response().tifOn(0x01)
+
+    #kept until the nut goes stale, not for ttl after caching
+    clock.now = 1005
+    cache.get(b'k', compute, request=req)
+    clock.now = 1009
+    cache.get(b'k', compute, request=req)
+    assert len(calls) == 1
+    clock.now = 1010
+    cache.get(b'k', compute, request=req)
+    assert len(calls) == 2
+    #answers for nuts already stale aren't kept at all
+    assert len(cache) == 0
+
+    #no nut, so ttl from now
+    cache.get(b'k', compute, request=Req())
+    clock.now = 1019
+    cache.get(b'k', compute, request=Req())
+    assert len(calls) == 3
+
+def test_coalesce():
+    cache = IdempotencyCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return sqrlserver.Response().tifOn(0x01, 0x04)
+    results = []
+    def worker():
+        results.append(cache.get(b'k', compute).tif)
+    threads = [threading.Thread(target=worker) for i in range(4)]
+    threads[0].start()
+    started.wait()
+    for t in threads[1:]:
+        t.start()
+    while cache.coalesced < 3:
+        pass
+    release.set()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert results == ['5'] * 4
+    assert cache.stats()['hitrate'] == 0.75
+
+def test_wsgi():
+    resolver = Resolver()
+    cache = IdempotencyCache()
+    app = WsgiApp(key, resolver, Counter(), idempotency=cache)
+    data, qs = request()
+    first = call(app, data, qs)
+    #the retry gets the same answer, not a failed second ident
+    assert call(app, data, qs) == first
+    assert resolver.calls == 1
+    assert sqrlserver.Request._extract_server(pad(first))['tif'] == '5'
+
+    #without the cache the retry is processed, and refused
+    app = WsgiApp(key, Resolver(), Counter())
+    assert call(app, data, qs) != call(app, data, qs)
+
+def test_asgi():
+    resolver = Resolver()
+    cache = IdempotencyCache()
+    app = AsgiApp(key, resolver, Counter(), idempotency=cache)
+    data, qs = request()
+    async def send(data):
+        scope = {'type': 'http', 'method': 'POST', 'query_string': qs.encode('ascii'), 'headers': [], 'client': ('1.2.3.4', 1)}
+        messages = [{'type': 'http.request', 'body': data, 'more_body': False}]
+        async def receive():
+            return messages.pop(0)
+        out = []
+        async def send(message):
+            out.append(message.get('body', b''))
+        await app(scope, receive, send)
+        return b''.join(out)
+    async def main():
+        return await asyncio.gather(*[send(data) for i in range(5)])
+    outs = asyncio.run(main())
+    assert len(set(outs)) == 1
+    assert resolver.calls == 1
+    assert cache.hits + cache.coalesced == 4
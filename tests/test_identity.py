@@ -0,0 +1,143 @@
+import sqrlserver
+from sqrlserver.utils import pad, depad
+from sqrlserver.identity import SqliteIdentityStore, resolve
+from sqrlserver.wsgi import WsgiApp, Counter
+from base64 import urlsafe_b64encode
+import io
+import pytest
+import threading
+import urllib.parse
+import nacl.signing
+import nacl.utils
+
+key = nacl.utils.random(32)
+
+def b64u(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return depad(urlsafe_b64encode(data).decode('utf-8'))
+
+class Phone(object):
+    """Just enough of a client to drive the store through a WsgiApp"""
+
+    def __init__(self, app):
+        self.app = app
+        self.sk = nacl.signing.SigningKey.generate()
+        self.unlock = nacl.signing.SigningKey.generate()
+        self.previous = None
+        self.pids = True
+        nut = sqrlserver.Nut(key).generate('1.2.3.4', 1)
+        self.server = b64u(sqrlserver.Url('example.com').generate('/sqrl', nut=nut))
+        self.nut = nut.toString('qr')
+
+    def send(self, cmd, keys=False, unlock=False):
+        lines = ['ver=1', 'cmd=' + cmd, 'idk=' + b64u(bytes(self.sk.verify_key))]
+        if self.previous is not None:
+            lines.append('pidk=' + b64u(bytes(self.previous.verify_key)))
+        if keys:
+            lines.append('suk=' + b64u(bytes(self.unlock.verify_key)))
+            lines.append('vuk=' + b64u(bytes(self.unlock.verify_key)))
+        client = b64u('\r\n'.join(lines) + '\r\n')
+        msg = (client + self.server).encode('utf-8')
+        params = {'client': client, 'server': self.server, 'ids': b64u(self.sk.sign(msg).signature)}
+        if ( (self.previous is not None) and (self.pids) ):
+            params['pids'] = b64u(self.previous.sign(msg).signature)
+        if unlock:
+            params['urs'] = b64u(self.unlock.sign(msg).signature)
+        data = urllib.parse.urlencode(params).encode('utf-8')
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'QUERY_STRING': 'nut=' + self.nut,
+            'CONTENT_LENGTH': str(len(data)),
+            'REMOTE_ADDR': '1.2.3.4',
+            'wsgi.input': io.BytesIO(data),
+        }
+        self.server = b''.join(self.app(environ, lambda s, h: None)).decode('ascii')
+        result = sqrlserver.Request._extract_server(pad(self.server))
+        self.nut = result['nut']
+        return result
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_lifecycle(tmp_path, binary):
+    store = SqliteIdentityStore(str(tmp_path / 'ids.db'))
+    phone = Phone(WsgiApp(key, store, Counter(), binary=binary))
+    idk = b64u(bytes(phone.sk.verify_key))
+
+    #unknown until enrolled
+    assert phone.send('query')['tif'] == '4'
+    assert phone.send('ident')['tif'] == 'c4'
+    assert phone.send('ident', keys=True)['tif'] == '5'
+    assert phone.send('query')['tif'] == '5'
+    assert store.lookup(idk)['suk'] == b64u(bytes(phone.unlock.verify_key))
+
+    #disabled identities can't log in and get their SUK back
+    result = phone.send('disable')
+    assert result['tif'] == 'd'
+    assert phone.send('query')['tif'] == 'd'
+    assert phone.send('ident')['tif'] == '4d'
+
+    #re-enabling needs the unlock signature
+    assert phone.send('enable')['tif'] == 'c4'
+    assert phone.send('enable', unlock=True)['tif'] == '5'
+    assert phone.send('ident')['tif'] == '5'
+
+    #rekeying keeps the account under the new key
+    phone.previous = phone.sk
+    phone.sk = nacl.signing.SigningKey.generate()
+    assert phone.send('query')['tif'] == '6'
+    assert phone.send('ident', keys=True)['tif'] == '5'
+    assert store.lookup(idk) is None
+    phone.previous = None
+    assert phone.send('query')['tif'] == '5'
+
+    assert phone.send('remove', unlock=True)['tif'] == '4'
+    assert phone.send('query')['tif'] == '4'
+
+def test_unsigned_previous(tmp_path):
+    #claiming someone else's identity as the previous one, without its signature
+    store = SqliteIdentityStore(str(tmp_path / 'ids.db'))
+    app = WsgiApp(key, store, Counter())
+    victim = Phone(app)
+    assert victim.send('ident', keys=True)['tif'] == '5'
+    victimidk = b64u(bytes(victim.sk.verify_key))
+
+    attacker = Phone(app)
+    attacker.previous = victim.sk
+    attacker.pids = False
+    assert attacker.send('ident', keys=True)['tif'] == 'c0'
+    assert store.lookup(victimidk) is not None
+    assert store.lookup(b64u(bytes(attacker.sk.verify_key))) is None
+
+    #the resolver refuses too, should it ever see such a request
+    new = b64u(nacl.utils.random(32))
+    class Req(object):
+        params = {'client': {'cmd': 'ident', 'idk': new, 'pidk': victimidk}}
+        action = [('auth', new, new, new)]
+    assert resolve(store, Req())['authenticated']
+    assert store.lookup(victimidk) is not None
+    assert store.lookup(new) is not None
+
+def test_store(tmp_path):
+    path = str(tmp_path / 'ids.db')
+    store = SqliteIdentityStore(path)
+    a, b, s, v = [b64u(nacl.utils.random(32)) for i in range(4)]
+    assert store.create(a, s, v)
+    assert not store.create(a, s, v)
+    assert not store.create('short', s, v)
+    assert store.find(a, b)[:2] == [True, False]
+    assert store.find(b, a)[:2] == [False, True]
+    assert store.find('garbage')[0] is False
+    assert store.setOptions(a, True, False)
+    assert store.lookup(a)['sqrlonly']
+    assert not store.rekey(b, a, s, v)
+
+    #each thread gets its own connection to the same database
+    results = []
+    def worker():
+        results.append(SqliteIdentityStore(path).find(a)[0])
+        results.append(store.find(a)[0])
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join()
+    assert results == [True, True]
+    store.close()
@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+#microseconds for ``import sqrlserver``, cumulative (it was about 100 ms with eager imports)
+BUDGET = 25000
+
+def run(code, *flags):
+    return subprocess.run([sys.executable] + list(flags) + ['-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+def importtime():
+    for line in run('import sqrlserver', '-X', 'importtime').stderr.splitlines():
+        fields = line.split('|')
+        if ( (len(fields) == 3) and (fields[2].strip() == 'sqrlserver') ):
+            return int(fields[1])
+    raise AssertionError("sqrlserver missing from -X importtime output")
+
+def test_budget():
+    #best of three, to ride out a busy machine
+    best = min(importtime() for i in range(3))
+    assert best < BUDGET, "import sqrlserver took {} us".format(best)
+
+def test_lazy():
+    code = "import sys, sqrlserver; sqrlserver.Url('example.com'); print(' '.join(m for m in ['nacl', 'bitstring', 'json'] if m in sys.modules))"
+    assert run(code).stdout.strip() == ''
+
+def test_names():
+    import sqrlserver
+    namespace = {}
+    exec('from sqrlserver import *', namespace)
+    for name in ['Nut', 'NutCache', 'Request', 'Response', 'Url', 'pad', 'depad', 'stripurl', 'addquery', 'delquery']:
+        assert namespace[name] is getattr(sqrlserver, name)
+        assert name in dir(sqrlserver)
+    assert sqrlserver.utils.pad('YQ') == 'YQ=='
+    with pytest.raises(AttributeError):
+        sqrlserver.Missing
@@ -0,0 +1,99 @@
+import sqrlserver
+from sqrlserver.utils import pad, depad
+from sqrlserver.macstore import MemoryMacStore, SqliteMacStore
+from sqrlserver.wsgi import WsgiApp, Counter
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+import io
+import urllib.parse
+import nacl.signing
+import nacl.utils
+
+key = nacl.utils.random(32)
+sk = nacl.signing.SigningKey.generate()
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+def test_memory():
+    clock = Clock()
+    store = MemoryMacStore(maxsize=2, ttl=10, clock=clock)
+    store.put('a', 'A')
+    store.put('b', 'B')
+    assert store.get('a') == 'A'
+    #'b' is now the least recently used
+    store.put('c', 'C')
+    assert store.get('b') is None
+    assert len(store) == 2
+
+    clock.now += 11
+    assert store.get('a') is None
+    assert len(store) == 1
+
+def test_sqlite(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / 'macs.db')
+    store = SqliteMacStore(path, ttl=10, batch=3, delay=5, clock=clock)
+    other = SqliteMacStore(path, clock=clock)
+    store.put('a', 'A')
+    store.put('b', 'B')
+    #buffered: visible here, not yet elsewhere
+    assert store.get('a') == 'A'
+    assert other.get('a') is None
+    assert store.commits == 0
+
+    store.put('c', 'C')
+    assert store.commits == 1
+    assert other.get('a') == 'A'
+
+    #old writes are committed on the next call
+    store.put('d', 'D')
+    clock.now += 6
+    assert store.get('zzz') is None
+    assert other.get('d') == 'D'
+
+    #expired rows are ignored, and deleted with the next batch
+    clock.now += 5
+    assert other.get('a') is None
+    store.put('e', 'E')
+    store.close()
+    assert other._db.execute('SELECT COUNT(*) FROM sqrl_macs').fetchone()[0] == 1
+    other.close()
+
+def sign(server, cmd='query'):
+    idk = depad(urlsafe_b64encode(bytes(sk.verify_key)).decode('utf-8'))
+    client = depad(urlsafe_b64encode('ver=1\r\ncmd={}\r\nidk={}\r\n'.format(cmd, idk).encode('utf-8')).decode('utf-8'))
+    ids = depad(urlsafe_b64encode(sk.sign((client + server).encode('utf-8')).signature).decode('utf-8'))
+    return urllib.parse.urlencode({'client': client, 'server': server, 'ids': ids}).encode('utf-8')
+
+def call(app, data, nut):
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'QUERY_STRING': 'nut=' + nut,
+        'CONTENT_LENGTH': str(len(data)),
+        'REMOTE_ADDR': '1.2.3.4',
+        'wsgi.input': io.BytesIO(data),
+    }
+    return b''.join(app(environ, lambda s, h: None)).decode('ascii')
+
+def test_request():
+    def resolver(req):
+        return {'found': [True], 'authenticated': True}
+    app = WsgiApp(key, resolver, Counter(), macstore=MemoryMacStore())
+    nut = sqrlserver.Nut(key).generate('1.2.3.4', 1)
+    url = sqrlserver.Url('example.com').generate('/sqrl', nut=nut)
+    out = call(app, sign(depad(urlsafe_b64encode(url.encode('utf-8')).decode('utf-8'))), nut.toString('qr'))
+    server = sqrlserver.Request._extract_server(pad(out))
+    assert server['tif'] == '5'
+
+    #returning the server's response untouched passes the MAC check
+    result = sqrlserver.Request._extract_server(pad(call(app, sign(out, 'ident'), server['nut'])))
+    assert result['tif'] == '5'
+
+    #a tampered response doesn't
+    forged = urlsafe_b64decode(pad(out)).decode('utf-8').replace('tif=5', 'tif=1')
+    forged = depad(urlsafe_b64encode(forged.encode('utf-8')).decode('utf-8'))
+    result = sqrlserver.Request._extract_server(pad(call(app, sign(forged, 'ident'), server['nut'])))
+    assert result['tif'] == 'c0'
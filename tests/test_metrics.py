@@ -0,0 +1,120 @@
+import sqrlserver
+from sqrlserver.client import Client, RequestTransport
+from sqrlserver.metrics import Registry, MetricsApp
+from sqrlserver.asgi import AsgiApp
+from sqrlserver.wsgi import Counter
+import nacl.utils
+import asyncio
+import threading
+import pytest
+
+key = nacl.utils.random(32)
+
+def answer(req):
+    args = {}
+    for action in req.action:
+        if action[0] == 'confirm':
+            args['confirmed'] = False
+        elif action[0] == 'find':
+            args['found'] = [True]
+        elif action[0] == 'auth':
+            args['authenticated'] = True
+    return args
+
+def client(ipaddr='127.0.0.1'):
+    nut = sqrlserver.Nut(key).generate(ipaddr, 1)
+    return Client(sqrlserver.Url('example.com').generate('/sqrl', nut=nut))
+
+def test_outcomes():
+    reg = Registry()
+    transport = RequestTransport(key, answer, lambda: 2, metrics=reg, maxcounter=10)
+    c = client()
+    c.send(transport, 'query')
+    c.send(transport, 'ident', keys=True)
+    #wrong address: confirm declined
+    client('10.0.0.1').send(transport, 'query')
+    #bad signature
+    qs, body = client().request('query')
+    transport(qs, body.replace(b'ids=', b'ids=A'))
+    #missing signature
+    transport(qs, b'&'.join(p for p in body.split(b'&') if not p.startswith(b'ids=')))
+
+    m = reg.collect()
+    assert m[('sqrl_requests_total', (('cmd', 'query'),))] == 3
+    assert m[('sqrl_requests_total', (('cmd', 'ident'),))] == 1
+    assert m[('sqrl_requests_total', (('cmd', 'none'),))] == 1
+    assert m[('sqrl_tif_total', (('bit', '0x01'),))] == 2
+    assert m[('sqrl_tif_total', (('bit', '0x04'),))] == 2
+    assert m[('sqrl_tif_total', (('bit', '0x40'),))] == 3
+    assert m[('sqrl_rejected_total', (('reason', 'ip'),))] == 1
+    assert m[('sqrl_rejected_total', (('reason', 'sigs'),))] == 1
+    assert m[('sqrl_rejected_total', (('reason', 'malformed'),))] == 1
+    assert m[('sqrl_confirm_total', (('result', 'declined'),))] == 1
+    age = m[('sqrl_nut_age_seconds', ())]
+    assert sum(age[:-1]) == 3
+    assert m[('sqrl_counter_lag', ())][2] == 3
+
+def test_asgi():
+    #requests parsed inline or turned away still count
+    reg = Registry()
+    app = AsgiApp(key, answer, Counter(), metrics=reg)
+    c = client()
+    qs, body = c.request('query')
+    unsigned = b'&'.join(p for p in body.split(b'&') if not p.startswith(b'ids='))
+    async def call(app, data):
+        scope = {'type': 'http', 'method': 'POST', 'query_string': qs.encode('ascii'), 'headers': [], 'client': ('127.0.0.1', 5000)}
+        async def receive():
+            return {'type': 'http.request', 'body': data}
+        async def send(message):
+            pass
+        await app(scope, receive, send)
+    asyncio.run(call(app, body))
+    asyncio.run(call(app, unsigned))
+    asyncio.run(call(AsgiApp(key, answer, Counter(), metrics=reg, maxpending=0), body))
+
+    m = reg.collect()
+    #the busy one was parsed before it was turned away
+    assert m[('sqrl_requests_total', (('cmd', 'query'),))] == 2
+    assert m[('sqrl_requests_total', (('cmd', 'none'),))] == 1
+    assert m[('sqrl_rejected_total', (('reason', 'malformed'),))] == 1
+    assert m[('sqrl_rejected_total', (('reason', 'busy'),))] == 1
+    assert m[('sqrl_tif_total', (('bit', '0x20'),))] == 1
+
+def test_threads():
+    reg = Registry()
+    reg.histogram('x', 'Test values.', (1, 10))
+    def work():
+        for i in range(1000):
+            reg.inc('sqrl_requests_total', (('cmd', 'query'),))
+            reg.observe('x', 5)
+    threads = [threading.Thread(target=work) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    m = reg.collect()
+    assert m[('sqrl_requests_total', (('cmd', 'query'),))] == 4000
+    assert m[('x', ())] == [0, 4000, 0, 20000]
+    with pytest.raises(ValueError):
+        reg.counter('x', 'Again.')
+    with pytest.raises(ValueError):
+        reg.histogram('y', 'Backwards.', (2, 1))
+
+def test_exposition():
+    reg = Registry()
+    reg.histogram('x', 'Test values.', (1, 10))
+    reg.inc('sqrl_tif_total', (('bit', '0x01'),), 2)
+    reg.observe('x', 0.5)
+    reg.observe('x', 50)
+    text = reg.exposition()
+    assert '# TYPE sqrl_tif_total counter\nsqrl_tif_total{bit="0x01"} 2\n' in text
+    assert '# TYPE x histogram\nx_bucket{le="1"} 1\nx_bucket{le="10"} 1\nx_bucket{le="+Inf"} 2\nx_sum 50.5\nx_count 2\n' in text
+
+    out = []
+    app = MetricsApp(reg)
+    body = b''.join(app({'REQUEST_METHOD': 'GET'}, lambda s, h: out.append((s, dict(h)))))
+    assert out[0][0] == '200 OK'
+    assert out[0][1]['Content-Type'].startswith('text/plain')
+    assert body.decode('utf-8') == reg.exposition()
+    app({'REQUEST_METHOD': 'POST'}, lambda s, h: out.append((s, h)))
+    assert out[1][0].startswith('405')
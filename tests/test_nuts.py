@@ -120,3 +120,47 @@ def test_validate_encryption():
     with pytest.raises(nacl.exceptions.CryptoError):
         wrongnut = sqrlserver.Nut(nacl.utils.random(32))
         wrongnut.load(nuts['ipv4-link']).validate('155.6.0.126', 600, counter)
+
+def test_cache():
+    now = [time.time()]
+    cache = sqrlserver.NutCache(maxsize=2, ttl=600, clock=lambda: now[0])
+    qr = sqrlserver.Nut(key).generate('155.6.0.126', counter).toString('qr')
+    link = sqrlserver.Nut(key).generate('155.6.0.126', counter + 1).toString('link')
+
+    for s, isqr in [(qr, True), (link, False)]:
+        first = sqrlserver.Nut(key).load(s, cache=cache).validate('155.6.0.126', 600, counter + 1)
+        again = sqrlserver.Nut(key).load(s, cache=cache).validate('155.6.0.126', 600, counter + 1)
+        for attr in ['timestamp', 'counter', 'isqr', 'islink', 'ipmatch', 'fresh', 'countersane']:
+            assert getattr(again, attr) == getattr(first, attr)
+        assert again.isqr == isqr
+        assert again.nuts['raw'] == first.nuts['raw']
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert not sqrlserver.Nut(key).load(qr, cache=cache).validate('155.6.0.125', 600).ipmatch
+
+    #another key never gets the cached fields
+    with pytest.raises(nacl.exceptions.CryptoError):
+        sqrlserver.Nut(nacl.utils.random(32)).load(qr, cache=cache)
+
+    cache.invalidate(qr)
+    assert cache.get(key, qr) is None
+    assert len(cache) == 1
+
+    #entries go stale with the nut
+    now[0] += 600
+    assert cache.get(key, link) is None
+    assert len(cache) == 0
+    old = sqrlserver.Nut(key).generate('155.6.0.126', counter, now[0] - 700).toString('qr')
+    sqrlserver.Nut(key).load(old, cache=cache)
+    assert len(cache) == 0
+
+    with pytest.raises(ValueError):
+        sqrlserver.NutCache(maxsize=0)
+
+def test_shared_box():
+    #every nut under one key uses the same cipher
+    from sqrlserver import nut
+    key = nacl.utils.random(32)
+    n = sqrlserver.Nut(key).generate('1.2.3.4', 1)
+    box = nut._boxes[key]
+    sqrlserver.Nut(key).load(n.toString('qr'))
+    assert nut._boxes[key] is box
@@ -0,0 +1,119 @@
+import sqrlserver
+from sqrlserver.utils import pad, depad
+from sqrlserver.pending import PendingAuth
+from sqrlserver.wsgi import WsgiApp, Counter
+from base64 import urlsafe_b64encode
+import asyncio
+import io
+import threading
+import urllib.parse
+import nacl.signing
+import nacl.utils
+
+key = nacl.utils.random(32)
+sk = nacl.signing.SigningKey.generate()
+idk = depad(urlsafe_b64encode(bytes(sk.verify_key)).decode('utf-8'))
+
+def body(server, cmd):
+    client = depad(urlsafe_b64encode('ver=1\r\ncmd={}\r\nidk={}\r\n'.format(cmd, idk).encode('utf-8')).decode('utf-8'))
+    ids = depad(urlsafe_b64encode(sk.sign((client + server).encode('utf-8')).signature).decode('utf-8'))
+    return urllib.parse.urlencode({'client': client, 'server': server, 'ids': ids}).encode('utf-8')
+
+def call(app, data, qs):
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'QUERY_STRING': qs,
+        'CONTENT_LENGTH': str(len(data)),
+        'REMOTE_ADDR': '1.2.3.4',
+        'wsgi.input': io.BytesIO(data),
+    }
+    return b''.join(app(environ, lambda s, h: None)).decode('ascii')
+
+def resolver(req):
+    args = {}
+    for action in req.action:
+        if action[0] == 'find':
+            args['found'] = [True]
+        elif action[0] == 'auth':
+            args['authenticated'] = True
+    return args
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+def test_flow():
+    pending = PendingAuth()
+    app = WsgiApp(key, resolver, Counter(10), pending=pending)
+
+    #the page shows a QR code and registers its nut
+    nut = sqrlserver.Nut(key).generate('1.2.3.4', 5)
+    pending.register(5)
+    url = sqrlserver.Url('example.com').generate('/sqrl', nut=nut)
+    server = depad(urlsafe_b64encode(url.encode('utf-8')).decode('utf-8'))
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(pending.wait(5, timeout=5)))
+    waiter.start()
+
+    #query links the new nut (counter 10) to the QR nut
+    out = call(app, body(server, 'query'), 'nut=' + nut.toString('qr'))
+    newnut = sqrlserver.Request._extract_server(pad(out))['nut']
+    assert 10 in pending
+    assert waiter.is_alive()
+
+    #ident with the new nut completes the login
+    call(app, body(out, 'ident'), 'nut=' + newnut)
+    waiter.join()
+    assert result == [idk]
+    assert pending.wait(10) == idk
+    assert len(pending) == 1
+
+def test_async():
+    pending = PendingAuth()
+    pending.register(1)
+    pending.register(2)
+    async def main():
+        waiter = asyncio.ensure_future(pending.wait_async(1))
+        await asyncio.sleep(0)
+        #signal from another thread
+        t = threading.Thread(target=pending.signal, args=(1, 'idk'))
+        t.start()
+        t.join()
+        timedout = await pending.wait_async(2, timeout=0.01)
+        return await waiter, timedout
+    assert asyncio.run(main()) == ('idk', None)
+    assert pending.signal(1, 'other')
+    assert pending.wait(1) == 'idk'
+
+def test_expiry():
+    clock = Clock()
+    pending = PendingAuth(ttl=60, clock=clock)
+    pending.register(1)
+    pending.register(2, ttl=120)
+    pending.link(2, 3)
+    assert len(pending) == 2
+    assert pending.wait(1, timeout=0) is None
+
+    clock.now += 61
+    assert 1 not in pending
+    assert not pending.signal(1)
+    assert pending.signal(3, 'idk')
+    assert pending.wait(2) == 'idk'
+
+    clock.now += 60
+    pending.evict()
+    assert len(pending) == 0
+    assert pending.wait(2) is None
+
+    pending.register(4)
+    pending.discard(4)
+    assert 4 not in pending
+
+    try:
+        PendingAuth(ttl=0)
+        assert False
+    except ValueError:
+        pass
@@ -0,0 +1,37 @@
+import sqrlserver
+from sqrlserver.client import Client
+from sqrlserver.identity import SqliteIdentityStore
+from sqrlserver.pool import RequestPool
+from sqrlserver.wsgi import Counter
+import functools
+import urllib.parse
+import nacl.utils
+
+key = nacl.utils.random(32)
+
+def params(client, cmd, **kwargs):
+    qs, body = client.request(cmd, **kwargs)
+    return dict(urllib.parse.parse_qsl(qs) + urllib.parse.parse_qsl(body.decode('ascii')))
+
+def test_lifecycle(tmp_path):
+    store = functools.partial(SqliteIdentityStore, str(tmp_path / 'ids.db'))
+    with RequestPool(key, store, Counter(), workers=2) as pool:
+        client = Client(sqrlserver.Url('example.com').generate('/sqrl', nut=sqrlserver.Nut(key).generate('127.0.0.1', 1)))
+        tifs = []
+        for cmd, kwargs in [('query', {}), ('ident', {'keys': True}), ('disable', {}), ('enable', {'unlock': True}), ('remove', {'unlock': True})]:
+            tif, response, actions, nut = pool.process(params(client, cmd, **kwargs), ipaddr='127.0.0.1')
+            client.receive(response)
+            assert tif == client.tif
+            tifs.append(tif)
+        assert tifs == [0x04, 0x05, 0x0D, 0x05, 0x04]
+        assert actions == ('vuk', 'remove')
+        assert nut[2:] == (True, True, True, True)
+
+        #many at once, in order; a bad nut comes back with no nut fields
+        clients = [Client(sqrlserver.Url('example.com').generate('/sqrl', nut=sqrlserver.Nut(key).generate('127.0.0.1', i))) for i in range(10)]
+        requests = [(params(c, 'query'), '127.0.0.1') for c in clients]
+        requests[3][0]['nut'] = sqrlserver.Nut(nacl.utils.random(32)).generate('127.0.0.1', 3).toString('qr')
+        results = list(pool.map(requests, chunksize=4))
+        assert [r[0] for r in results] == [0x04] * 3 + [0xE0] + [0x04] * 6
+        assert results[3][3] is None
+        assert [r[3][1] for r in results if r[3] is not None] == [0, 1, 2, 4, 5, 6, 7, 8, 9]
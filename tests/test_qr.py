@@ -0,0 +1,83 @@
+import sqrlserver
+from sqrlserver import qr
+import nacl.utils
+import pytest
+
+key = nacl.utils.random(32)
+
+def test_structure():
+    code = qr.encode('sqrl://example.com/sqrl?nut=abc', mask=0)
+    assert code.version == 3
+    assert code.size == 29
+    assert code.mask == 0
+    #finder patterns in three corners
+    finder = [
+        b'\x01\x01\x01\x01\x01\x01\x01',
+        b'\x01\x00\x00\x00\x00\x00\x01',
+        b'\x01\x00\x01\x01\x01\x00\x01',
+    ]
+    for y in range(3):
+        assert bytes(code.matrix[y][:7]) == finder[y]
+        assert bytes(code.matrix[y][-7:]) == finder[y]
+        assert bytes(code.matrix[code.size - 7 + y][:7]) == finder[y]
+    #timing pattern
+    assert bytes(code.matrix[6][8:code.size - 8]) == bytes([(x + 1) % 2 for x in range(8, code.size - 8)])
+    #dark module
+    assert code.matrix[code.size - 8][8] == 1
+
+def test_versions():
+    assert qr.encode('a' * 14).version == 1
+    assert qr.encode('a' * 15).version == 2
+    assert qr.encode('a' * 17, ecc='L').version == 1
+    with pytest.raises(ValueError):
+        qr.encode('a' * 3000)
+
+def test_args():
+    with pytest.raises(ValueError):
+        qr.QrEncoder(ecc='X')
+    with pytest.raises(ValueError):
+        qr.QrEncoder(mask=8)
+    with pytest.raises(ValueError):
+        qr.QrEncoder('sqrl://example.com/sqrl?nut=')
+
+def test_template():
+    u = sqrlserver.Url('user:pass@example.com:8081')
+    enc = qr.QrEncoder.forUrl(u, '/auth/sqrl', query=[('name1', 'value1')], ext=5)
+    for counter in range(5):
+        s = u.generate('/auth/sqrl', key=key, counter=counter, query=[('name1', 'value1')], ext=5)
+        assert enc._template.codewords(s) is not None
+        fast = enc.encode(s)
+        slow = qr.encode(s)
+        assert fast.matrix == slow.matrix
+        assert fast.mask == slow.mask
+
+    #anything else still encodes, just without the template
+    s = u.generate('/other', key=key, counter=1)
+    assert enc._template.codewords(s) is None
+    assert enc.encode(s).matrix == qr.encode(s).matrix
+
+def test_text():
+    code = qr.encode('hello', mask=0)
+    lines = code.toText(border=4).split('\n')
+    assert len(lines) == (code.size + 1) // 2 + 4
+    assert all([len(line) == code.size + 8 for line in lines])
+    assert lines[0].strip() == ''
+    assert lines[2][4:11] == '█▀▀▀▀▀█'
+
+    lines = code.toText(border=1, compact=False).split('\n')
+    assert len(lines) == code.size + 2
+    assert lines[1][2:16] == '##############'
+
+def test_against_reference():
+    qrcode = pytest.importorskip('qrcode')
+    import qrcode.util
+    levels = {'L': qrcode.constants.ERROR_CORRECT_L, 'M': qrcode.constants.ERROR_CORRECT_M, 'Q': qrcode.constants.ERROR_CORRECT_Q, 'H': qrcode.constants.ERROR_CORRECT_H}
+    u = sqrlserver.Url('example.com')
+    for ecc in levels:
+        for mask in range(8):
+            s = u.generate('/sqrl', key=key, counter=mask)
+            mine = qr.encode(s, ecc=ecc, mask=mask)
+            ref = qrcode.QRCode(version=mine.version, error_correction=levels[ecc], mask_pattern=mask, border=0)
+            ref.add_data(qrcode.util.QRData(s.encode('utf-8'), mode=qrcode.util.MODE_8BIT_BYTE))
+            ref.make(fit=False)
+            assert mine.matrix == [bytearray([int(m) for m in row]) for row in ref.modules]
@@ -4,6 +4,7 @@ import pytest
 import nacl.utils
 import nacl.hash
 import time
+from base64 import urlsafe_b64decode
 
 def test_client():
     #test client parsing
@@ -742,3 +743,107 @@ def test_finalize():
 
 
 
+
+def test_malformed():
+    #client errors must never raise
+    key = nacl.utils.random(32)
+    for params in [{}, {'nut': 'abc', 'client': 'btn', 'server': 'ins', 'ids': 'pins'}]:
+        req = sqrlserver.Request(key, params, ipaddr='1.2.3.4')
+        req.handle()
+        assert req.state == 'COMPLETE'
+        assert req.action == []
+        assert req._response._tif == 0x40 + 0x80
+        #there is no nut to answer with, so only a failsafe finalize answers
+        with pytest.raises(KeyError if 'nut' not in params else ValueError):
+            req.finalize(counter=1)
+        assert req.finalize(failsafe=True, counter=1)._tif == 0x40 + 0x80
+        #but programming errors are never swallowed
+        with pytest.raises(AssertionError):
+            req.finalize(failsafe=True)
+
+    #wrong-length keys and signatures are just invalid
+    assert sqrlserver.Request._signature_valid('msg', 'TLpyrowLhWf9', 'tCTr1DoEYANtxGE') == False
+
+def test_binary():
+    key = nacl.utils.random(32)
+    nutstr = sqrlserver.Nut(key).generate('1.2.3.4', 100).toString('qr')
+    params = {
+        'nut': nutstr,
+        'client': 'dmVyPTENCmNtZD1pZGVudA0KaWRrPVRMcHlyb3dMaFdmOS1oZExMUFFPQS03LXhwbEk5TE94c2ZMWHN5VGNjVmMNCnN1az1XNnF5Um9XOEZveTI1YW9UeDkxcFdsRlRrX3JidWsycEExVXdUOGlmVXdnDQp2dWs9YjFaZVFTVlNMaTFUdnZ6RDNMNHV5cTAyNlRZSmdqY3JEMWRoQXhqWTRvWQ0Kb3B0PWNwc35zdWsNCg',
+        'server': 'dmVyPTENCm51dD0yYzN6RnNQSkNaN1NwUzRPZUlnMGNBDQp0aWY9NA0KcXJ5PS9zcXJsP251dD0yYzN6RnNQSkNaN1NwUzRPZUlnMGNBDQo',
+        'ids': 'lAW6MpZoSlO3_rhfDPwEWpJYvNmbJ23METdC6WnliJSEk3qnQaYei5ADiv6ThbMitkEtSiRwAAmxfJDZxfJiCw'
+    }
+    idk = urlsafe_b64decode(pad('TLpyrowLhWf9-hdLLPQOA-7-xplI9LOxsfLXsyTccVc'))
+    suk = urlsafe_b64decode(pad('W6qyRoW8Foy25aoTx91pWlFTk_rbuk2pA1UwT8ifUwg'))
+
+    #keys and signatures are decoded once, into bytes
+    req = sqrlserver.Request(key, params, ipaddr='1.2.3.4', binary=True)
+    req.handle()
+    assert req.state == 'ACTION'
+    assert req.action[0] == ('auth', idk, suk, urlsafe_b64decode(pad('b1ZeQSVSLi1TvvzD3L4uyq026TYJgjcrD1dhAxjY4oY')), 'cps')
+    assert len(req.params['ids']) == 64
+    assert req.action[0][1] is req.params['client']['idk']
+
+    #the SUK may come back as bytes
+    req.handle({'authenticated': True, 'suk': suk})
+    assert req.state == 'COMPLETE'
+    assert req._response.params['suk'] == 'W6qyRoW8Foy25aoTx91pWlFTk_rbuk2pA1UwT8ifUwg'
+
+    #a truncated signature is malformed rather than merely invalid
+    badparams = dict(params, ids=params['ids'][:-4])
+    req = sqrlserver.Request(key, badparams, ipaddr='1.2.3.4', binary=True)
+    assert req._check_well_formedness() == False
+    req = sqrlserver.Request(key, badparams, ipaddr='1.2.3.4')
+    assert req._check_well_formedness() == True
+
+    #raw keys and signatures verify too
+    msg = (params['client'] + params['server']).encode('utf-8')
+    assert sqrlserver.Request._signature_valid(msg, idk, urlsafe_b64decode(pad(params['ids'])))
+    assert not sqrlserver.Request._signature_valid(msg, suk, urlsafe_b64decode(pad(params['ids'])))
+
+def test_nutcache():
+    key = nacl.utils.random(32)
+    nutstr = sqrlserver.Nut(key).generate('1.2.3.4', 100).toString('qr')
+    params = {
+        'nut': nutstr,
+        'client': 'dmVyPTENCmNtZD1pZGVudA0KaWRrPVRMcHlyb3dMaFdmOS1oZExMUFFPQS03LXhwbEk5TE94c2ZMWHN5VGNjVmMNCmlucz1kOHVNZUNGTC1sVGliSkJXVFVYcWZmWW9Xdjh2eko3alFrdXMwbHZ0Q1ZBDQpvcHQ9Y3BzfnN1aw0K',
+        'server': 'dmVyPTENCm51dD1YQXVYNFlXMkE5a21UMGQ2V2l3b3ZRDQp0aWY9QzUNCnFyeT0vc3FybD9udXQ9WEF1WDRZVzJBOWttVDBkNldpd292UQ0Kc3VrPVY2N280Y2IzOEtxNWY3aWphT21HUk5CTzBMTHdoVGQ1WUFubGRkVFh1UUENCnNpbj0wDQo',
+        'ids': 'aM8v2eVPjtjdrgTKqVmgmSwtiOjqCeeKH4QGPO8MckX6eaXe6BMbMYnxhMtyAJQCev6762YeWWn0o8t2cXibBA'
+    }
+    cache = sqrlserver.NutCache()
+
+    #a refused ident leaves the nut cached for the retry
+    req = sqrlserver.Request(key, params, ipaddr='1.2.3.4', nutcache=cache)
+    req.handle()
+    req.handle({'authenticated': False})
+    req.finalize(counter=101)
+    assert (cache.hits, cache.misses, len(cache)) == (0, 1, 1)
+
+    #the retry skips the decryption, and logging in consumes the nut
+    req = sqrlserver.Request(key, params, ipaddr='1.2.3.4', nutcache=cache)
+    req.handle()
+    assert req.nut.counter == 100
+    req.handle({'authenticated': True})
+    assert req.finalize(counter=102).params['nut'] != nutstr
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 0)
+
+def test_threads():
+    #many requests at once, sharing only the key and the resolver
+    import threading
+    from sqrlserver.client import Client, RequestTransport
+    key = nacl.utils.random(32)
+    def answer(req):
+        return {'found': [True]} if req.action[0][0] == 'find' else {'authenticated': True}
+    transport = RequestTransport(key, answer, lambda: 2)
+    clients = [Client(sqrlserver.Url('example.com').generate('/sqrl', nut=sqrlserver.Nut(key).generate('127.0.0.1', i))) for i in range(32)]
+    tifs = []
+    def run(client):
+        client.send(transport, 'query')
+        client.send(transport, 'ident', keys=True)
+        tifs.append(client.tif)
+    threads = [threading.Thread(target=run, args=(c,)) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert tifs == [0x05] * 32
@@ -52,3 +52,20 @@ def test_hmac():
     assert r.hmac(longkey) == 'mXOZ9n1EeOM'
 
 
+
+def test_load_copies():
+    r = sqrlserver.Response()
+    r.addParam('nut', 'NUT')
+    r2 = sqrlserver.Response.load(r)
+    r2.addParam('qry', '/sqrl')
+    assert r.params == {'nut': 'NUT'}
+    assert r2.params == {'nut': 'NUT', 'qry': '/sqrl'}
+
+def test_failure():
+    assert sqrlserver.Response.failure()._tif == 0x40 + 0x80
+    r = sqrlserver.Response().tifOn(0x01)
+    r.addParam('nut', 'NUT')
+    f = sqrlserver.Response.failure(r)
+    assert f._tif == 0x01 + 0x40 + 0x80
+    assert f.params == {'nut': 'NUT'}
+    assert r._tif == 0x01
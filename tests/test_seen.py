@@ -0,0 +1,123 @@
+import sqrlserver
+from sqrlserver.utils import pad, depad
+from sqrlserver.seen import SeenNuts
+from sqrlserver.wsgi import WsgiApp, Counter
+from base64 import urlsafe_b64encode
+import io
+import multiprocessing
+import threading
+import urllib.parse
+import nacl.signing
+import nacl.utils
+
+key = nacl.utils.random(32)
+sk = nacl.signing.SigningKey.generate()
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000000
+    def __call__(self):
+        return self.now
+
+def test_table(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / 'seen')
+    seen = SeenNuts(path, capacity=1000, maxprobe=8, clock=clock)
+    assert seen.capacity == 1024
+    assert seen.add('a', clock.now + 10)
+    assert not seen.add('a', clock.now + 10)
+    assert 'a' in seen
+    assert 'b' not in seen
+    assert len(seen) == 1
+
+    #a second handle on the same file sees the same entries
+    other = SeenNuts(path, capacity=16, clock=clock)
+    assert other.capacity == 1024
+    assert not other.add('a', clock.now + 10)
+
+    #expired entries are forgotten and their slots reused
+    clock.now += 11
+    assert 'a' not in seen
+    assert seen.add('a', clock.now + 10)
+    other.close()
+    seen.close()
+
+def test_full(tmp_path):
+    clock = Clock()
+    seen = SeenNuts(str(tmp_path / 'seen'), capacity=4, maxprobe=2, clock=clock)
+    #more nuts than slots; the ones closest to expiry make way
+    for i in range(100):
+        assert seen.add(str(i), clock.now + i + 1)
+    assert len(seen) <= 6
+    assert '99' in seen
+    seen.close()
+
+def test_bad_file(tmp_path):
+    path = tmp_path / 'seen'
+    path.write_bytes(b'x' * 100)
+    try:
+        SeenNuts(str(path))
+        assert False
+    except ValueError:
+        pass
+
+def _worker(path, results):
+    seen = SeenNuts(path)
+    results.put([n for n in range(2000) if seen.add(str(n), 2**40)])
+    seen.close()
+
+def test_processes(tmp_path):
+    path = str(tmp_path / 'seen')
+    SeenNuts(path, capacity=4096).close()
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_worker, args=(path, results)) for i in range(4)]
+    for p in procs:
+        p.start()
+    won = []
+    for p in procs:
+        won += results.get()
+    for p in procs:
+        p.join()
+    #every nut was accepted by exactly one process
+    assert sorted(won) == list(range(2000))
+
+def test_instances(tmp_path):
+    #instances in one process exclude each other too, though fcntl wouldn't
+    path = str(tmp_path / 'seen')
+    SeenNuts(path, capacity=4096).close()
+    won = []
+    def work():
+        seen = SeenNuts(path)
+        won.extend([n for n in range(2000) if seen.add(str(n), 2**40)])
+        seen.close()
+    threads = [threading.Thread(target=work) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(won) == list(range(2000))
+
+def test_request(tmp_path):
+    seen = SeenNuts(str(tmp_path / 'seen'))
+    app = WsgiApp(key, lambda req: {'found': [True]}, Counter(), seen=seen)
+    nut = sqrlserver.Nut(key).generate('1.2.3.4', 1)
+    url = sqrlserver.Url('example.com').generate('/sqrl', nut=nut)
+    idk = depad(urlsafe_b64encode(bytes(sk.verify_key)).decode('utf-8'))
+    client = depad(urlsafe_b64encode('ver=1\r\ncmd=query\r\nidk={}\r\n'.format(idk).encode('utf-8')).decode('utf-8'))
+    server = depad(urlsafe_b64encode(url.encode('utf-8')).decode('utf-8'))
+    ids = depad(urlsafe_b64encode(sk.sign((client + server).encode('utf-8')).signature).decode('utf-8'))
+    data = urllib.parse.urlencode({'client': client, 'server': server, 'ids': ids}).encode('utf-8')
+    def call():
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'QUERY_STRING': 'nut=' + nut.toString('qr'),
+            'CONTENT_LENGTH': str(len(data)),
+            'REMOTE_ADDR': '1.2.3.4',
+            'wsgi.input': io.BytesIO(data),
+        }
+        out = b''.join(app(environ, lambda s, h: None)).decode('ascii')
+        return sqrlserver.Request._extract_server(pad(out))['tif']
+    assert call() == '5'
+    #the same request again is a replay
+    assert call() == '60'
+    seen.close()
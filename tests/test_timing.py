@@ -0,0 +1,58 @@
+import sqrlserver
+from sqrlserver.client import Client, RequestTransport
+from sqrlserver.timing import HistogramSink, CallbackSink
+import nacl.utils
+import pytest
+
+key = nacl.utils.random(32)
+
+def answer(req):
+    args = {}
+    for action in req.action:
+        if action[0] == 'find':
+            args['found'] = [True]
+        elif action[0] == 'auth':
+            args['authenticated'] = True
+    return args
+
+def client():
+    nut = sqrlserver.Nut(key).generate('127.0.0.1', 1)
+    return Client(sqrlserver.Url('example.com').generate('/sqrl', nut=nut))
+
+def test_stages():
+    sink = HistogramSink()
+    transport = RequestTransport(key, answer, lambda: 2, timing=sink)
+    c = client()
+    c.send(transport, 'query')
+    c.send(transport, 'ident', keys=True)
+    assert c.tif == 0x05
+    stats = sink.snapshot()
+    for stage in ['parse', 'signature', 'nut', 'nut.decrypt', 'resolver', 'finalize']:
+        assert stats[stage]['count'] == 2
+        assert sum(stats[stage]['buckets']) == 2
+        assert stats[stage]['sum'] > 0
+    assert 'hmac' not in stats
+    assert sink.percentile('signature', 0.5) <= 0.25
+    assert sink.percentile('hmac', 0.5) is None
+    sink.reset()
+    assert sink.snapshot() == {}
+
+def test_callback():
+    seen = []
+    sink = CallbackSink(lambda stage, seconds: seen.append(stage))
+    transport = RequestTransport(key, answer, lambda: 2, timing=sink)
+    #a bad signature stops before the nut is touched
+    qs, body = client().request('query')
+    transport(qs, body.replace(b'ids=', b'ids=A'))
+    assert seen == ['parse', 'signature', 'finalize']
+
+def test_histogram():
+    sink = HistogramSink(bounds=(1, 2))
+    for seconds in [0.5, 1, 1.5, 3, 3]:
+        sink.record('x', seconds)
+    assert sink.snapshot()['x']['buckets'] == [2, 1, 2]
+    assert sink.percentile('x', 0.2) == 1
+    assert sink.percentile('x', 0.6) == 2
+    assert sink.percentile('x', 1.0) == float('inf')
+    with pytest.raises(ValueError):
+        HistogramSink(bounds=(2, 1))
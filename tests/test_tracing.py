@@ -0,0 +1,76 @@
+import sqrlserver
+from sqrlserver.client import Client, RequestTransport
+from sqrlserver.tracing import Tracer, OpenTelemetryTracer
+import nacl.utils
+import pytest
+
+key = nacl.utils.random(32)
+
+class Recorder(object):
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name):
+        span = RecordedSpan(name)
+        self.spans.append(span)
+        return span
+
+class RecordedSpan(object):
+    def __init__(self, name):
+        self.name = name
+        self.attributes = {}
+        self.ended = False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        self.ended = True
+
+def answer(req):
+    args = {}
+    for action in req.action:
+        if action[0] == 'find':
+            args['found'] = [True]
+    return args
+
+def client():
+    nut = sqrlserver.Nut(key).generate('127.0.0.1', 1)
+    return Client(sqrlserver.Url('example.com').generate('/sqrl', nut=nut))
+
+def test_spans():
+    tracer = Recorder()
+    transport = RequestTransport(key, answer, lambda: 2, tracer=tracer)
+    c = client()
+    c.send(transport, 'query')
+    assert [s.name for s in tracer.spans] == ['sqrl.parse', 'sqrl.signature', 'sqrl.nut', 'sqrl.resolver', 'sqrl.finalize']
+    assert all(s.ended for s in tracer.spans)
+    spans = {s.name: s.attributes for s in tracer.spans}
+    assert spans['sqrl.parse'] == {'sqrl.wellformed': True}
+    assert spans['sqrl.signature'] == {'sqrl.valid': True}
+    assert spans['sqrl.nut']['sqrl.ipmatch'] == True
+    assert spans['sqrl.resolver'] == {'sqrl.actions': 'find', 'sqrl.answered': 'found'}
+    assert spans['sqrl.finalize'] == {'sqrl.tif': 0x05}
+
+    #a failed finalize still ends its span
+    tracer.spans = []
+    req = sqrlserver.Request(key, {}, tracer=tracer)
+    req.handle()
+    with pytest.raises(KeyError):
+        req.finalize(counter=2)
+    assert [s.name for s in tracer.spans] == ['sqrl.parse', 'sqrl.finalize']
+    assert tracer.spans[-1].ended
+    assert tracer.spans[-1].attributes == {}
+
+def test_noop():
+    transport = RequestTransport(key, answer, lambda: 2, tracer=Tracer())
+    c = client()
+    c.send(transport, 'query')
+    assert c.tif == 0x05
+
+def test_opentelemetry():
+    trace = pytest.importorskip('opentelemetry.trace')
+    transport = RequestTransport(key, answer, lambda: 2, tracer=OpenTelemetryTracer(trace.get_tracer('test')))
+    c = client()
+    c.send(transport, 'query')
+    assert c.tif == 0x05
@@ -79,3 +79,11 @@ def test_nutgen():
 
 
 
+
+def test_query_untouched():
+    #the caller's list is never changed, so it can be shared between threads
+    query = [('a', 1)]
+    u = sqrlserver.Url('example.com')
+    first = u.generate('/auth/sqrl', nut=nut, ext=5, query=query)
+    assert query == [('a', 1)]
+    assert u.generate('/auth/sqrl', nut=nut, ext=5, query=query) == first
@@ -0,0 +1,156 @@
+from sqrlserver.wheel import TimingWheel
+from sqrlserver.pending import PendingAuth
+from sqrlserver.macstore import MemoryMacStore, SqliteMacStore
+from sqrlserver.cps import MemoryCpsStore, SqliteCpsStore
+from sqrlserver.idempotency import IdempotencyCache
+from sqrlserver.nut import NutCache
+from sqrlserver.response import Response
+import asyncio
+import random
+import threading
+
+class Clock(object):
+    def __init__(self):
+        self.now = 5000.5
+    def __call__(self):
+        return self.now
+
+def test_expiry():
+    clock = Clock()
+    wheel = TimingWheel(clock=clock)
+    fired = []
+    wheel.schedule(0, fired.append, 'now')
+    wheel.schedule(2, fired.append, 'soon')
+    later = wheel.schedule(10, fired.append, 'later')
+    assert wheel.live == 3
+
+    clock.now += 1
+    assert wheel.advance() == 1
+    assert fired == ['now']
+    assert later.cancel()
+    assert not later.cancel()
+    assert not later.active
+
+    clock.now += 1.5
+    wheel.advance()
+    assert fired == ['now', 'soon']
+    assert (wheel.live, wheel.expired, wheel.lastexpired) == (0, 2, 1)
+
+def test_levels():
+    #small wheels so the test crosses every level and the parking slot
+    for i in range(20):
+        clock = Clock()
+        wheel = TimingWheel(slots=4, levels=3, clock=clock)
+        deadlines = {}
+        fired = {}
+        for n in range(200):
+            delay = random.uniform(0, 150)
+            wheel.schedule(delay, lambda n=n: fired.__setitem__(n, clock.now))
+            deadlines[n] = clock.now + delay
+            if random.random() < 0.2:
+                clock.now += random.uniform(0, 2)
+                wheel.advance()
+        while wheel.live:
+            clock.now += 0.5
+            wheel.advance()
+        #never early; late by at most a tick plus the gap between advances
+        for n in deadlines:
+            assert deadlines[n] <= fired[n] < deadlines[n] + 3
+
+def test_errors():
+    clock = Clock()
+    wheel = TimingWheel(clock=clock)
+    fired = []
+    def boom():
+        raise RuntimeError()
+    wheel.schedule(1, boom)
+    wheel.schedule(1, fired.append, 1)
+    clock.now += 2
+    try:
+        wheel.advance()
+        assert False
+    except RuntimeError:
+        pass
+    assert fired == [1]
+
+    for kwargs in [{'resolution': 0}, {'slots': 10}, {'levels': 0}]:
+        try:
+            TimingWheel(**kwargs)
+            assert False
+        except ValueError:
+            pass
+
+def test_drivers():
+    wheel = TimingWheel(resolution=0.01).start()
+    done = threading.Event()
+    wheel.schedule(0.02, done.set)
+    assert done.wait(5)
+    wheel.stop()
+
+    async def main():
+        wheel = TimingWheel(resolution=0.01)
+        driver = asyncio.ensure_future(wheel.run())
+        future = asyncio.get_running_loop().create_future()
+        wheel.schedule(0.02, future.set_result, True)
+        result = await asyncio.wait_for(future, 5)
+        wheel.stop()
+        await driver
+        return result
+    assert asyncio.run(main())
+
+def test_pending():
+    clock = Clock()
+    wheel = TimingWheel(clock=clock)
+    pending = PendingAuth(ttl=30, clock=clock, wheel=wheel)
+    pending.register(1)
+    pending.register(2)
+    pending.discard(2)
+    assert wheel.live == 1
+
+    #the wheel wakes waiters when their entry expires
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(pending.wait(1, timeout=5)))
+    waiter.start()
+    clock.now += 31
+    wheel.advance()
+    waiter.join()
+    assert result == [None]
+    assert 1 not in pending
+    assert wheel.live == 0
+
+def test_stores(tmp_path):
+    #every TTL-scoped store can hand its expiry to the wheel
+    clock = Clock()
+    wheel = TimingWheel(clock=clock)
+    macs = MemoryMacStore(ttl=10, clock=clock, wheel=wheel)
+    macs.put('a', 'MAC')
+    macs.put('a', 'MAC2')
+    nuts = NutCache(ttl=10, clock=clock, wheel=wheel)
+    nuts.put(b'k', 'nut', (None, clock.now - 5, 1, True))
+    nuts.put(b'k', 'gone', (None, clock.now - 5, 2, True))
+    nuts.invalidate('gone')
+    responses = IdempotencyCache(ttl=10, clock=clock, wheel=wheel)
+    responses.get(b'key', lambda: Response().tifOn(0x01))
+    tokens = MemoryCpsStore(wheel=wheel)
+    tokens.put(b'tid', 'IDK', clock.now + 10, clock.now)
+    sqlmacs = SqliteMacStore(str(tmp_path / 'macs.db'), ttl=10, clock=clock, wheel=wheel)
+    sqlmacs.put('a', 'MAC')
+    sqltokens = SqliteCpsStore(str(tmp_path / 'cps.db'), wheel=wheel)
+    sqltokens.put(b'tid', 'IDK', int(clock.now) + 10, int(clock.now))
+    #replaced and invalidated entries leave no timers behind
+    assert wheel.live == 6
+
+    clock.now += 6
+    wheel.advance()
+    assert len(nuts) == 0
+    assert (len(macs), len(responses), len(tokens)) == (1, 1, 1)
+
+    clock.now += 5
+    wheel.advance()
+    assert (len(macs), len(responses), len(tokens)) == (0, 0, 0)
+    count = lambda store, table: store._db.execute('SELECT COUNT(*) FROM ' + table).fetchone()[0]
+    assert count(sqlmacs, 'sqrl_macs') == 0
+    assert count(sqltokens, 'sqrl_cps') == 0
+    assert wheel.live == 0
+    sqlmacs.close()
+    sqltokens.close()
@@ -0,0 +1,155 @@
+from sqrlserver.utils import depad
+from sqrlserver.identity import SqliteIdentityStore
+from sqrlserver.writebehind import WriteBehindStore
+from base64 import urlsafe_b64encode
+import sqlite3
+import threading
+import nacl.utils
+
+def key():
+    return depad(urlsafe_b64encode(nacl.utils.random(32)).decode('utf-8'))
+
+def test_buffering(tmp_path):
+    path = str(tmp_path / 'ids.db')
+    store = WriteBehindStore(SqliteIdentityStore(path), batch=1000, delay=60)
+    other = SqliteIdentityStore(path)
+    a, b, s, v = key(), key(), key(), key()
+
+    assert store.create(a, s, v)
+    assert not store.create(a, s, v)
+    assert store.setDisabled(a, True)
+    assert store.setOptions(a, True, True)
+    #read your own writes before anything is committed
+    assert store.lookup(a)['disabled']
+    assert store.find(a, b)[:2] == [True, False]
+    assert other.lookup(a) is None
+    assert store.coalesced == 2
+
+    store.flush()
+    record = other.lookup(a)
+    assert (record['disabled'], record['sqrlonly'], record['hardlock']) == (True, True, True)
+    assert (store.flushes, store.rows) == (1, 1)
+
+    #rekey and remove go through the buffer too
+    assert store.rekey(a, b, s, v)
+    assert store.lookup(a) is None
+    assert store.find(b, a)[:2] == [True, False]
+    assert store.lookup(b)['disabled']
+    assert store.remove(b)
+    assert not store.remove(b)
+    assert not store.setDisabled(b, False)
+    store.close()
+    assert other.find(a, b)[:2] == [False, False]
+
+    stats = store.stats()
+    assert stats['flushes'] == 2
+    assert stats['pending'] == 0
+    assert stats['lag_max'] >= stats['commit_max'] > 0
+
+def test_background(tmp_path):
+    path = str(tmp_path / 'ids.db')
+    store = WriteBehindStore(SqliteIdentityStore(path), batch=10, delay=0.01)
+    keys = [key() for i in range(25)]
+    for k in keys:
+        store.create(k, k, k)
+    #wait for the background thread
+    store.close()
+    other = SqliteIdentityStore(path)
+    assert all([other.find(k)[0] for k in keys])
+    assert store.rows == 25
+
+def test_durability(tmp_path):
+    path = str(tmp_path / 'ids.db')
+    other = SqliteIdentityStore(path)
+    for durability in ['group', 'sync']:
+        store = WriteBehindStore(SqliteIdentityStore(path), delay=60, durability=durability)
+        keys = [key() for i in range(20)]
+        def worker(k):
+            store.create(k, k, k)
+            #committed by the time it returns
+            assert other.find(k)[0]
+        threads = [threading.Thread(target=worker, args=(k,)) for k in keys]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert store.rows == 20
+        store.close()
+
+    try:
+        WriteBehindStore(other, durability='eventually')
+        assert False
+    except ValueError:
+        pass
+
+class Flaky(SqliteIdentityStore):
+    failures = 1
+    def update(self, changes):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError('database is locked')
+        SqliteIdentityStore.update(self, changes)
+
+def test_retry(tmp_path):
+    store = WriteBehindStore(Flaky(str(tmp_path / 'ids.db')), delay=60)
+    a, b = key(), key()
+    store.create(a, a, a)
+    try:
+        store.flush()
+        assert False
+    except sqlite3.OperationalError:
+        pass
+    #the failed batch goes back into the buffer, under newer writes
+    assert store.stats()['pending'] == 1
+    assert store.lookup(a) is not None
+    store.create(b, b, b)
+    store.close()
+    assert store.errors == 1
+    assert store.rows == 2
+    assert store.store.lookup(b) is not None
+    assert store.store.lookup(a) is not None
+
+def test_group_failure(tmp_path):
+    store = WriteBehindStore(Flaky(str(tmp_path / 'ids.db')), delay=0.01, durability='group')
+    a, b = key(), key()
+    #the writer waiting on the failed commit hears about it
+    try:
+        store.create(a, a, a)
+        assert False
+    except sqlite3.OperationalError:
+        pass
+    #and the change is still committed on the retry
+    store.create(b, b, b)
+    assert store.store.lookup(a) is not None
+    store.close()
+    assert store.errors == 1
+
+class Slow(SqliteIdentityStore):
+    def __init__(self, path):
+        SqliteIdentityStore.__init__(self, path)
+        self.reading = threading.Event()
+        self.release = threading.Event()
+    def lookup(self, idk):
+        if not self.reading.is_set():
+            self.reading.set()
+            self.release.wait()
+        return SqliteIdentityStore.lookup(self, idk)
+
+def test_unlocked_lookup(tmp_path):
+    path = str(tmp_path / 'ids.db')
+    a, b = key(), key()
+    SqliteIdentityStore(path).create(a, a, a)
+    store = WriteBehindStore(Slow(path), delay=60)
+    results = []
+    t = threading.Thread(target=lambda: results.append(store.setDisabled(a, True)))
+    t.start()
+    store.store.reading.wait()
+    #other writers aren't held up by the read
+    assert store.create(b, b, b)
+    assert store.remove(a)
+    store.store.release.set()
+    t.join()
+    #and the reader sees the removal that raced it
+    assert results == [False]
+    store.close()
+    assert store.store.lookup(a) is None
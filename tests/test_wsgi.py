@@ -0,0 +1,128 @@
+import sqrlserver
+from sqrlserver.utils import pad, depad
+from sqrlserver.wsgi import WsgiApp, Counter
+from base64 import urlsafe_b64encode
+import io
+import threading
+import urllib.parse
+import nacl.signing
+import nacl.utils
+
+key = nacl.utils.random(32)
+sk = nacl.signing.SigningKey.generate()
+
+def b64u(s):
+    return depad(urlsafe_b64encode(s.encode('utf-8')).decode('utf-8'))
+
+def body(server, cmd='query', signer=sk):
+    idk = depad(urlsafe_b64encode(bytes(signer.verify_key)).decode('utf-8'))
+    client = b64u('ver=1\r\ncmd={}\r\nidk={}\r\n'.format(cmd, idk))
+    ids = depad(urlsafe_b64encode(sk.sign((client + server).encode('utf-8')).signature).decode('utf-8'))
+    return urllib.parse.urlencode({'client': client, 'server': server, 'ids': ids}).encode('utf-8')
+
+def call(app, data, qs='', method='POST'):
+    environ = {
+        'REQUEST_METHOD': method,
+        'QUERY_STRING': qs,
+        'CONTENT_LENGTH': str(len(data)),
+        'REMOTE_ADDR': '1.2.3.4',
+        'wsgi.url_scheme': 'https',
+        'wsgi.input': io.BytesIO(data),
+    }
+    out = {}
+    def start_response(status, headers):
+        out['status'] = status
+        out['headers'] = dict(headers)
+    out['body'] = b''.join(app(environ, start_response))
+    return out
+
+def resolver(req):
+    args = {}
+    for action in req.action:
+        if action[0] == 'find':
+            args['found'] = [True]
+        elif action[0] == 'auth':
+            args['authenticated'] = True
+    return args
+
+def test_counter():
+    c = Counter(5)
+    assert c() == 5
+    assert c() == 6
+    assert c.value == 6
+
+    c = Counter()
+    def worker():
+        for i in range(1000):
+            c()
+    threads = [threading.Thread(target=worker) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert c() == 4000
+
+def test_query():
+    counter = Counter(100)
+    app = WsgiApp(key, resolver, counter)
+    nut = sqrlserver.Nut(key).generate('1.2.3.4', 99)
+    url = sqrlserver.Url('example.com').generate('/sqrl', nut=nut)
+    out = call(app, body(b64u(url)), qs='nut=' + nut.toString('qr'))
+    assert out['status'] == '200 OK'
+    assert int(out['headers']['Content-Length']) == len(out['body'])
+    server = sqrlserver.Request._extract_server(pad(out['body'].decode('ascii')))
+    assert server['tif'] == '5'
+    #the new nut was generated with the next counter
+    newnut = sqrlserver.Nut(key).load(server['nut'])
+    assert newnut.counter == 100
+    assert 'nut=' + server['nut'] in server['qry']
+
+    #follow up with an ident using the server's response
+    out = call(app, body(pad(out['body'].decode('ascii')), 'ident'), qs='nut=' + server['nut'])
+    server = sqrlserver.Request._extract_server(pad(out['body'].decode('ascii')))
+    assert server['tif'] == '5'
+
+def test_client_errors():
+    app = WsgiApp(key, resolver, Counter())
+    nut = sqrlserver.Nut(key).generate('1.2.3.4', 99)
+    url = sqrlserver.Url('example.com').generate('/sqrl', nut=nut)
+    qs = 'nut=' + nut.toString('qr')
+
+    #bad signature
+    data = body(b64u(url)).replace(b'ids=', b'ids=A')
+    out = call(app, data, qs=qs)
+    assert out['status'] == '200 OK'
+    server = sqrlserver.Request._extract_server(pad(out['body'].decode('ascii')))
+    assert int(server['tif'], 16) & 0x80
+
+    #unknown field in the body
+    out = call(app, body(b64u(url)) + b'&evil=1', qs=qs)
+    assert out['status'] == '400 Bad Request'
+    assert int(out['headers']['Content-Length']) == len(out['body'])
+
+    #missing nut
+    out = call(app, body(b64u(url)))
+    assert out['status'] == '200 OK'
+    server = sqrlserver.Request._extract_server(pad(out['body'].decode('ascii')))
+    assert server['tif'] == 'c0'
+    assert 'nut' not in server
+
+    #not a POST
+    out = call(app, b'', method='GET')
+    assert out['status'] == '405 Method Not Allowed'
+
+def test_threads():
+    app = WsgiApp(key, resolver, Counter())
+    results = []
+    def worker(i):
+        nut = sqrlserver.Nut(key).generate('1.2.3.4', i)
+        url = sqrlserver.Url('example.com').generate('/sqrl', nut=nut)
+        for j in range(10):
+            out = call(app, body(b64u(url)), qs='nut=' + nut.toString('qr'))
+            results.append(sqrlserver.Request._extract_server(pad(out['body'].decode('ascii')))['tif'])
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ['5'] * 40